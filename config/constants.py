@@ -15,6 +15,29 @@ MAX_LABEL_PITCH = 96  # C7 MIDI note number (will be displayed as C8)
 # MIDI Program Change Constants
 DEFAULT_MIDI_PROGRAM = 0  # Acoustic Grand Piano (EZ Pluck)
 DEFAULT_MIDI_CHANNEL = 0  # Default MIDI channel for playback
+DRUM_CHANNEL = 9  # General MIDI percussion channel (channel 10 in 1-based numbering)
+
+# Playback scheduling
+PLAYBACK_LOOKAHEAD_SEC = 0.2  # How far ahead notes are queued into FluidSynth's sequencer (0 = send directly)
+
+# Render cache (replaying unchanged note sets from pre-rendered audio)
+RENDER_CACHE_ENABLED = True
+RENDER_CACHE_MEMORY_BUDGET_MB = 256  # PCM kept memory-mapped at once
+RENDER_CACHE_DISK_BUDGET_MB = 1024  # Rendered files kept on disk
+RENDER_CACHE_SAMPLE_RATE = 44100
+CACHED_STREAM_BLOCK_SEC = 0.5  # Cached takes are handed to pygame.mixer in blocks of this length
+
+# Scheduler telemetry overlay in the transport bar (toggle with Ctrl+Shift+T)
+SHOW_SCHEDULER_TELEMETRY = False
+TELEMETRY_REFRESH_MS = 500
+
+# Piano roll note layer rendered in background tiles (large sessions only)
+TILED_RENDER_MIN_NOTES = 5000  # Smaller sessions are painted directly
+TILE_CACHE_MEMORY_BUDGET_MB = 64
+
+# Undo/redo history of note edits, stored as snapshots that share unchanged chunks of notes
+NOTE_HISTORY_MEMORY_BUDGET_MB = 64  # Beyond this, old steps are compacted, then dropped
+NOTE_HISTORY_CHUNK_NOTES = 1024  # An edit copies only the chunks it falls into
 
 INSTRUMENT_PRESETS = {
     "EZ Pluck": 0,        # Acoustic Grand Piano
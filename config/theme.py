@@ -68,6 +68,7 @@ BLACK_KEY_COLOR = QColor(30, 30, 35)                     # #1E1E23
 KEY_BORDER_COLOR = QColor(100, 100, 100, 60)             # Slightly reduced alpha for subtlety
 PIANO_KEY_LABEL_COLOR = QColor(70, 70, 70)                 # Dark gray for text on white keys
 PIANO_KEY_BLACK_LABEL_COLOR = QColor(210, 210, 210)      # Light gray for text on black keys
+ACTIVE_KEY_HIGHLIGHT_COLOR = QColor(255, 120, 0, 150)     # Playhead orange, translucent - Keys currently sounding
 
 # Add aliases for WHITE_KEY_COLOR and BLACK_KEY_COLOR to maintain compatibility
 PIANO_KEY_WHITE_COLOR = WHITE_KEY_COLOR
@@ -79,6 +80,7 @@ NOTE_LOW_COLOR = QColor(80, 200, 120)                    # #50C878
 NOTE_MED_COLOR = QColor(70, 180, 210)                    # #46B4D2
 NOTE_HIGH_COLOR = QColor(230, 120, 190)                  # #E678BE
 NOTE_BORDER_COLOR = QColor(0, 0, 0, 100)                 # #000000 with alpha - Subtle border for notes
+NOTE_TILE_PLACEHOLDER_COLOR = QColor(255, 255, 255, 6)   # Faint wash over note tiles still rendering
 
 # =============================================================================
 # --- Fonts ---
@@ -148,6 +150,25 @@ APP_ICON_PATH = _qss_path([ASSETS_BASE_PATH, ICON_DIR_NAME, "app_icon.png"]) # F
 
 # CHECKMARK_ICON_PATH = _qss_path([ASSETS_BASE_PATH, ICON_DIR_NAME, "checkmark.svg"])
 
+# =============================================================================
+# --- Theme Signature ---
+# =============================================================================
+def theme_signature():
+    """
+    Hashable snapshot of every color and font setting above.
+
+    Caches of pre-rendered UI (e.g. ui.layer_cache) store it with their pixmaps
+    and rebuild when it no longer matches, so changing a theme value at runtime
+    needs no explicit invalidation.
+    """
+    values = []
+    for name, value in globals().items():
+        if isinstance(value, QColor):
+            values.append((name, value.rgba()))
+        elif name.startswith('FONT_'):
+            values.append((name, value))
+    return tuple(values)
+
 # =============================================================================
 # --- Mapping Legacy Names (Informational - to be removed or refactored in usage) ---
 # =============================================================================
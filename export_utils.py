@@ -1,31 +1,62 @@
 # export_utils.py
 import os
+import numpy as np
 import pretty_midi
-from typing import List
+from typing import List, Optional, Union
 
-def export_to_midi(notes: List[pretty_midi.Note], filename: str, tempo: float = 120.0):
+from note_buffer import NoteBuffer, as_note_buffer
+from config.constants import DEFAULT_MIDI_CHANNEL, DEFAULT_MIDI_PROGRAM, DRUM_CHANNEL
+
+def export_to_midi(notes: Union[NoteBuffer, List[pretty_midi.Note]], filename: str, tempo: float = 120.0):
     """
     Export notes to a MIDI file
     
     Args:
-        notes: List of pretty_midi.Note objects
+        notes: NoteBuffer or list of pretty_midi.Note objects
         filename: Path to save the MIDI file
         tempo: Tempo in BPM
     """
     # Create a PrettyMIDI object
     midi = pretty_midi.PrettyMIDI(initial_tempo=tempo)
     
-    # Create an instrument
-    instrument = pretty_midi.Instrument(program=0)  # Acoustic Grand Piano
-    
-    # Add the notes to the instrument
-    for note in notes:
-        instrument.notes.append(note)
+    # Sort as arrays, then materialize Note objects once for pretty_midi's writer
+    buffer = as_note_buffer(notes).sorted()
     
-    # Add the instrument to the PrettyMIDI object
-    midi.instruments.append(instrument)
+    # One instrument per (channel, program) pair, so imported multi-track files round-trip
+    tracks = np.unique(np.stack((buffer.channel, buffer.program), axis=1), axis=0)
+    if len(tracks) == 0:
+        tracks = [(DEFAULT_MIDI_CHANNEL, DEFAULT_MIDI_PROGRAM)]  # Keep writing one (empty) piano track
+    for channel, program in tracks:
+        instrument = pretty_midi.Instrument(program=int(program), is_drum=int(channel) == DRUM_CHANNEL)
+        instrument.notes = buffer[(buffer.channel == channel) & (buffer.program == program)].to_notes()
+        
+        # Add the instrument to the PrettyMIDI object
+        midi.instruments.append(instrument)
     
     # Write the MIDI file
     midi.write(filename)
     
-    return os.path.abspath(filename)
\ No newline at end of file
+    return os.path.abspath(filename)
+
+def render_to_file(notes: Union[NoteBuffer, List[pretty_midi.Note]], filename: str, tempo: float = 120.0,
+                   soundfont_path: Optional[str] = None, program: Optional[int] = None, sample_rate: Optional[int] = None):
+    """
+    Render notes to a WAV or FLAC audio file without an audio device
+    
+    Args:
+        notes: NoteBuffer or list of pretty_midi.Note objects
+        filename: Path to save the audio file (.wav or .flac)
+        tempo: Tempo in BPM
+        soundfont_path: SoundFont to render with (defaults to the bundled one)
+        program: General MIDI program for the default channel (None keeps each note's own program)
+        sample_rate: Output sample rate in Hz (defaults to the renderer's DEFAULT_SAMPLE_RATE)
+    """
+    # Imported here so MIDI export keeps working on machines without libfluidsynth
+    from midi.offline_renderer import OfflineRenderer, DEFAULT_SAMPLE_RATE
+    
+    renderer = OfflineRenderer(soundfont_path, sample_rate=DEFAULT_SAMPLE_RATE if sample_rate is None else sample_rate)
+    overrides = None if program is None else {DEFAULT_MIDI_CHANNEL: program}
+    try:
+        return renderer.render_to_file(notes, filename, tempo_bpm=tempo, program_overrides=overrides)
+    finally:
+        renderer.cleanup()
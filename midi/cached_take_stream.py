@@ -0,0 +1,101 @@
+import threading
+import numpy as np
+import pygame.mixer
+
+from config.constants import CACHED_STREAM_BLOCK_SEC
+
+
+class CachedTakeStream:
+    """
+    Plays memory-mapped PCM from the render cache on a pygame.mixer channel.
+
+    The take is handed to SDL in short blocks: one plays while the next waits
+    in the channel's queue, and a feeder thread refills the queue as blocks
+    finish. Starting, seeking or restarting therefore copies two blocks,
+    however long the take is, and only the pages being played are read from
+    the memmap.
+    """
+
+    def __init__(self, pcm: np.ndarray, start_frame: int, sample_rate: int,
+                 volume: float = 1.0, block_sec: float = CACHED_STREAM_BLOCK_SEC):
+        self._pcm = pcm
+        self._next_frame = start_frame
+        self._block_frames = max(1, int(block_sec * sample_rate))
+        self._poll_sec = block_sec / 4 # Several checks per block so the queue never runs dry
+        self._volume = volume
+        self._channel = None
+        self._paused = False
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self) -> bool:
+        """Starts playing from the start frame; False if there is nothing left to play or no channel."""
+        with self._lock:
+            if self._next_frame >= len(self._pcm):
+                return False
+            channel = pygame.mixer.find_channel(True)
+            if channel is None:
+                return False
+            channel.play(self._next_block())
+            if self._next_frame < len(self._pcm):
+                channel.queue(self._next_block())
+            self._channel = channel
+        self._thread = threading.Thread(target=self._feed, daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+        self._thread = None
+        with self._lock:
+            if self._channel is not None:
+                self._channel.stop()
+            self._channel = None
+
+    def pause(self):
+        with self._lock:
+            self._paused = True
+            if self._channel is not None:
+                self._channel.pause()
+
+    def unpause(self):
+        with self._lock:
+            self._paused = False
+            if self._channel is not None:
+                self._channel.unpause()
+
+    def set_volume(self, volume: float):
+        with self._lock:
+            self._volume = volume
+            if self._channel is not None:
+                for sound in (self._channel.get_sound(), self._channel.get_queue()):
+                    if sound is not None:
+                        sound.set_volume(volume)
+
+    def finished(self) -> bool:
+        """True once every block has been queued and the channel has played the last one."""
+        with self._lock:
+            if self._channel is None:
+                return True
+            return (not self._paused and self._next_frame >= len(self._pcm)
+                    and not self._channel.get_busy())
+
+    def _next_block(self) -> pygame.mixer.Sound:
+        """Copies the block at the cursor into a Sound and advances the cursor (call with self._lock held)."""
+        end = min(self._next_frame + self._block_frames, len(self._pcm))
+        sound = pygame.mixer.Sound(buffer=np.ascontiguousarray(self._pcm[self._next_frame:end]))
+        sound.set_volume(self._volume)
+        self._next_frame = end
+        return sound
+
+    def _feed(self):
+        while not self._stop_event.wait(self._poll_sec):
+            with self._lock:
+                if self._channel is None or self._next_frame >= len(self._pcm):
+                    return
+                if not self._paused and self._channel.get_queue() is None:
+                    # Queuing on an idle channel starts it right away, which also recovers from an underrun
+                    self._channel.queue(self._next_block())
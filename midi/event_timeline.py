@@ -0,0 +1,130 @@
+import numpy as np
+
+from note_buffer import NoteBuffer, INDEX_LOOKUP_SCAN_THRESHOLD
+
+EVENT_NOTE_OFF = 0
+EVENT_NOTE_ON = 1
+
+_COLUMNS = ('times', 'kinds', 'note_id', 'pitch', 'velocity', 'channel', 'note_end')
+
+
+def _compile_events(notes: NoteBuffer) -> dict:
+    """Events of notes as {column: array}, sorted by time with note-offs before note-ons."""
+    audible = np.flatnonzero(notes.end > notes.start)
+    count = len(audible)
+
+    times = np.concatenate((notes.start[audible], notes.end[audible]))
+    kinds = np.concatenate((np.full(count, EVENT_NOTE_ON, dtype=np.uint8),
+                            np.full(count, EVENT_NOTE_OFF, dtype=np.uint8)))
+    note_index = np.concatenate((audible, audible))
+
+    order = np.lexsort((kinds, times)) # Primary key: time, then offs before ons
+    note_index = note_index[order]
+    return {
+        'times': times[order],
+        'kinds': kinds[order],
+        'note_id': notes.id[note_index],
+        'pitch': notes.pitch[note_index],
+        'velocity': notes.velocity[note_index],
+        'channel': notes.channel[note_index],
+        'note_end': notes.end[note_index], # Lets a late note-on see that its note already ended
+    }
+
+
+class EventTimeline:
+    """
+    Note-on/note-off events compiled from a NoteBuffer into one time-sorted array set.
+
+    Every note contributes two events. At equal times note-offs sort before
+    note-ons, so a pitch that ends and restarts on the same instant is
+    re-triggered instead of cut off. Zero-length notes are dropped since they
+    would never sound. Events carry their note's id, so add_notes() and
+    remove_notes() can patch the timeline after an edit instead of compiling
+    it again.
+
+    Seeking is a binary search over `times`; consumers keep an integer cursor
+    and only look at events between the cursor and the current time.
+    """
+
+    def __init__(self, notes: NoteBuffer):
+        for name, column in _compile_events(notes).items():
+            setattr(self, name, column)
+        self._update_end_time()
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def seek(self, position_seconds: float) -> int:
+        """Cursor of the first event at or after position_seconds."""
+        return int(np.searchsorted(self.times, position_seconds, side='left'))
+
+    def due(self, cursor: int, current_time: float) -> int:
+        """End (exclusive) of the events from cursor whose time has passed at current_time."""
+        return cursor + int(np.searchsorted(self.times[cursor:], current_time, side='right'))
+
+    def time_at(self, cursor: int) -> float:
+        """Time of the event at cursor, or infinity past the last event."""
+        if cursor >= len(self.times):
+            return float('inf')
+        return float(self.times[cursor])
+
+    # --- Patching ---
+
+    def add_notes(self, notes: NoteBuffer):
+        """
+        Inserts the events of notes at their sorted positions.
+
+        Returns:
+            (events, positions): the inserted events as {column: array} and,
+            for each, the index it was inserted before in the timeline as it
+            was before the call (lets a caller move its cursor)
+        """
+        events = _compile_events(notes)
+        if not len(events['times']):
+            return events, np.empty(0, dtype=np.intp)
+        times, kinds = events['times'], events['kinds']
+        # A note-on goes after everything at its time; a note-off only after the other note-offs
+        positions = np.searchsorted(self.times, times, side='right')
+        left = np.searchsorted(self.times, times, side='left')
+        for i in np.flatnonzero((kinds == EVENT_NOTE_OFF) & (left < positions)).tolist():
+            positions[i] = left[i] + int(np.searchsorted(self.kinds[left[i]:positions[i]], EVENT_NOTE_OFF, side='right'))
+        for name in _COLUMNS:
+            setattr(self, name, np.insert(getattr(self, name), positions, events[name]))
+        self._update_end_time()
+        return events, positions
+
+    def remove_notes(self, notes: NoteBuffer) -> np.ndarray:
+        """
+        Drops the events of notes, matched by time and note id.
+
+        Returns:
+            Indices the removed events had before the call
+        """
+        audible = np.flatnonzero(notes.end > notes.start)
+        if not len(audible) or not len(self.times):
+            return np.empty(0, dtype=np.intp)
+        ids = notes.id[audible]
+        if len(ids) > INDEX_LOOKUP_SCAN_THRESHOLD:
+            keep = ~np.isin(self.note_id, ids)
+        else:
+            keep = np.ones(len(self.times), dtype=bool)
+            keep[self._event_positions(notes.start[audible], ids, EVENT_NOTE_ON)] = False
+            keep[self._event_positions(notes.end[audible], ids, EVENT_NOTE_OFF)] = False
+        for name in _COLUMNS:
+            setattr(self, name, getattr(self, name)[keep])
+        self._update_end_time()
+        return np.flatnonzero(~keep)
+
+    def _event_positions(self, times: np.ndarray, ids: np.ndarray, kind: int) -> np.ndarray:
+        """Indices of the events of the given kind for (time, note id) pairs; missing ones are skipped."""
+        lo = np.searchsorted(self.times, times, side='left')
+        hi = np.searchsorted(self.times, times, side='right')
+        found = []
+        for first, last, note_id in zip(lo.tolist(), hi.tolist(), ids.tolist()):
+            match = np.flatnonzero((self.note_id[first:last] == note_id) & (self.kinds[first:last] == kind))
+            if len(match):
+                found.append(first + int(match[0]))
+        return np.array(found, dtype=np.intp)
+
+    def _update_end_time(self):
+        self.end_time = float(self.times[-1]) if len(self.times) else 0.0 # Time of the last event
@@ -1,16 +1,31 @@
 import fluidsynth
 import os
 import inspect # For inspect.getfile
-from config.constants import DEFAULT_MIDI_PROGRAM
+from ctypes import c_void_p, c_short, c_int
+from config.constants import DEFAULT_MIDI_PROGRAM, DRUM_CHANNEL
 from utils import get_resource_path # Import the new helper
 
 # Default SoundFont path relative to project root
 DEFAULT_SOUNDFONT_RELATIVE_PATH = "soundbank/soundfont.sf2"
 
+SEQUENCER_TICKS_PER_SECOND = 1000 # Sequencer timestamps are in milliseconds
+
+# pyfluidsynth does not wrap fluid_sequencer_remove_events, which we need to withdraw
+# events queued ahead of time (seek/pause/tempo change). Bind it ourselves when possible.
+_cfunc = getattr(fluidsynth, 'cfunc', None)
+_fluid_sequencer_remove_events = _cfunc('fluid_sequencer_remove_events', None,
+                                        ('seq', c_void_p, 1),
+                                        ('source', c_short, 1),
+                                        ('dest', c_short, 1),
+                                        ('type', c_int, 1)) if _cfunc else None
+
 class FluidSynthPlayer:
     def __init__(self, soundfont_path_str: str | None = None): # Allow passing a specific path
         self.fs = None
         self.soundfont_id = None
+        self.sequencer = None # fluid_sequencer for timestamped (lookahead) playback, see enable_sequencer()
+        self.sequencer_dest = None
+        self.channel_programs = {} # Last program selected on each channel, so setup_channels() only sends changes
         
         # Determine the soundfont path to use
         if soundfont_path_str:
@@ -49,7 +64,7 @@ class FluidSynthPlayer:
                     print(f"SoundFont loaded successfully from '{self.soundfont_path}' with ID {self.soundfont_id}")
                     # Default instrument for all channels (0-15)
                     for channel in range(16):
-                        self.fs.program_select(channel, self.soundfont_id, 0, DEFAULT_MIDI_PROGRAM)
+                        self.set_instrument(channel, DEFAULT_MIDI_PROGRAM)
 
         except Exception as e:
             print(f"Failed to initialize FluidSynth: {e}")
@@ -62,11 +77,24 @@ class FluidSynthPlayer:
     def set_instrument(self, channel: int, program_num: int):
         if self.fs and self.soundfont_id is not None:
             if 0 <= channel <= 15 and 0 <= program_num <= 127:
-                # bank_num is typically 0 for GM SoundFonts
-                self.fs.program_select(channel, self.soundfont_id, 0, program_num)
+                # bank_num is typically 0 for GM SoundFonts; GM drum kits live in bank 128
+                bank_num = 128 if channel == DRUM_CHANNEL else 0
+                self.fs.program_select(channel, self.soundfont_id, bank_num, program_num)
+                self.channel_programs[channel] = program_num
             else:
                 print(f"Error: Invalid channel ({channel}) or program number ({program_num})")
 
+    def setup_channels(self, channel_programs: dict):
+        """
+        Selects the program of several channels at once, before playback starts.
+
+        Args:
+            channel_programs: {channel: program}; channels already on that program are skipped
+        """
+        for channel, program_num in channel_programs.items():
+            if self.channel_programs.get(channel) != program_num:
+                self.set_instrument(channel, program_num)
+
     def noteon(self, channel: int, pitch: int, velocity: int):
         if self.fs and self.soundfont_id is not None:
             if 0 <= channel <= 15 and 0 <= pitch <= 127 and 0 <= velocity <= 127:
@@ -81,6 +109,55 @@ class FluidSynthPlayer:
             else:
                 print(f"Error: Invalid parameters for noteoff: ch={channel}, p={pitch}")
     
+    def enable_sequencer(self) -> bool:
+        """
+        Creates a fluid_sequencer bound to the synth for timestamped playback.
+
+        The sequencer is driven by the synth's own sample clock, so queued events
+        fire from FluidSynth's audio thread regardless of what Python is doing.
+
+        Returns:
+            True if timestamped scheduling (including cancellation) is available
+        """
+        if self.sequencer:
+            return True
+        if not self.fs or self.soundfont_id is None or _fluid_sequencer_remove_events is None:
+            return False
+        try:
+            self.sequencer = fluidsynth.Sequencer(time_scale=SEQUENCER_TICKS_PER_SECOND, use_system_timer=False)
+            self.sequencer_dest = self.sequencer.register_fluidsynth(self.fs)
+            return True
+        except Exception as e:
+            print(f"FluidSynthPlayer: Could not create sequencer, falling back to direct playback: {e}")
+            self.sequencer = None
+            self.sequencer_dest = None
+            return False
+
+    def sequencer_tick(self) -> int:
+        """Current sequencer time in ticks (milliseconds)."""
+        return self.sequencer.get_tick() if self.sequencer else 0
+
+    def schedule_noteon(self, tick: int, channel: int, pitch: int, velocity: int):
+        """Queues a note-on to fire at an absolute sequencer tick."""
+        if self.sequencer and self.sequencer_dest is not None:
+            if 0 <= channel <= 15 and 0 <= pitch <= 127 and 0 <= velocity <= 127:
+                self.sequencer.note_on(tick, channel, pitch, velocity, dest=self.sequencer_dest, absolute=True)
+            else:
+                print(f"Error: Invalid parameters for schedule_noteon: ch={channel}, p={pitch}, v={velocity}")
+
+    def schedule_noteoff(self, tick: int, channel: int, pitch: int):
+        """Queues a note-off to fire at an absolute sequencer tick."""
+        if self.sequencer and self.sequencer_dest is not None:
+            if 0 <= channel <= 15 and 0 <= pitch <= 127:
+                self.sequencer.note_off(tick, channel, pitch, dest=self.sequencer_dest, absolute=True)
+            else:
+                print(f"Error: Invalid parameters for schedule_noteoff: ch={channel}, p={pitch}")
+
+    def cancel_scheduled(self):
+        """Withdraws every event still waiting in the sequencer queue."""
+        if self.sequencer and _fluid_sequencer_remove_events is not None:
+            _fluid_sequencer_remove_events(self.sequencer.sequencer, -1, self.sequencer_dest, -1)
+
     def all_notes_off(self, channel: int = -1):
         """Stop all notes on a specific channel, or all channels if channel is -1."""
         if self.fs:
@@ -137,6 +214,14 @@ class FluidSynthPlayer:
             print("FluidSynthPlayer: Cannot set gain, FluidSynth not initialized.")
 
     def cleanup(self):
+        if self.sequencer:
+            try:
+                self.sequencer.delete()
+            except Exception as e:
+                print(f"Error during FluidSynth sequencer cleanup: {e}")
+            finally:
+                self.sequencer = None
+                self.sequencer_dest = None
         if self.fs:
             try:
                 # Unload soundfont if loaded
@@ -0,0 +1,85 @@
+import numpy as np
+
+LEAF_SCAN_LEVEL = 6 # Subtrees of up to 2**(level+1) intervals are scanned with one vectorized mask
+
+
+class IntervalIndex:
+    """
+    Implicit augmented interval tree over start-sorted intervals (cgranges layout).
+
+    The sorted arrays themselves are the tree: the node at index i sits at the
+    level given by its number of trailing 1 bits, and max_end[i] holds the
+    largest end in its subtree. A query descends only into subtrees whose
+    max_end can still reach the query window, so finding the k intervals that
+    overlap a point or window costs O(log n + k) instead of a scan over every
+    note, and building the index is O(n) on top of the sort.
+
+    Indices returned are positions in the arrays the index was built from.
+    """
+
+    def __init__(self, starts: np.ndarray, ends: np.ndarray):
+        self.starts = np.asarray(starts, dtype=np.float64)
+        self.ends = np.asarray(ends, dtype=np.float64)
+        if len(self.starts) > 1 and np.any(self.starts[1:] < self.starts[:-1]):
+            raise ValueError("IntervalIndex requires intervals sorted by start")
+        self.max_end = self.ends.copy()
+        self.max_level = self._build()
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def _build(self) -> int:
+        n = len(self.starts)
+        if n == 0:
+            return -1
+        max_end = self.max_end
+        last_i = (n - 1) & ~1 # Last leaf; stands in for right children beyond the end of the array
+        last = max_end[last_i]
+        level = 1
+        while (1 << level) <= n:
+            half = 1 << (level - 1)
+            nodes = np.arange((half << 1) - 1, n, half << 2)
+            right = nodes + half
+            right_max = np.where(right < n, max_end[np.minimum(right, n - 1)], last)
+            max_end[nodes] = np.maximum(max_end[nodes], np.maximum(max_end[nodes - half], right_max))
+            # Track the max_end of the rightmost node at this level for the next level's missing children
+            last_i = last_i - half if (last_i >> level) & 1 else last_i + half
+            if last_i < n and max_end[last_i] > last:
+                last = max_end[last_i]
+            level += 1
+        return level - 1
+
+    def overlapping(self, t0: float, t1: float) -> np.ndarray:
+        """Sorted indices of intervals with start <= t1 and end > t0 (sounding somewhere in [t0, t1])."""
+        n = len(self.starts)
+        if n == 0:
+            return np.empty(0, dtype=np.intp)
+        starts, ends, max_end = self.starts, self.ends, self.max_end
+        found = []
+        # Stack of (node, level, left_done) as in cgranges' iterative descent
+        stack = [((1 << self.max_level) - 1, self.max_level, False)]
+        while stack:
+            node, level, left_done = stack.pop()
+            if level <= LEAF_SCAN_LEVEL:
+                lo = node >> level << level
+                hi = min(lo + (1 << (level + 1)) - 1, n)
+                if lo < hi:
+                    hit = np.flatnonzero((starts[lo:hi] <= t1) & (ends[lo:hi] > t0))
+                    if len(hit):
+                        found.append(lo + hit)
+            elif not left_done:
+                left = node - (1 << (level - 1))
+                stack.append((node, level, True))
+                if left >= n or max_end[left] > t0: # Left subtree can still reach the window
+                    stack.append((left, level - 1, False))
+            elif node < n and starts[node] <= t1: # Right side starts before the window ends
+                if ends[node] > t0:
+                    found.append(np.array([node], dtype=np.intp))
+                stack.append((node + (1 << (level - 1)), level - 1, False))
+        if not found:
+            return np.empty(0, dtype=np.intp)
+        return np.sort(np.concatenate(found))
+
+    def active_at(self, t: float) -> np.ndarray:
+        """Sorted indices of intervals sounding at time t (start <= t < end)."""
+        return self.overlapping(t, t)
@@ -1,18 +1,38 @@
 import time
 import threading
+from collections import deque
+import numpy as np
 import pretty_midi # For logging note names
+from note_buffer import as_note_buffer
+from .event_timeline import EventTimeline, EVENT_NOTE_ON
+from .interval_index import IntervalIndex
+from .fluidsynth_player import SEQUENCER_TICKS_PER_SECOND
+from .scheduler_telemetry import SchedulerTelemetry
 # midi_event_utils are no longer used directly by NoteScheduler for FluidSynth
 
 # Assuming FluidSynthPlayer is in midi.fluidsynth_player
 # from .fluidsynth_player import FluidSynthPlayer # Type hint, actual instance passed in
 
-DEFAULT_MIDI_CHANNEL = 0 # For FluidSynth playback
+SPIN_THRESHOLD_SEC = 0.0005 # Busy-wait the last half millisecond before an event for tighter timing
+MAX_WAIT_SEC = 0.5 # Upper bound on a single wait so the loop re-checks its state now and then
+# Queued events this close to the sequencer's clock may or may not have fired (it runs once per
+# audio block); withdrawing counts them as not fired, so at worst a note-on is sent twice.
+SEQUENCER_MARGIN_TICKS = 2
 
 class NoteScheduler:
     """Handles the timing and scheduling of MIDI note events for playback using a player backend."""
 
-    def __init__(self, notes, player_backend, get_current_time_func, tempo_scale_func, stop_flag, is_playing_flag):
-        self.notes = sorted(notes, key=lambda note: note.start) if notes else []
+    def __init__(self, notes, player_backend, get_current_time_func, tempo_scale_func, stop_flag, is_playing_flag,
+                 spin_threshold=SPIN_THRESHOLD_SEC, lookahead_sec=0.0, program_overrides=None, telemetry=None):
+        # Private sorted copy: the UI may keep editing its own buffer while we play
+        self.notes = as_note_buffer(notes).sorted()
+        self.notes.assign_ids() # Ids key notes_on and the events patched by apply_delta()
+        self.timeline = EventTimeline(self.notes) # Merged note-on/off events, compiled once per note set
+        self._active_index = None # IntervalIndex of the notes, built on first use
+        self.channel_programs = self.notes.channel_programs() # Each note's channel/program, applied up front
+        # {channel: program} chosen by the user (e.g. the instrument selector). Shared with the
+        # controller, so instrument changes take effect without rebuilding the scheduler.
+        self.program_overrides = program_overrides if program_overrides is not None else {}
         self.player_backend = player_backend # This will be an instance of FluidSynthPlayer
         self.get_current_time = get_current_time_func
         self.get_tempo_scale = tempo_scale_func
@@ -20,9 +40,34 @@ class NoteScheduler:
         self.is_playing_flag = is_playing_flag
 
         self.playback_thread = None
-        self.notes_on = {}  # Tracks currently playing notes {note_index_in_sorted_list: (pitch, channel)}
-        self.next_note_idx = 0
+        self.notes_on = {}  # Tracks currently playing notes {note_id: (pitch, channel)}
+        self.next_event_idx = 0 # Cursor into self.timeline
+        self._reattack_position = None # Set on seek/resume; the thread re-attacks notes sustained across it
         self.log_events = True # Enable/disable MIDI event logging
+        self.telemetry = telemetry if telemetry is not None else SchedulerTelemetry() # Lateness and loop CPU stats
+
+        # The playback thread sleeps on this condition until the next event is due.
+        # wake() interrupts the sleep on stop/seek/tempo/pause changes; the same lock
+        # guards the cursor and notes_on against concurrent seeks.
+        self._wakeup = threading.Condition()
+        self.spin_threshold = max(0.0, spin_threshold) # 0 disables the final busy-wait
+
+        # Lookahead mode: events due within the next lookahead_sec (real time) are handed to
+        # the backend's sequencer with timestamps, so the audio thread fires them on time even
+        # if this thread or the GIL is late. Requires a backend with schedule_noteon/noteoff.
+        self.lookahead_sec = 0.0
+        self._queued = deque() # (sequencer tick, event index) of events handed to the sequencer
+        if lookahead_sec > 0:
+            if hasattr(player_backend, 'schedule_noteon') and hasattr(player_backend, 'cancel_scheduled'):
+                self.lookahead_sec = lookahead_sec
+            else:
+                print("NoteScheduler: Backend has no sequencer, lookahead disabled.")
+        self.telemetry.measure = "lead" if self.lookahead_sec else "lateness"
+
+    def wake(self):
+        """Interrupts the playback thread's wait so it re-reads time, tempo and state."""
+        with self._wakeup:
+            self._wakeup.notify_all()
 
     def start_playback_thread(self):
         if not self.notes:
@@ -35,23 +80,20 @@ class NoteScheduler:
 
         if self.playback_thread is None or not self.playback_thread.is_alive():
             self.stop_flag.clear()
+            self._apply_programs()
             # Reset playback state for the thread
             self.notes_on = {}
-            self.next_note_idx = 0
-            # Find the first note to play based on current time (e.g., if resuming or seeking)
+            # Find the first event to play based on current time (e.g., if resuming or seeking).
+            # Notes that started before it but are still sounding get re-attacked by the thread.
             initial_current_time = self.get_current_time()
-            while self.next_note_idx < len(self.notes) and \
-                  self.notes[self.next_note_idx].start < initial_current_time:
-                # If a note should have started but also ended before current time, skip it.
-                # Otherwise, if it should have started and is still ongoing, it should be turned on.
-                # This logic can be complex for robust resume/seek. For now, simple advance.
-                self.next_note_idx += 1
+            self.next_event_idx = self.timeline.seek(initial_current_time)
+            self._reattack_position = initial_current_time
             
             self.playback_thread = threading.Thread(target=self._run_schedule)
             self.playback_thread.daemon = True
             self.playback_thread.start()
             if self.log_events:
-                print(f"NoteScheduler: Playback thread started. First note index: {self.next_note_idx}")
+                print(f"NoteScheduler: Playback thread started. First event index: {self.next_event_idx}")
         else:
             if self.log_events: print("NoteScheduler: Playback thread already running.")
 
@@ -60,7 +102,7 @@ class NoteScheduler:
         if self.log_events:
             print(f"NoteScheduler: _run_schedule entered. Notes: {len(self.notes)}")
             if self.notes:
-                print(f"NoteScheduler: First note: P{self.notes[0].pitch} S{self.notes[0].start} E{self.notes[0].end}")
+                print(f"NoteScheduler: First note: P{self.notes.pitch[0]} S{self.notes.start[0]} E{self.notes.end[0]}")
 
         if not self.player_backend: # Check player_backend instead of output_device
             print("NoteScheduler: No player backend available for playback.")
@@ -68,62 +110,102 @@ class NoteScheduler:
             else: self.is_playing_flag[0] = False
             return
 
+        telemetry = self.telemetry
+        cpu_mark = time.thread_time()
         try:
-            while not self.stop_flag.is_set():
-                # Check if is_playing_flag (which might be a function call or list access) is false
-                is_playing_check = self.is_playing_flag() if callable(self.is_playing_flag) else self.is_playing_flag[0]
-                if not is_playing_check: # If playback was paused/stopped externally
-                    time.sleep(0.01) # Sleep briefly and re-check
-                    continue
-
-                current_time = self.get_current_time()
-
-                # Process note-offs
-                notes_to_remove_from_on = []
-                for note_idx, (pitch, channel) in list(self.notes_on.items()): # Use list for safe iteration
-                    note = self.notes[note_idx] # Original note object for end time
-                    if current_time >= note.end:
-                        self.player_backend.noteoff(channel, pitch)
-                        if self.log_events:
-                            print(f"Note OFF: {pretty_midi.note_number_to_name(pitch)} (P: {pitch}, Ch: {channel}) sent to backend.")
-                        notes_to_remove_from_on.append(note_idx)
-                
-                for note_idx in notes_to_remove_from_on:
-                    if note_idx in self.notes_on: # Check if still exists (can be cleared by stop)
-                        del self.notes_on[note_idx]
-
-                # Process note-ons
-                while (self.next_note_idx < len(self.notes) and
-                       current_time >= self.notes[self.next_note_idx].start):
-                    note = self.notes[self.next_note_idx]
-                    # Check if this note is already "on" from a previous iteration (e.g. due to very short sleep or fast tempo)
-                    # This check is more relevant if notes_on stores a boolean. Here it stores start time.
-                    # The main check is `current_time < note.end`.
-                    if current_time < note.end and self.next_note_idx not in self.notes_on:
-                        # Use default channel for now, instrument selection is separate
-                        channel_to_use = DEFAULT_MIDI_CHANNEL 
-                        self.player_backend.noteon(channel_to_use, note.pitch, note.velocity)
-                        if self.log_events:
-                            print(f"Note ON: {pretty_midi.note_number_to_name(note.pitch)} (P: {note.pitch}, V: {note.velocity}, Ch: {channel_to_use}) sent to backend.")
-                        self.notes_on[self.next_note_idx] = (note.pitch, channel_to_use)
-                    self.next_note_idx += 1
+            with self._wakeup:
+                while not self.stop_flag.is_set():
+                    timeline = self.timeline # Re-read each pass: update_notes() may swap it while we wait
+                    # Check if is_playing_flag (which might be a function call or list access) is false
+                    is_playing_check = self.is_playing_flag() if callable(self.is_playing_flag) else self.is_playing_flag[0]
+                    if not is_playing_check: # If playback was paused/stopped externally
+                        self._wakeup.wait(MAX_WAIT_SEC) # Idle until play/stop/seek wakes us
+                        continue
+
+                    if self._reattack_position is not None:
+                        self._reattack_sustained(self._reattack_position)
+                        self._reattack_position = None
+
+                    current_time = self.get_current_time()
+                    tempo_scale = max(0.1, self.get_tempo_scale())
+
+                    # Consume only the events whose time has passed (plus the lookahead window,
+                    # if any); the cost per tick depends on how many events are due, not on how
+                    # many notes are sounding.
+                    first = self.next_event_idx
+                    last = timeline.due(first, current_time + self.lookahead_sec * tempo_scale)
+                    base_tick = self.player_backend.sequencer_tick() if self.lookahead_sec else 0
+                    queued = self._queued
+                    while queued and queued[0][0] < base_tick - SEQUENCER_MARGIN_TICKS:
+                        queued.popleft() # Fired by now
+                    for event_idx in range(first, last):
+                        note_id = int(timeline.note_id[event_idx])
+                        pitch = int(timeline.pitch[event_idx])
+                        tick = 0 # Sequencer tick of the event, lookahead mode only
+                        if self.lookahead_sec:
+                            # Position -> sequencer tick at the current tempo (late events fire immediately)
+                            delay_sec = max(0.0, (timeline.times[event_idx] - current_time) / tempo_scale)
+                            tick = base_tick + int(round(delay_sec * SEQUENCER_TICKS_PER_SECOND))
+                        if timeline.kinds[event_idx] == EVENT_NOTE_ON:
+                            # Skip notes that already ended (e.g. the thread woke late)
+                            if current_time < timeline.note_end[event_idx] and note_id not in self.notes_on:
+                                channel_to_use = int(timeline.channel[event_idx]) # Program already set per channel
+                                velocity = int(timeline.velocity[event_idx])
+                                if self.lookahead_sec:
+                                    self.player_backend.schedule_noteon(tick, channel_to_use, pitch, velocity)
+                                    queued.append((tick, event_idx))
+                                else:
+                                    self.player_backend.noteon(channel_to_use, pitch, velocity)
+                                if self.log_events:
+                                    print(f"Note ON: {pretty_midi.note_number_to_name(pitch)} (P: {pitch}, V: {velocity}, Ch: {channel_to_use}) sent to backend.")
+                                self.notes_on[note_id] = (pitch, channel_to_use)
+                        else:
+                            sounding = self.notes_on.pop(note_id, None) # Only release notes we actually started
+                            if sounding is not None:
+                                if self.lookahead_sec:
+                                    self.player_backend.schedule_noteoff(tick, sounding[1], sounding[0])
+                                    queued.append((tick, event_idx))
+                                else:
+                                    self.player_backend.noteoff(sounding[1], sounding[0])
+                                if self.log_events:
+                                    print(f"Note OFF: {pretty_midi.note_number_to_name(pitch)} (P: {pitch}, Ch: {sounding[1]}) sent to backend.")
+                    self.next_event_idx = last
+                    if last > first:
+                        # Real seconds between handing an event over and its due time: lateness when
+                        # sending directly, lead (how far ahead the sequencer got it) when queuing
+                        offsets = (timeline.times[first:last] - current_time) / tempo_scale
+                        if self.lookahead_sec:
+                            telemetry.record_lead(offsets, self.lookahead_sec / 2)
+                        else:
+                            telemetry.record(-offsets)
                 
-                # If all notes have been scheduled and all playing notes have ended
-                if self.next_note_idx >= len(self.notes) and not self.notes_on:
-                    if self.log_events: print("NoteScheduler: All notes played.")
-                    if callable(self.is_playing_flag): self.is_playing_flag(False) # Signal end of playback
-                    else: self.is_playing_flag[0] = False
-                    break 
+                    # If all events have been dispatched and all playing notes have ended
+                    # (in lookahead mode, once the sequencer has also played the queued tail)
+                    if self.next_event_idx >= len(timeline) and not self.notes_on and current_time >= timeline.end_time:
+                        if self.log_events: print("NoteScheduler: All notes played.")
+                        if callable(self.is_playing_flag): self.is_playing_flag(False) # Signal end of playback
+                        else: self.is_playing_flag[0] = False
+                        break 
+
+                    next_time = timeline.time_at(self.next_event_idx)
+                    if next_time == float('inf') and current_time < timeline.end_time:
+                        next_time = timeline.end_time # Only the queued tail is left
+                    elif self.lookahead_sec:
+                        # Refill when the next event is half a window away, so the sequencer
+                        # always holds at least lookahead/2 of queued events.
+                        next_time -= self.lookahead_sec * tempo_scale / 2
+                    self._wait_for_event(next_time, current_time)
 
-                tempo_scale = self.get_tempo_scale()
-                sleep_duration = min(0.01, 0.005 / max(0.1, tempo_scale)) # Ensure tempo_scale isn't too small
-                time.sleep(sleep_duration)
+                    cpu_now = time.thread_time() # Counts the dispatch work and any busy-wait, not sleeps
+                    telemetry.record_loop(cpu_now - cpu_mark)
+                    cpu_mark = cpu_now
 
         except Exception as e:
             print(f"NoteScheduler: Error in playback loop: {e}")
         finally:
             # Ensure all notes are turned off when the thread exits or is stopped
             if self.player_backend:
+                self._cancel_queued()
                 self.player_backend.all_notes_off() # Use backend's all_notes_off
                 if self.log_events: print("NoteScheduler: All notes off sent to backend via player_backend.")
             if self.log_events: print("NoteScheduler: Playback thread finished.")
@@ -131,33 +213,257 @@ class NoteScheduler:
             # as the main controller should handle that. Only if playback naturally ends.
 
 
+    def _wait_for_event(self, event_time, current_time):
+        """
+        Blocks until event_time (in playback seconds) is due, or until wake() is called.
+        Must be called with self._wakeup held; the wait releases it.
+        """
+        tempo_scale = max(0.1, self.get_tempo_scale()) # Ensure tempo_scale isn't too small
+        wait_real_sec = (event_time - current_time) / tempo_scale
+        spin_threshold = 0.0 if self.lookahead_sec else self.spin_threshold # Sequencer does the precise timing
+        if wait_real_sec > spin_threshold:
+            if self._wakeup.wait(min(wait_real_sec - spin_threshold, MAX_WAIT_SEC)):
+                return # Woken early: state may have changed, let the loop re-evaluate
+        if spin_threshold > 0:
+            # The real-time bound keeps a paused clock from trapping us in the spin
+            spin_until = time.perf_counter() + self.spin_threshold
+            while (time.perf_counter() < spin_until and not self.stop_flag.is_set()
+                   and self.get_current_time() < event_time):
+                pass
+
     def stop_playback_thread(self):
         self.stop_flag.set()
+        self.wake() # Don't let the thread sleep through the stop request
         if self.playback_thread and self.playback_thread.is_alive():
             self.playback_thread.join(timeout=0.5) # Wait briefly for thread to exit
         self.playback_thread = None
         # Crucially, turn off any lingering notes if the backend is still valid
         if self.player_backend:
+            self._cancel_queued()
             self.player_backend.all_notes_off() # Use backend's all_notes_off
             if self.log_events: print("NoteScheduler: All notes off sent to backend on explicit stop.")
         if self.log_events: print("NoteScheduler: Playback thread explicitly stopped.")
 
+    def active_pitches(self, position: float) -> frozenset:
+        """
+        Pitches sounding at position, for highlighting the keyboard; cheap enough for the GUI timer.
+
+        In direct mode these are the notes the playback thread is holding on.
+        In lookahead mode notes_on is filled when an event is queued, up to
+        lookahead_sec before it sounds, and a note shorter than the refill
+        window is never in it, so the notes are looked up at position instead.
+        """
+        if self.lookahead_sec:
+            return self.pitches_at(position)
+        return frozenset(pitch for pitch, _ in self.notes_on.copy().values()) # Copy: the thread keeps mutating it
+
+    def pitches_at(self, position: float) -> frozenset:
+        """Pitches of the notes spanning position, from the interval index."""
+        notes = self.notes
+        return frozenset(notes.pitch[self.active_index.active_at(position)].tolist())
+
+    @property
+    def active_index(self) -> IntervalIndex:
+        """Interval index of the notes (sounding at a given time); rebuilt lazily after edits."""
+        active_index = self._active_index
+        if active_index is None:
+            active_index = self._active_index = IntervalIndex(self.notes.start, self.notes.end)
+        return active_index
+
     def update_notes(self, notes):
-        """Updates the notes for the scheduler. Playback should be stopped before calling this."""
-        if self.playback_thread and self.playback_thread.is_alive():
-            print("NoteScheduler: Warning - updating notes while playback thread is active. Stop playback first.")
-            self.stop_playback_thread() # Ensure it's stopped
-            
-        self.notes = sorted(notes, key=lambda note: note.start) if notes else []
-        self.next_note_idx = 0
-        self.notes_on = {}
+        """
+        Swaps in a new note set, also while the playback thread is running.
+
+        The new timeline and interval index are built before taking the lock,
+        so playback carries on meanwhile, and the swap itself is atomic. The
+        position is kept. Voices of notes that still sound the same in the new
+        set (same id, pitch and channel) carry on, the others are released,
+        and the thread attacks whatever the new set sustains across the
+        current position.
+        """
+        notes = as_note_buffer(notes).sorted()
+        notes.assign_ids()
+        timeline = EventTimeline(notes)
+        active_index = IntervalIndex(notes.start, notes.end)
+        with self._wakeup:
+            position = self.get_current_time()
+            self._withdraw_queued()
+            active = active_index.active_at(position)
+            self._release_voices(self._voices(notes.id[active], notes.pitch[active], notes.channel[active]))
+            self.notes = notes
+            self.timeline = timeline
+            self._active_index = active_index
+            self.channel_programs = notes.channel_programs()
+            self.next_event_idx = timeline.seek(position)
+            self._reattack_position = position # Notes starting before position are attacked by the thread
+            self._wakeup.notify_all()
+        if self._is_running():
+            self._apply_programs()
         if self.log_events: print(f"NoteScheduler: Notes updated. Count: {len(self.notes)}")
 
+    def apply_delta(self, delta):
+        """
+        Patches the notes with one NoteModel change, also while the playback thread is running.
+
+        Removed notes are looked up by start time and id and added ones are
+        inserted at their sorted positions, in the note copy and the event
+        timeline alike. The cursor moves by the number of events that landed
+        before it, so the position is kept. A sounding note that was removed
+        is released, unless it was only modified and still sounds the same.
+        An added note that should already be sounding is attacked right away;
+        later ones are picked up by the thread when they are due.
+        """
+        removed, added = delta.removed, delta.added
+        with self._wakeup:
+            position = self.get_current_time()
+            self._withdraw_queued()
+            if self.notes_on and len(removed):
+                still_sounding = (added.start <= position) & (added.end > position)
+                self._release_voices(self._voices(added.id[still_sounding], added.pitch[still_sounding],
+                                                  added.channel[still_sounding]),
+                                     candidates=removed.id.tolist())
+
+            self.notes.remove_at(self.notes.indices_of(removed))
+            self.notes.merge_sorted(added)
+            self._active_index = None # Rebuilt on the next query
+
+            cursor = self.next_event_idx
+            removed_positions = self.timeline.remove_notes(removed)
+            cursor -= int(np.count_nonzero(removed_positions < cursor))
+            events, positions = self.timeline.add_notes(added)
+            # Events landing before the first pending one, or at it but already past, count as played
+            behind = (positions < cursor) | ((positions == cursor) & (events['times'] < position))
+            self.next_event_idx = cursor + int(np.count_nonzero(behind))
+
+            if self._is_running():
+                # Inserted behind the cursor but still sounding: attack now instead of never
+                late = np.flatnonzero(behind & (events['kinds'] == EVENT_NOTE_ON) & (events['note_end'] > position))
+                for i in late.tolist():
+                    note_id = int(events['note_id'][i])
+                    if note_id not in self.notes_on:
+                        pitch, channel = int(events['pitch'][i]), int(events['channel'][i])
+                        self.player_backend.noteon(channel, pitch, int(events['velocity'][i]))
+                        self.notes_on[note_id] = (pitch, channel)
+
+            new_channels = set(added.channel_programs()) - set(self.channel_programs)
+            for channel, program in added.channel_programs().items():
+                self.channel_programs.setdefault(channel, program) # Channels already in use keep their program
+            if new_channels and self._is_running():
+                self._apply_programs()
+            self._wakeup.notify_all() # The next event may now be earlier than the one being waited for
+        if self.log_events: print(f"NoteScheduler: Notes patched (-{len(removed)} +{len(added)}). Count: {len(self.notes)}")
+
+    @staticmethod
+    def _voices(note_ids, pitches, channels) -> dict:
+        return dict(zip(note_ids.tolist(), zip(pitches.tolist(), channels.tolist())))
+
+    def _release_voices(self, keep: dict, candidates=None):
+        """
+        Sends note-offs for tracked voices, except those keep maps to the same (pitch, channel).
+
+        Args:
+            keep: {note_id: (pitch, channel)} of voices that may carry on
+            candidates: Note ids to consider; all tracked voices if None
+        """
+        note_ids = list(self.notes_on) if candidates is None else [i for i in candidates if i in self.notes_on]
+        for note_id in note_ids:
+            voice = self.notes_on[note_id]
+            if keep.get(note_id) != voice:
+                self.player_backend.noteoff(voice[1], voice[0])
+                del self.notes_on[note_id]
+
+    def _is_running(self) -> bool:
+        """True while the playback thread exists and is actively playing (not paused)."""
+        if not (self.playback_thread and self.playback_thread.is_alive()):
+            return False
+        return bool(self.is_playing_flag() if callable(self.is_playing_flag) else self.is_playing_flag[0])
+
+    def _reattack_sustained(self, position):
+        """
+        Starts the notes that began before position and are still sounding at it.
+
+        Called by the playback thread (lock held) after a seek or resume. The
+        interval index finds them in O(log n + k), however large the session.
+        Notes starting exactly at position are left to their own note-on event.
+        """
+        active = self.active_index.active_at(position)
+        active = active[self.notes.start[active] < position]
+        for note_idx in active.tolist():
+            note_id = int(self.notes.id[note_idx])
+            if note_id in self.notes_on:
+                continue
+            pitch = int(self.notes.pitch[note_idx])
+            channel = int(self.notes.channel[note_idx])
+            velocity = int(self.notes.velocity[note_idx])
+            self.player_backend.noteon(channel, pitch, velocity)
+            self.notes_on[note_id] = (pitch, channel)
+        if self.log_events and len(active):
+            print(f"NoteScheduler: Re-attacked {len(active)} sustained notes at {position:.2f}s.")
+
+    def resume(self, position_seconds):
+        """Re-attacks the notes sustained across a resume (pausing silenced them)."""
+        with self._wakeup:
+            self.notes_on = {} # Everything was cut by all-notes-off on pause
+            self._reattack_position = position_seconds
+            self._wakeup.notify_all()
+
+    def _apply_programs(self):
+        """Sends the program of every channel in use (user overrides win) to the backend in one batch."""
+        if self.player_backend and hasattr(self.player_backend, 'setup_channels'):
+            self.player_backend.setup_channels({**self.channel_programs, **self.program_overrides})
+
+    def _cancel_queued(self):
+        """Drops events already handed to the backend's sequencer (lookahead mode only)."""
+        if self.lookahead_sec and self.player_backend:
+            self.player_backend.cancel_scheduled()
+        self._queued.clear()
+
+    def requeue(self):
+        """
+        Withdraws events queued ahead of time and rewinds the cursor to the first of them.
+
+        Used when queued timestamps became wrong (pause, tempo change). Notes whose
+        note-on already fired stay tracked so their note-off is queued again.
+        In direct mode nothing is queued and this only wakes the thread.
+        """
+        with self._wakeup:
+            self._withdraw_queued()
+            self._wakeup.notify_all()
+
+    def _withdraw_queued(self):
+        """
+        requeue() without the wake-up; the caller holds self._wakeup.
+
+        What already fired is decided by the sequencer's own clock against the
+        tick each event was queued for, not by the transport position: the two
+        drift apart by up to an audio block, and an event taken for fired while
+        it was still queued would be lost (a note-off lost is a stuck note).
+        """
+        if not self.lookahead_sec:
+            return
+        fired_before = self.player_backend.sequencer_tick() - SEQUENCER_MARGIN_TICKS
+        withdrawn = sorted(event_idx for tick, event_idx in self._queued if tick >= fired_before)
+        self._cancel_queued()
+        if not withdrawn:
+            return
+        timeline = self.timeline
+        # Note-offs first: a note whose note-on was withdrawn as well must end up not sounding
+        for event_idx in withdrawn:
+            if timeline.kinds[event_idx] != EVENT_NOTE_ON:
+                note_id = int(timeline.note_id[event_idx])
+                self.notes_on[note_id] = (int(timeline.pitch[event_idx]), int(timeline.channel[event_idx]))
+        for event_idx in withdrawn:
+            if timeline.kinds[event_idx] == EVENT_NOTE_ON:
+                self.notes_on.pop(int(timeline.note_id[event_idx]), None) # Its note-on never fired
+        # Events after the first withdrawn one that did fire are skipped again by the notes_on checks
+        self.next_event_idx = min(self.next_event_idx, withdrawn[0])
+
     def reset_playback_position(self, position_seconds=0.0):
-        """Resets the scheduler's internal pointers to a given time, typically 0."""
-        self.next_note_idx = 0
-        while self.next_note_idx < len(self.notes) and \
-              self.notes[self.next_note_idx].start < position_seconds:
-            self.next_note_idx += 1
-        self.notes_on = {} # Clear any tracked 'on' notes
-        if self.log_events: print(f"NoteScheduler: Playback position reset to {position_seconds}s. Next note index: {self.next_note_idx}")
+        """Resets the scheduler's internal pointers to a given time, typically 0 (binary search)."""
+        with self._wakeup:
+            self._cancel_queued()
+            self.next_event_idx = self.timeline.seek(position_seconds)
+            self.notes_on = {} # Clear any tracked 'on' notes
+            self._reattack_position = position_seconds # Picked up by the thread once playing
+            self._wakeup.notify_all()
+        if self.log_events: print(f"NoteScheduler: Playback position reset to {position_seconds}s. Next event index: {self.next_event_idx}")
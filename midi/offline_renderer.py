@@ -0,0 +1,144 @@
+import os
+import wave
+import numpy as np
+import fluidsynth
+from note_buffer import as_note_buffer
+from .event_timeline import EventTimeline, EVENT_NOTE_ON
+from .fluidsynth_player import DEFAULT_SOUNDFONT_RELATIVE_PATH
+from config.constants import DRUM_CHANNEL
+from utils import get_resource_path
+
+try:
+    import soundfile # Optional: only needed for FLAC output
+except ImportError:
+    soundfile = None
+
+DEFAULT_SAMPLE_RATE = 44100
+DEFAULT_RENDER_GAIN = 0.5
+RENDER_BLOCK_FRAMES = 8192 # Frames pulled from the synth per call when no event falls inside the block
+RELEASE_TAIL_SEC = 1.5 # Rendered after the last note-off so releases and reverb can decay
+AUDIO_CHANNELS = 2 # get_samples() returns interleaved stereo
+
+
+class OfflineRenderer:
+    """
+    Renders notes to PCM without an audio driver, as fast as the CPU allows.
+
+    The synth is never started; instead blocks are pulled with get_samples()
+    while the note timeline is advanced in sample time, so every note-on/off
+    lands on its exact frame. Output is streamed block by block, so memory use
+    stays bounded however long the render is.
+    """
+
+    def __init__(self, soundfont_path: str | None = None, sample_rate: int = DEFAULT_SAMPLE_RATE,
+                 gain: float = DEFAULT_RENDER_GAIN):
+        self.fs = None
+        self.sample_rate = int(sample_rate)
+        self.soundfont_path = soundfont_path or get_resource_path(DEFAULT_SOUNDFONT_RELATIVE_PATH)
+        if not os.path.exists(self.soundfont_path):
+            raise FileNotFoundError(f"SoundFont file not found at '{self.soundfont_path}'")
+
+        self.fs = fluidsynth.Synth(gain=gain, samplerate=self.sample_rate)
+        self.soundfont_id = self.fs.sfload(self.soundfont_path)
+        if self.soundfont_id == fluidsynth.FLUID_FAILED:
+            self.fs.delete()
+            self.fs = None
+            raise RuntimeError(f"Failed to load SoundFont from '{self.soundfont_path}'")
+
+    def set_instrument(self, channel: int, program: int):
+        """Selects a program on a channel; same argument order as FluidSynthPlayer.set_instrument()."""
+        if not 0 <= program <= 127:
+            raise ValueError(f"Invalid program number: {program}")
+        bank_num = 128 if channel == DRUM_CHANNEL else 0 # GM drum kits live in bank 128
+        self._synth().program_select(channel, self.soundfont_id, bank_num, program)
+
+    def render_blocks(self, notes, tempo_bpm: float = 120.0, program_overrides: dict | None = None):
+        """
+        Generator over the rendered audio.
+
+        Args:
+            notes: NoteBuffer or list of pretty_midi.Note objects
+            tempo_bpm: Playback tempo; note times are seconds at 120 BPM, as in live playback
+            program_overrides: {channel: program} replacing the programs the notes carry
+
+        Yields:
+            int16 arrays of shape (frames, 2)
+        """
+        if tempo_bpm <= 0:
+            raise ValueError(f"BPM must be positive, got {tempo_bpm}")
+        fs = self._synth()
+        notes = as_note_buffer(notes)
+        timeline = EventTimeline(notes)
+        seconds_per_position = 120.0 / tempo_bpm
+        event_frames = np.round(timeline.times * seconds_per_position * self.sample_rate).astype(np.int64)
+        total_frames = int(round((timeline.end_time * seconds_per_position + RELEASE_TAIL_SEC) * self.sample_rate))
+
+        for channel in range(16):
+            fs.cc(channel, 120, 0) # All Sound Off, in case an earlier render was abandoned midway
+        for channel, program in {**notes.channel_programs(), **(program_overrides or {})}.items():
+            self.set_instrument(channel, program)
+        cursor = 0
+        frame = 0
+        while frame < total_frames:
+            # Apply every event due at this frame, then render up to the next event (or a full block)
+            while cursor < len(timeline) and event_frames[cursor] <= frame:
+                pitch = int(timeline.pitch[cursor])
+                channel = int(timeline.channel[cursor])
+                if timeline.kinds[cursor] == EVENT_NOTE_ON:
+                    fs.noteon(channel, pitch, int(timeline.velocity[cursor]))
+                else:
+                    fs.noteoff(channel, pitch)
+                cursor += 1
+            block_end = min(frame + RENDER_BLOCK_FRAMES, total_frames)
+            if cursor < len(timeline):
+                block_end = min(block_end, int(event_frames[cursor]))
+            samples = fs.get_samples(block_end - frame)
+            yield np.asarray(samples, dtype=np.int16).reshape(-1, AUDIO_CHANNELS)
+            frame = block_end
+
+    def render_to_file(self, notes, filename: str, tempo_bpm: float = 120.0, audio_format: str | None = None,
+                       program_overrides: dict | None = None) -> str:
+        """
+        Render notes straight to an audio file.
+
+        Args:
+            notes: NoteBuffer or list of pretty_midi.Note objects
+            filename: Destination path
+            tempo_bpm: Playback tempo in BPM
+            audio_format: 'wav' or 'flac'; taken from the file extension if omitted
+            program_overrides: {channel: program} replacing the programs the notes carry
+
+        Returns:
+            Absolute path of the written file
+        """
+        audio_format = (audio_format or os.path.splitext(filename)[1].lstrip('.') or 'wav').lower()
+        if audio_format == 'wav':
+            with wave.open(filename, 'wb') as out:
+                out.setnchannels(AUDIO_CHANNELS)
+                out.setsampwidth(2) # 16-bit PCM, what get_samples() produces
+                out.setframerate(self.sample_rate)
+                for block in self.render_blocks(notes, tempo_bpm, program_overrides):
+                    out.writeframes(block.tobytes())
+        elif audio_format == 'flac':
+            if soundfile is None:
+                raise RuntimeError("FLAC output requires the 'soundfile' package (pip install soundfile)")
+            with soundfile.SoundFile(filename, 'w', samplerate=self.sample_rate,
+                                     channels=AUDIO_CHANNELS, subtype='PCM_16', format='FLAC') as out:
+                for block in self.render_blocks(notes, tempo_bpm, program_overrides):
+                    out.write(block)
+        else:
+            raise ValueError(f"Unsupported audio format: {audio_format}")
+        return os.path.abspath(filename)
+
+    def _synth(self) -> fluidsynth.Synth:
+        if self.fs is None:
+            raise RuntimeError("OfflineRenderer has been cleaned up")
+        return self.fs
+
+    def cleanup(self):
+        if self.fs:
+            self.fs.delete()
+            self.fs = None
+
+    def __del__(self):
+        self.cleanup()
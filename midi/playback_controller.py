@@ -1,17 +1,36 @@
-import time
 import threading
+import pygame.mixer
 # import pygame.midi # pygame.midi might not be directly used if FluidSynth is primary
 import pretty_midi # For Note object type hint
 # from .device_manager import DeviceManager # DeviceManager might be less relevant for FluidSynth
 from .note_scheduler import NoteScheduler
 # from .midi_event_utils import send_all_notes_off # Will use FluidSynthPlayer's method
 from .fluidsynth_player import FluidSynthPlayer # Import FluidSynthPlayer
-from config.constants import DEFAULT_MIDI_PROGRAM, DEFAULT_MIDI_CHANNEL # For default instrument
+from .transport_clock import TransportClock
+from .scheduler_telemetry import SchedulerTelemetry
+from .render_cache import RenderCache, render_cache_key, default_cache_dir
+from .offline_renderer import OfflineRenderer
+from .cached_take_stream import CachedTakeStream
+from note_buffer import NoteBuffer, as_note_buffer
+from config.constants import DEFAULT_MIDI_PROGRAM, DEFAULT_MIDI_CHANNEL, PLAYBACK_LOOKAHEAD_SEC # For default instrument
+from config.constants import (RENDER_CACHE_ENABLED, RENDER_CACHE_MEMORY_BUDGET_MB,
+                              RENDER_CACHE_DISK_BUDGET_MB, RENDER_CACHE_SAMPLE_RATE)
+
+# Synth gain cached takes are rendered at. Live playback sets synth.gain to 2.0 * volume
+# (FluidSynthPlayer.set_gain), and FluidSynth's gain is a linear factor on the output
+# samples, as is the pygame channel volume a take is played at. Rendering at the 100%
+# slider's gain and playing at master_volume therefore gives 2.0 * volume, as loud as the
+# live synth at the same slider position, and volume changes don't invalidate renders.
+CACHE_RENDER_GAIN = 2.0
+
+
+class _RenderCancelled(Exception):
+    """Raised inside a background render when playback starts again."""
 
 class PlaybackController:
     """Controls MIDI playback, managing state, device, and note scheduling, now using FluidSynth."""
 
-    def __init__(self):
+    def __init__(self, lookahead_sec: float = PLAYBACK_LOOKAHEAD_SEC, use_render_cache: bool = RENDER_CACHE_ENABLED):
         # self.device_manager = DeviceManager() # Pygame MIDI device manager
         self.fluidsynth_player = FluidSynthPlayer() # Initialize FluidSynth backend
         
@@ -21,16 +40,24 @@ class PlaybackController:
         else:
             print("PlaybackController: FluidSynthPlayer initialized successfully.")
 
-        self.notes = []
+        # Queue notes into FluidSynth's sequencer ahead of time when it is available;
+        # otherwise the scheduler thread sends every note the moment it is due.
+        self.lookahead_sec = 0.0
+        if lookahead_sec > 0 and self.fluidsynth_player.enable_sequencer():
+            self.lookahead_sec = lookahead_sec
+            print(f"PlaybackController: Sequencer lookahead enabled ({self.lookahead_sec * 1000:.0f} ms).")
+
+        self.notes = NoteBuffer()
         self._is_playing_internal = False
         self.paused = False
-        self.current_playback_time_sec = 0.0 # Time from start of current playback segment
-        self.playback_start_real_time = 0.0  # time.time() when playback (re)started
-        self.pause_start_time_sec = 0.0 # Stores current_playback_time_sec when paused
 
         self.tempo_bpm = 120.0
         self.tempo_scale_factor = 1.0 # (current_bpm / 120.0)
 
+        # Single source of truth for the playback position (scheduler, UI timer, transport slider)
+        self.clock = TransportClock(self.tempo_bpm)
+        self.telemetry = SchedulerTelemetry() # Filled by the scheduler thread, read by get_scheduler_stats()
+
         self.stop_flag = threading.Event()
         
         # The NoteScheduler needs a way to know if it should be actively processing.
@@ -42,6 +69,27 @@ class PlaybackController:
         self.log_events = True # For debugging
         
         self.master_volume: float = 0.5 # Default volume 50% (0.0 to 1.0)
+        # {channel: program} picked in the UI, overriding the programs the notes carry.
+        # Shared with the scheduler and part of the render cache key.
+        self.program_overrides = {}
+
+        # Replaying an unchanged note set (same notes, instrument, tempo) streams pre-rendered PCM
+        # through pygame.mixer instead of synthesizing it again. A miss plays live as usual; the
+        # take is rendered for next time only once the transport is idle (stopped or paused) with
+        # the same note set, and that render is abandoned as soon as playback starts again, so
+        # it never competes with the real-time scheduler for CPU.
+        self.render_cache = None
+        if use_render_cache and self.fluidsynth_player.soundfont_id is not None:
+            try:
+                self.render_cache = RenderCache(default_cache_dir(),
+                                                RENDER_CACHE_MEMORY_BUDGET_MB * 1024 * 1024,
+                                                RENDER_CACHE_DISK_BUDGET_MB * 1024 * 1024)
+            except OSError as e:
+                print(f"PlaybackController: Render cache unavailable: {e}")
+        self._cached_stream = None # CachedTakeStream of the cached take being played
+        self._render_thread = None
+        self._render_cancel = threading.Event() # Set to abandon the background render
+        self._render_pending_key = None # Cache key of the last miss, rendered when idle
 
         # Set default instrument and initial volume on FluidSynthPlayer
         if self.fluidsynth_player and self.fluidsynth_player.fs:
@@ -67,29 +115,51 @@ class PlaybackController:
             self.note_scheduler = NoteScheduler(
                 notes=self.notes,
                 player_backend=self.fluidsynth_player, # Pass FluidSynthPlayer instance
-                get_current_time_func=self.get_current_position,
-                tempo_scale_func=lambda: self.tempo_scale_factor,
+                get_current_time_func=self.clock.position,
+                tempo_scale_func=self.clock.tempo_scale,
                 stop_flag=self.stop_flag,
-                is_playing_flag=self._is_playing_for_scheduler
+                is_playing_flag=self._is_playing_for_scheduler,
+                lookahead_sec=self.lookahead_sec,
+                program_overrides=self.program_overrides,
+                telemetry=self.telemetry
             )
             if self.log_events: print("PlaybackController: NoteScheduler created with FluidSynthPlayer.")
-        elif self.note_scheduler:
-             # If scheduler exists, ensure its notes are current
-             self.note_scheduler.update_notes(self.notes)
+        # An existing scheduler is kept current by set_notes() and apply_note_delta()
 
 
-    def set_notes(self, notes: list[pretty_midi.Note]):
-        if self.log_events: print(f"PlaybackController: Setting {len(notes)} notes.")
-        self.stop() # Stop current playback before changing notes
-        self.notes = notes if notes else []
-        self.current_playback_time_sec = 0.0
-        self.pause_start_time_sec = 0.0
+    def set_notes(self, notes: NoteBuffer):
+        """Replaces the notes; playback, if running, carries on from the same position."""
+        self.notes = as_note_buffer(notes)
+        if self.log_events: print(f"PlaybackController: Setting {len(self.notes)} notes.")
         if self.note_scheduler:
-            self.note_scheduler.update_notes(self.notes)
-            self.note_scheduler.reset_playback_position(0.0)
+            self.note_scheduler.update_notes(self.notes) # Swapped under the running thread, no restart
+            self._notes_edited()
         else:
             self._ensure_scheduler() # Create scheduler if it wasn't there
 
+    def apply_note_delta(self, delta):
+        """
+        Applies one NoteModel edit to the scheduler, also during playback.
+
+        self.notes is the model's own buffer and already includes the edit; the
+        scheduler patches its copy and event timeline in place.
+        """
+        if self.log_events: print(f"PlaybackController: Applying note delta {delta}.")
+        if self.note_scheduler:
+            self.note_scheduler.apply_delta(delta)
+            self._notes_edited()
+        else:
+            self._ensure_scheduler()
+
+    def _notes_edited(self):
+        """A cached take no longer matches the notes; continue live from the same position."""
+        if self._cached_stream is None:
+            return
+        if self.paused:
+            self._stop_cached_playback() # play() picks live or a fresh cache hit on resume
+        else:
+            self._restart_output()
+
     def play(self):
         if self.log_events: print(f"PlaybackController: Play called. Currently playing: {self._is_playing_internal}, Paused: {self.paused}")
         if not self.notes:
@@ -104,21 +174,31 @@ class PlaybackController:
         if self._is_playing_internal and not self.paused: # Already playing
             return
 
+        self._cancel_background_render() # Live playback gets the CPU to itself
         self.stop_flag.clear()
         self._is_playing_internal = True
         self._is_playing_for_scheduler[0] = True # Update shared flag for scheduler
 
-        if self.paused: # Resuming
-            # Adjust start time to account for pause duration
-            self.playback_start_real_time = time.time() - self.pause_start_time_sec / self.tempo_scale_factor
+        if self.paused: # Resuming; the clock is frozen at the pause position
             self.paused = False
-            if self.log_events: print(f"PlaybackController: Resuming from {self.pause_start_time_sec:.2f}s.")
+            if self.log_events: print(f"PlaybackController: Resuming from {self.clock.position():.2f}s.")
+            self.clock.start()
+            if self._cached_stream is not None:
+                self._cached_stream.unpause()
+                return
+            live_thread = self.note_scheduler.playback_thread
+            if not (live_thread and live_thread.is_alive()) and self._start_cached_playback():
+                return # Seeked while paused on a cached take
+            self.note_scheduler.resume(self.clock.position())
         else: # Starting new or from a seek
-            self.playback_start_real_time = time.time() - self.current_playback_time_sec / self.tempo_scale_factor
-            self.note_scheduler.reset_playback_position(self.current_playback_time_sec)
-            if self.log_events: print(f"PlaybackController: Starting playback from {self.current_playback_time_sec:.2f}s.")
+            self.note_scheduler.reset_playback_position(self.clock.position())
+            if self.log_events: print(f"PlaybackController: Starting playback from {self.clock.position():.2f}s.")
+            self.clock.start()
+            if self._start_cached_playback():
+                return
         
         self.note_scheduler.start_playback_thread()
+        self.note_scheduler.wake() # A paused thread is idle on its condition; let it resume now
 
 
     def pause(self):
@@ -129,13 +209,18 @@ class PlaybackController:
             self._is_playing_for_scheduler[0] = False
             # self.note_scheduler.stop_playback_thread() # Not stopping thread, just pausing its activity
             
-            self.pause_start_time_sec = self.get_current_position() # Store accurate pause time
-            if self.log_events: print(f"PlaybackController: Paused at {self.pause_start_time_sec:.2f}s.")
+            self.clock.pause() # Freezes the position for resume
+            if self.log_events: print(f"PlaybackController: Paused at {self.clock.position():.2f}s.")
+            if self._cached_stream is not None:
+                self._cached_stream.pause()
+            if self.note_scheduler:
+                self.note_scheduler.requeue() # Drop queued events and cut short any wait
             
             # Send all notes off when pausing using FluidSynthPlayer
             if self.fluidsynth_player and self.fluidsynth_player.fs:
                 self.fluidsynth_player.all_notes_off()
                 if self.log_events: print("PlaybackController: All notes off sent to FluidSynthPlayer on pause.")
+            self._render_pending_when_idle()
         
 
     def stop(self):
@@ -143,14 +228,15 @@ class PlaybackController:
         self._is_playing_internal = False
         self._is_playing_for_scheduler[0] = False
         self.paused = False
+        self._stop_cached_playback()
         
         if self.note_scheduler:
             self.note_scheduler.stop_playback_thread() # This will also send all notes off
         
-        self.current_playback_time_sec = 0.0
-        self.pause_start_time_sec = 0.0
+        self.clock.stop() # Also rewinds to 0
         if self.note_scheduler: # Reset scheduler's internal state too
             self.note_scheduler.reset_playback_position(0.0)
+        self._render_pending_when_idle()
 
 
     def seek(self, position_sec: float):
@@ -161,31 +247,47 @@ class PlaybackController:
             self.fluidsynth_player.all_notes_off()
             if self.log_events: print("PlaybackController: All notes off sent to FluidSynthPlayer on seek.")
 
-        self.current_playback_time_sec = max(0.0, position_sec)
-        self.pause_start_time_sec = self.current_playback_time_sec # If paused, resume from here
+        # Re-anchoring the clock works the same whether playing, paused or stopped
+        self.clock.seek(max(0.0, position_sec))
+        self._stop_cached_playback() # A cached take restarts from the new offset on play/below
 
         if self.note_scheduler:
-            self.note_scheduler.reset_playback_position(self.current_playback_time_sec)
-
-        # If it was playing, need to restart the thread from the new position
-        # or if paused, update the resume point.
-        if self._is_playing_internal or self.paused:
-            self.playback_start_real_time = time.time() - self.current_playback_time_sec / self.tempo_scale_factor
-            if self._is_playing_internal and not self.paused and self.note_scheduler: # Was playing, restart thread
-                # self.note_scheduler.stop_playback_thread() # Stop existing - handled by start_playback_thread if needed
-                self.note_scheduler.start_playback_thread() # Start new from current pos
+            self.note_scheduler.reset_playback_position(self.clock.position())
+
+        # If it was playing, make sure the output is running from the new position
+        if self._is_playing_internal and not self.paused and self.note_scheduler:
+            self._restart_output()
         
-        if self.log_events: print(f"PlaybackController: Seek complete. Current time: {self.current_playback_time_sec:.2f}s")
+        if self.log_events: print(f"PlaybackController: Seek complete. Current time: {self.clock.position():.2f}s")
 
 
     def get_current_position(self) -> float:
-        if self._is_playing_internal and not self.paused:
-            elapsed_real_time = time.time() - self.playback_start_real_time
-            self.current_playback_time_sec = elapsed_real_time * self.tempo_scale_factor
-            return self.current_playback_time_sec
-        elif self.paused:
-            return self.pause_start_time_sec 
-        return self.current_playback_time_sec # Stopped or not yet played
+        return self.clock.position()
+
+    def get_active_pitches(self) -> frozenset:
+        """Pitches sounding at the current position, for highlighting the keyboard."""
+        if not self.is_playing or not self.note_scheduler:
+            return frozenset()
+        position = self.clock.position()
+        if self._cached_stream is not None:
+            # A cached take has no live thread holding notes; look them up at the clock position instead
+            return self.note_scheduler.pitches_at(position)
+        return self.note_scheduler.active_pitches(position)
+
+    def get_scheduler_stats(self) -> dict:
+        """Rolling lateness percentiles, missed deadlines and loop CPU time of the note scheduler."""
+        return self.telemetry.snapshot()
+
+    def reset_scheduler_stats(self):
+        self.telemetry.reset()
+
+    def tick(self):
+        """Called from the UI playback timer; ends playback once a cached take has played to its end."""
+        if self._cached_stream is not None and not self.paused and self._cached_stream.finished():
+            # The scheduler signals the end itself for live playback
+            self._stop_cached_playback()
+            self._is_playing_internal = False
+            self._is_playing_for_scheduler[0] = False
 
     @property
     def is_playing(self) -> bool:
@@ -193,6 +295,11 @@ class PlaybackController:
         # which might differ slightly from the scheduler thread's instantaneous state.
         return self._is_playing_internal and not self.paused
 
+    @property
+    def is_cached_playback(self) -> bool:
+        """True while audio comes from the render cache rather than live synthesis."""
+        return self._cached_stream is not None
+
     def toggle_playback(self):
         """Toggles playback between play and pause."""
         if self.is_playing:
@@ -210,20 +317,23 @@ class PlaybackController:
         
         if self.log_events: print(f"PlaybackController: Setting tempo to {bpm} BPM.")
         
-        current_pos_before_tempo_change = self.get_current_position()
-        
         self.tempo_bpm = float(bpm)
         self.tempo_scale_factor = self.tempo_bpm / 120.0
         
-        # Adjust start time to maintain current logical position with new tempo
-        if self._is_playing_internal or self.paused:
-             self.playback_start_real_time = time.time() - (current_pos_before_tempo_change / self.tempo_scale_factor)
+        # Starts a new tempo segment; the current position is kept exactly
+        self.clock.set_tempo(self.tempo_bpm)
+        if self.note_scheduler:
+            self.note_scheduler.requeue() # Queued timestamps and the pending wait used the old tempo
+        if self._cached_stream is not None:
+            self._restart_output() # The cached take was rendered at the old tempo
         
         if self.log_events: print(f"PlaybackController: Tempo scale factor: {self.tempo_scale_factor}")
 
     def cleanup(self):
         """Clean up resources, especially the MIDI device."""
         if self.log_events: print("PlaybackController: Cleanup called.")
+        self._render_pending_key = None # No point starting a render on the way out
+        self._cancel_background_render()
         self.stop() # Ensure playback is stopped and thread joined
         
         if self.fluidsynth_player:
@@ -239,6 +349,9 @@ class PlaybackController:
             if self.log_events: 
                 print(f"PlaybackController: Setting instrument to program {program_num} on channel {channel}.")
             self.fluidsynth_player.set_instrument(channel, program_num)
+            self.program_overrides[channel] = program_num # Also re-applied whenever playback starts
+            if self._cached_stream is not None:
+                self._restart_output() # The cached take used the old instrument
         else:
             if self.log_events:
                 print("PlaybackController: Cannot set instrument, FluidSynthPlayer not available.")
@@ -252,8 +365,115 @@ class PlaybackController:
             if self.log_events:
                 print(f"PlaybackController: Setting master volume to {self.master_volume:.2f}")
             self.fluidsynth_player.set_gain(self.master_volume)
+            if self._cached_stream is not None:
+                self._cached_stream.set_volume(self.master_volume)
         elif self.log_events:
             print("PlaybackController: Cannot set master volume, FluidSynthPlayer or set_gain method not available.")
 
+    # --- Render cache playback ---
+
+    def _render_cache_key(self) -> str:
+        return render_cache_key(self.notes, self.program_overrides, self.tempo_bpm,
+                                self.fluidsynth_player.soundfont_path, RENDER_CACHE_SAMPLE_RATE)
+
+    def _init_mixer(self) -> bool:
+        """Opens pygame.mixer in the cache's PCM format; False if audio output is unavailable."""
+        try:
+            if not pygame.mixer.get_init():
+                pygame.mixer.init(frequency=RENDER_CACHE_SAMPLE_RATE, size=-16, channels=2)
+            return pygame.mixer.get_init() == (RENDER_CACHE_SAMPLE_RATE, -16, 2)
+        except pygame.error as e:
+            if self.log_events: print(f"PlaybackController: pygame.mixer unavailable, cached playback disabled: {e}")
+            self.render_cache = None
+            return False
+
+    def _start_cached_playback(self) -> bool:
+        """
+        Plays the current note set from the render cache, starting at the clock position.
+
+        Returns:
+            False on a cache miss (a background render is started instead); the
+            caller then falls back to live synthesis
+        """
+        if not self.render_cache or not self._init_mixer():
+            return False
+        key = self._render_cache_key()
+        pcm = self.render_cache.get(key)
+        if pcm is None:
+            self._render_pending_key = key # Rendered once the transport is idle
+            return False
+        # Clock positions are seconds at 120 BPM; the take was rendered at the current tempo
+        frame = int(self.clock.position() / self.clock.tempo_scale() * RENDER_CACHE_SAMPLE_RATE)
+        stream = CachedTakeStream(pcm, frame, RENDER_CACHE_SAMPLE_RATE, volume=self.master_volume)
+        if not stream.start():
+            return False
+        self._cached_stream = stream
+        if self.log_events: print(f"PlaybackController: Playing cached render {key[:12]} from frame {frame}.")
+        return True
+
+    def _stop_cached_playback(self):
+        if self._cached_stream is not None:
+            self._cached_stream.stop()
+        self._cached_stream = None
+
+    def _restart_output(self):
+        """Re-picks cached or live output at the clock position (after seek, tempo or instrument changes)."""
+        self._stop_cached_playback()
+        if self.note_scheduler is None:
+            return # FluidSynth is unavailable, nothing to play either way
+        if self._start_cached_playback():
+            self.note_scheduler.stop_playback_thread()
+            return
+        self.stop_flag.clear()
+        self.note_scheduler.reset_playback_position(self.clock.position())
+        self.note_scheduler.start_playback_thread() # No-op if the thread is already alive
+        self.note_scheduler.wake()
+
+    def _render_pending_when_idle(self):
+        """Starts the render of the last missed take if the notes are still the ones that missed."""
+        key = self._render_pending_key
+        if key is None or self.render_cache is None or key != self._render_cache_key():
+            return # Nothing missed, or the notes, instrument or tempo changed since
+        self._render_pending_key = None
+        self._render_in_background(key)
+
+    def _cancel_background_render(self):
+        if self._render_thread and self._render_thread.is_alive():
+            self._render_cancel.set()
+
+    def _render_in_background(self, key: str):
+        """Renders the current note set into the cache on a worker thread (one render at a time)."""
+        cache = self.render_cache
+        if cache is None or (self._render_thread and self._render_thread.is_alive()):
+            return
+        cancel = self._render_cancel = threading.Event()
+        notes = self.notes.copy() # The UI may replace or edit notes while we render
+        program_overrides = dict(self.program_overrides)
+        tempo_bpm = self.tempo_bpm
+        soundfont_path = self.fluidsynth_player.soundfont_path
+
+        def blocks(renderer):
+            for block in renderer.render_blocks(notes, tempo_bpm, program_overrides):
+                if cancel.is_set():
+                    raise _RenderCancelled()
+                yield block
+
+        def render():
+            try:
+                renderer = OfflineRenderer(soundfont_path, sample_rate=RENDER_CACHE_SAMPLE_RATE,
+                                           gain=CACHE_RENDER_GAIN)
+                try:
+                    cache.put(key, blocks(renderer))
+                finally:
+                    renderer.cleanup()
+                if self.log_events: print(f"PlaybackController: Cached render {key[:12]} ready.")
+            except _RenderCancelled: # The next miss marks the take for rendering again
+                if self.log_events: print(f"PlaybackController: Background render {key[:12]} abandoned.")
+            except Exception as e:
+                print(f"PlaybackController: Background render failed: {e}")
+
+        self._render_thread = threading.Thread(target=render, daemon=True)
+        self._render_thread.start()
+
     def __del__(self):
         self.cleanup()
@@ -0,0 +1,187 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from note_buffer import as_note_buffer
+
+PCM_DTYPE = np.int16 # Same layout OfflineRenderer produces: interleaved 16-bit stereo
+PCM_CHANNELS = 2
+CACHE_FILE_SUFFIX = ".pcm"
+
+
+def default_cache_dir() -> str:
+    """Per-user cache directory for rendered audio (honours XDG_CACHE_HOME)."""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'midi-gen', 'renders')
+
+
+def render_cache_key(notes, program_overrides: dict, tempo_bpm: float, soundfont_path: str, sample_rate: int) -> str:
+    """
+    Content hash of everything that affects a render.
+
+    Only audible note fields are hashed (selection flags are not), and the
+    SoundFont is identified by path, size and modification time so replacing
+    the file invalidates its renders.
+
+    Returns:
+        Hex SHA-256 digest used as the cache key / file name
+    """
+    data = as_note_buffer(notes).sorted().data
+    digest = hashlib.sha256()
+    digest.update(len(data).to_bytes(8, 'little'))
+    for column in ('start', 'end', 'pitch', 'velocity', 'channel', 'program'):
+        digest.update(np.ascontiguousarray(data[column]).tobytes())
+    try:
+        stat = os.stat(soundfont_path)
+        soundfont_id = f"{os.path.abspath(soundfont_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    except OSError:
+        soundfont_id = str(soundfont_path)
+    overrides = sorted((int(channel), int(program)) for channel, program in program_overrides.items())
+    digest.update(f"|{overrides}|{float(tempo_bpm)!r}|{int(sample_rate)}|{soundfont_id}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+class RenderCache:
+    """
+    Content-addressed store of pre-rendered PCM, one raw file per key.
+
+    Files are opened as read-only np.memmap arrays of shape (frames, 2), so a
+    hit costs no synthesis and only the pages actually played are read. Two
+    LRU budgets apply: memory_budget_bytes bounds how much PCM stays mapped,
+    disk_budget_bytes bounds the files kept in cache_dir. Files already on
+    disk are picked up on start, oldest-used first.
+    """
+
+    def __init__(self, cache_dir: str, memory_budget_bytes: int, disk_budget_bytes: int):
+        self.cache_dir = cache_dir
+        self.memory_budget_bytes = memory_budget_bytes
+        self.disk_budget_bytes = disk_budget_bytes
+        self._lock = threading.Lock()
+        self._mapped = OrderedDict() # key -> np.memmap, least recently used first
+        self._mapped_bytes = 0
+        self._files = OrderedDict() # key -> file size, least recently used first
+        self._disk_bytes = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        entries = []
+        for name in os.listdir(cache_dir):
+            path = os.path.join(cache_dir, name)
+            if name.endswith(CACHE_FILE_SUFFIX):
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, name[:-len(CACHE_FILE_SUFFIX)], stat.st_size))
+            elif '.tmp' in name:
+                self._remove_file(path) # Leftover from an interrupted render
+        for _, key, size in sorted(entries):
+            self._files[key] = size
+            self._disk_bytes += size
+        with self._lock:
+            self._enforce_disk_budget()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + CACHE_FILE_SUFFIX)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._files
+
+    def get(self, key: str) -> np.ndarray | None:
+        """Memory-mapped PCM for key, or None on a miss."""
+        with self._lock:
+            if key not in self._files:
+                return None
+            self._files.move_to_end(key)
+            pcm = self._mapped.get(key)
+            if pcm is not None:
+                self._mapped.move_to_end(key)
+                return pcm
+            path = self._path(key)
+            try:
+                os.utime(path) # Keeps the LRU order across restarts
+                pcm = np.memmap(path, dtype=PCM_DTYPE, mode='r').reshape(-1, PCM_CHANNELS)
+            except (OSError, ValueError) as e:
+                print(f"RenderCache: Dropping unreadable entry {key[:12]}: {e}")
+                self._forget(key)
+                return None
+            self._mapped[key] = pcm
+            self._mapped_bytes += pcm.nbytes
+            self._enforce_memory_budget(keep=key)
+            return pcm
+
+    def put(self, key: str, blocks) -> np.ndarray | None:
+        """
+        Stores a render streamed from an iterable of int16 (frames, 2) blocks.
+
+        If the iterable raises, the partial file is removed and the exception
+        propagates.
+
+        Returns:
+            The memory-mapped PCM, or None if it could not be written
+        """
+        final_path = self._path(key)
+        temp_path = f"{final_path}.tmp{threading.get_ident()}"
+        try:
+            with open(temp_path, 'wb') as out:
+                for block in blocks:
+                    out.write(np.ascontiguousarray(block, dtype=PCM_DTYPE).tobytes())
+            os.replace(temp_path, final_path)
+        except OSError as e:
+            print(f"RenderCache: Could not store render {key[:12]}: {e}")
+            self._remove_file(temp_path)
+            return None
+        except BaseException:
+            self._remove_file(temp_path) # The producer gave up (e.g. a cancelled render); store nothing
+            raise
+        with self._lock:
+            size = os.path.getsize(final_path)
+            self._disk_bytes += size - self._files.pop(key, 0)
+            self._files[key] = size
+            self._enforce_disk_budget(keep=key)
+        return self.get(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._files),
+                "disk_bytes": self._disk_bytes,
+                "mapped_entries": len(self._mapped),
+                "mapped_bytes": self._mapped_bytes,
+            }
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._files):
+                self._forget(key)
+
+    # --- LRU bookkeeping (call with self._lock held) ---
+
+    def _unmap(self, key: str):
+        pcm = self._mapped.pop(key, None)
+        if pcm is not None:
+            self._mapped_bytes -= pcm.nbytes
+
+    def _forget(self, key: str):
+        self._unmap(key)
+        self._disk_bytes -= self._files.pop(key, 0)
+        self._remove_file(self._path(key))
+
+    def _enforce_memory_budget(self, keep: str | None = None):
+        for key in list(self._mapped):
+            if self._mapped_bytes <= self.memory_budget_bytes:
+                break
+            if key != keep:
+                self._unmap(key) # The mapping is released once the last array view goes away
+
+    def _enforce_disk_budget(self, keep: str | None = None):
+        for key in list(self._files):
+            if self._disk_bytes <= self.disk_budget_bytes:
+                break
+            if key != keep:
+                self._forget(key)
+
+    @staticmethod
+    def _remove_file(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass # Missing, or still mapped on Windows; a later start cleans it up
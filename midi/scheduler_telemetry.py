@@ -0,0 +1,137 @@
+import time
+import numpy as np
+
+DEFAULT_WINDOW_SIZE = 4096 # Lateness samples kept for the rolling percentiles
+MISSED_DEADLINE_SEC = 0.005 # Later than this is audibly off the grid; also the wake-up slack allowed when queuing
+
+
+class SchedulerTelemetry:
+    """
+    Timing statistics for NoteScheduler's dispatch loop.
+
+    The playback thread is the only writer: it stores one sample per event
+    into a fixed NumPy ring buffer and bumps plain counters, so recording
+    takes no lock. What a sample means depends on the scheduler's mode
+    (measure):
+
+    - "lateness": events are sent as they fall due; a sample is actual minus
+      intended dispatch time, and later than missed_deadline_sec is a miss.
+    - "lead": events are queued into the sequencer ahead of time; a sample is
+      how far ahead of its sounding time the event was handed over. The
+      scheduler refills the queue when the next event is lookahead/2 away, so
+      less lead than that (minus missed_deadline_sec of wake-up slack), or a
+      negative lead (queued for a time already past), is a miss.
+
+    Both are in real seconds. Readers (the UI, tests) take a snapshot copy of
+    the window and compute percentiles on it; a sample overwritten while
+    being copied only skews that one snapshot.
+    """
+
+    def __init__(self, window_size: int = DEFAULT_WINDOW_SIZE, missed_deadline_sec: float = MISSED_DEADLINE_SEC,
+                 measure: str = "lateness"):
+        self.window_size = window_size
+        self.missed_deadline_sec = missed_deadline_sec
+        self.measure = measure # "lateness" or "lead"; set by the scheduler for its mode
+        self._samples = np.zeros(window_size, dtype=np.float64)
+        self.reset()
+
+    def reset(self):
+        self._written = 0 # Total samples ever written; the ring index is _written % window_size
+        self.missed_deadlines = 0
+        self.worst_sec = None # Largest lateness, or smallest lead, since the reset
+        self.loop_iterations = 0
+        self.loop_cpu_sec = 0.0
+        self.max_loop_cpu_sec = 0.0
+        self._reset_wall = time.perf_counter()
+
+    # --- Writer side (playback thread only) ---
+
+    def record(self, lateness_sec: np.ndarray):
+        """Adds the lateness of a batch of events sent as they fell due."""
+        if self._store(lateness_sec):
+            self.missed_deadlines += int(np.count_nonzero(lateness_sec > self.missed_deadline_sec))
+            worst = float(lateness_sec.max())
+            self.worst_sec = worst if self.worst_sec is None else max(self.worst_sec, worst)
+
+    def record_lead(self, lead_sec: np.ndarray, min_lead_sec: float):
+        """
+        Adds the lead of a batch of events queued into the sequencer.
+
+        Args:
+            lead_sec: Sounding time minus queue time of each event
+            min_lead_sec: Lead the refill schedule guarantees (lookahead/2)
+        """
+        if self._store(lead_sec):
+            floor = max(0.0, min_lead_sec - self.missed_deadline_sec)
+            self.missed_deadlines += int(np.count_nonzero((lead_sec < floor) | (lead_sec < 0.0)))
+            worst = float(lead_sec.min())
+            self.worst_sec = worst if self.worst_sec is None else min(self.worst_sec, worst)
+
+    def _store(self, samples: np.ndarray) -> bool:
+        count = len(samples)
+        if not count:
+            return False
+        if count > self.window_size:
+            samples = samples[-self.window_size:]
+        start = self._written % self.window_size
+        first = min(len(samples), self.window_size - start)
+        self._samples[start:start + first] = samples[:first]
+        self._samples[:len(samples) - first] = samples[first:] # Wrap around
+        self._written += count
+        return True
+
+    def record_loop(self, cpu_sec: float):
+        """Adds the CPU time one loop iteration (dispatch plus any busy-wait) consumed."""
+        self.loop_iterations += 1
+        self.loop_cpu_sec += cpu_sec
+        if cpu_sec > self.max_loop_cpu_sec:
+            self.max_loop_cpu_sec = cpu_sec
+
+    # --- Reader side ---
+
+    def window(self) -> np.ndarray:
+        """Copy of the most recent samples (unordered), in seconds."""
+        written = self._written
+        return self._samples[:min(written, self.window_size)].copy()
+
+    def histogram(self, bin_edges_ms=(-50, -10, -1, 0, 1, 2, 5, 10, 50)):
+        """
+        Histogram of the current window (lateness or lead, see measure).
+
+        Returns:
+            (counts, bin_edges_ms) as from np.histogram
+        """
+        return np.histogram(self.window() * 1000.0, bins=np.asarray(bin_edges_ms, dtype=np.float64))
+
+    def snapshot(self) -> dict:
+        """
+        Current statistics.
+
+        Returns:
+            Dictionary with event counts, the measure, rolling p50/p95/p99/mean of
+            it in ms, the worst sample (max lateness or min lead), missed deadlines
+            and loop CPU time (total, worst iteration, share of wall time)
+        """
+        samples = self.window()
+        if len(samples):
+            p50, p95, p99 = (float(v) * 1000.0 for v in np.percentile(samples, (50, 95, 99)))
+            mean_ms = float(samples.mean()) * 1000.0
+        else:
+            p50 = p95 = p99 = mean_ms = 0.0
+        wall = max(time.perf_counter() - self._reset_wall, 1e-9)
+        return {
+            "events": self._written,
+            "window": len(samples),
+            "measure": self.measure,
+            "p50_ms": p50,
+            "p95_ms": p95,
+            "p99_ms": p99,
+            "mean_ms": mean_ms,
+            "worst_ms": (self.worst_sec or 0.0) * 1000.0,
+            "missed_deadlines": self.missed_deadlines,
+            "missed_deadline_ms": self.missed_deadline_sec * 1000.0,
+            "loop_iterations": self.loop_iterations,
+            "loop_cpu_sec": self.loop_cpu_sec,
+            "max_loop_cpu_ms": self.max_loop_cpu_sec * 1000.0,
+            "cpu_percent": 100.0 * self.loop_cpu_sec / wall,
+        }
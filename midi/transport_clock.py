@@ -0,0 +1,174 @@
+import time
+import threading
+from fractions import Fraction
+
+NS_PER_SEC = 1_000_000_000
+REFERENCE_BPM = 120 # Positions are seconds at this tempo; other tempos scale the rate
+MAX_TEMPO_SEGMENTS = 256 # History kept for stats; only the newest segment drives the position
+
+
+class TransportClock:
+    """
+    Monotonic, integer-nanosecond transport clock shared by playback and the UI.
+
+    The position is computed from a single anchor (perf_counter_ns at the start
+    of the current tempo segment, plus the position at that instant) and an
+    exact rational rate (bpm / 120). Tempo changes start a new segment instead
+    of re-deriving a float start time, so no rounding error accumulates however
+    long playback runs or however often tempo, seek and pause are used.
+
+    The clock also keeps simple health statistics: drift between perf_counter
+    and time.monotonic over the current run, and jitter of the intervals at
+    which a consumer (the UI playback timer) calls tick().
+    """
+
+    def __init__(self, bpm: float = REFERENCE_BPM):
+        self._lock = threading.Lock()
+        self._running = False
+        self._rate = self._rate_for(bpm)
+        self._anchor_real_ns = time.perf_counter_ns()
+        self._anchor_pos_ns = 0
+        self._segments = [] # (real_ns, position_ns, rate) for every tempo segment of the current run
+
+        self._run_perf_ns = self._anchor_real_ns
+        self._run_mono_ns = time.monotonic_ns()
+        self._last_tick_ns = None
+        self._tick_count = 0
+        self._tick_mean_ns = 0.0
+        self._tick_m2 = 0.0 # Welford accumulator for the tick interval variance
+        self._tick_max_dev_ns = 0.0
+
+    @staticmethod
+    def _rate_for(bpm: float) -> Fraction:
+        if bpm <= 0:
+            raise ValueError(f"BPM must be positive, got {bpm}")
+        return Fraction(bpm).limit_denominator(1000) / REFERENCE_BPM
+
+    def _position_ns_at(self, real_ns: int) -> int:
+        if not self._running:
+            return self._anchor_pos_ns
+        elapsed = real_ns - self._anchor_real_ns
+        return self._anchor_pos_ns + (elapsed * self._rate.numerator) // self._rate.denominator
+
+    def _reanchor(self, real_ns: int, position_ns: int):
+        self._anchor_real_ns = real_ns
+        self._anchor_pos_ns = position_ns
+        self._segments.append((real_ns, position_ns, self._rate))
+        if len(self._segments) > MAX_TEMPO_SEGMENTS:
+            del self._segments[0]
+
+    # --- Transport control ---
+
+    def start(self, position_sec: float | None = None):
+        """Starts (or resumes) running, optionally from a new position."""
+        with self._lock:
+            now = time.perf_counter_ns()
+            position_ns = self._position_ns_at(now) if position_sec is None else int(round(position_sec * NS_PER_SEC))
+            self._running = True
+            self._segments = []
+            self._run_perf_ns = now
+            self._run_mono_ns = time.monotonic_ns()
+            self._last_tick_ns = None
+            self._reanchor(now, position_ns)
+
+    def pause(self):
+        """Freezes the position where it is."""
+        with self._lock:
+            now = time.perf_counter_ns()
+            self._anchor_pos_ns = self._position_ns_at(now)
+            self._anchor_real_ns = now
+            self._running = False
+
+    def stop(self):
+        """Freezes the clock and rewinds it to 0."""
+        with self._lock:
+            self._running = False
+            self._anchor_real_ns = time.perf_counter_ns()
+            self._anchor_pos_ns = 0
+
+    def seek(self, position_sec: float):
+        """Moves to position_sec, keeping the running/paused state."""
+        with self._lock:
+            self._reanchor(time.perf_counter_ns(), int(round(max(0.0, position_sec) * NS_PER_SEC)))
+
+    def set_tempo(self, bpm: float):
+        """Changes the rate from now on; the current position is preserved exactly."""
+        with self._lock:
+            now = time.perf_counter_ns()
+            position_ns = self._position_ns_at(now)
+            self._rate = self._rate_for(bpm)
+            self._reanchor(now, position_ns)
+
+    # --- Queries ---
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def position_ns(self) -> int:
+        with self._lock:
+            return self._position_ns_at(time.perf_counter_ns())
+
+    def position(self) -> float:
+        """Current position in seconds (at the 120 BPM reference tempo)."""
+        return self.position_ns() / NS_PER_SEC
+
+    def tempo_scale(self) -> float:
+        """Playback seconds per real second (bpm / 120)."""
+        return float(self._rate)
+
+    def seconds_until(self, position_sec: float) -> float:
+        """Real seconds until position_sec is reached at the current tempo (inf while stopped)."""
+        with self._lock:
+            if not self._running:
+                return float('inf')
+            remaining_ns = int(position_sec * NS_PER_SEC) - self._position_ns_at(time.perf_counter_ns())
+            return remaining_ns * self._rate.denominator / self._rate.numerator / NS_PER_SEC
+
+    # --- Statistics ---
+
+    def tick(self):
+        """Records a consumer tick (e.g. one UI timer frame) for the jitter statistics."""
+        now = time.perf_counter_ns()
+        with self._lock:
+            if self._last_tick_ns is not None:
+                interval = now - self._last_tick_ns
+                self._tick_count += 1
+                delta = interval - self._tick_mean_ns
+                self._tick_mean_ns += delta / self._tick_count
+                self._tick_m2 += delta * (interval - self._tick_mean_ns)
+                self._tick_max_dev_ns = max(self._tick_max_dev_ns, abs(interval - self._tick_mean_ns))
+            self._last_tick_ns = now
+
+    def reset_stats(self):
+        with self._lock:
+            self._last_tick_ns = None
+            self._tick_count = 0
+            self._tick_mean_ns = 0.0
+            self._tick_m2 = 0.0
+            self._tick_max_dev_ns = 0.0
+
+    def stats(self) -> dict:
+        """
+        Clock health statistics.
+
+        Returns:
+            Dictionary with the current position and rate, the number of tempo
+            segments in this run, drift_ns (perf_counter minus time.monotonic
+            elapsed since the run started) and tick interval mean/jitter in ns
+        """
+        with self._lock:
+            perf_elapsed = time.perf_counter_ns() - self._run_perf_ns
+            mono_elapsed = time.monotonic_ns() - self._run_mono_ns
+            jitter = (self._tick_m2 / self._tick_count) ** 0.5 if self._tick_count else 0.0
+            return {
+                "position_sec": self._position_ns_at(time.perf_counter_ns()) / NS_PER_SEC,
+                "tempo_scale": float(self._rate),
+                "running": self._running,
+                "segments": len(self._segments),
+                "drift_ns": perf_elapsed - mono_elapsed,
+                "ticks": self._tick_count,
+                "tick_interval_mean_ns": self._tick_mean_ns,
+                "tick_jitter_ns": jitter,
+                "tick_jitter_max_ns": self._tick_max_dev_ns,
+            }
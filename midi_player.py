@@ -2,6 +2,8 @@ import time # For test_play_scale sleep
 import pretty_midi # For Note type hint
 import pygame.midi # For pygame.midi.quit in main test
 from midi.playback_controller import PlaybackController
+from note_buffer import NoteBuffer
+from midi.transport_clock import TransportClock
 
 class MidiPlayer:
     """
@@ -15,10 +17,14 @@ class MidiPlayer:
         # This class can expose it via a property if direct access is still needed by UI.
         # self.notes = [] # No longer directly managed here
 
-    def set_notes(self, notes: list[pretty_midi.Note]):
-        """Set the notes to be played."""
+    def set_notes(self, notes: NoteBuffer):
+        """Set the notes to be played (NoteBuffer or list of pretty_midi.Note)."""
         self.controller.set_notes(notes)
 
+    def apply_note_delta(self, delta):
+        """Apply one NoteModel edit (NoteDelta) without replacing the whole note set."""
+        self.controller.apply_note_delta(delta)
+
     def play(self):
         """Start playback of MIDI notes."""
         self.controller.play()
@@ -39,13 +45,37 @@ class MidiPlayer:
         """Get the current playback position in seconds."""
         return self.controller.get_current_position()
 
+    @property
+    def clock(self) -> TransportClock:
+        """The transport clock that drives playback; UI position displays should read it too."""
+        return self.controller.clock
+
+    def get_active_pitches(self) -> frozenset:
+        """Pitches sounding at the current playback position."""
+        return self.controller.get_active_pitches()
+
+    def get_clock_stats(self) -> dict:
+        """Drift/jitter statistics of the transport clock."""
+        return self.controller.clock.stats()
+
+    def get_scheduler_stats(self) -> dict:
+        """Event lateness (p50/p95/p99, missed deadlines) and CPU statistics of the note scheduler."""
+        return self.controller.get_scheduler_stats()
+
+    def reset_scheduler_stats(self):
+        self.controller.reset_scheduler_stats()
+
+    def tick(self):
+        """Per-frame housekeeping from the UI playback timer (e.g. noticing a cached take has ended)."""
+        self.controller.tick()
+
     @property
     def is_playing(self) -> bool:
         """Check if playback is active."""
         return self.controller.is_playing
     
     @property
-    def notes(self) -> list[pretty_midi.Note]:
+    def notes(self) -> NoteBuffer:
         """Get the current list of notes."""
         return self.controller.notes
 
@@ -99,7 +129,7 @@ class MidiPlayer:
             start_time += duration
             
         print(f"MidiPlayer (test): Created test scale with {len(scale_notes)} notes")
-        self.set_notes(scale_notes)
+        self.set_notes(NoteBuffer.from_notes(scale_notes))
         self.play()
         return True
 
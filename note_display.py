@@ -1,7 +1,7 @@
 import sys
 import os # For file extension check
-from PySide6.QtWidgets import QWidget, QApplication, QSizePolicy, QMessageBox
-from PySide6.QtCore import Qt, QRect, QSize, QPoint, Signal, QRectF, QMimeData, QUrl
+from PySide6.QtWidgets import QWidget, QApplication, QSizePolicy, QMessageBox, QAbstractScrollArea, QFrame
+from PySide6.QtCore import Qt, QRect, QSize, QPoint, Signal, QRectF, QMimeData, QUrl, QEvent
 from PySide6.QtGui import (
     QPainter, QColor, QPen, QBrush, QLinearGradient, QFont, 
     QRadialGradient, QFontMetrics, QDragEnterEvent, QDropEvent, QMouseEvent, QDragLeaveEvent, QDragMoveEvent,
@@ -13,7 +13,7 @@ import math # Import math
 from config.constants import (
     MIN_PITCH, MAX_PITCH, WHITE_KEY_WIDTH, BLACK_KEY_WIDTH,
     WHITE_KEY_HEIGHT, BLACK_KEY_HEIGHT, BASE_TIME_SCALE, DEFAULT_BPM,
-    MIN_LABEL_PITCH, MAX_LABEL_PITCH
+    MIN_LABEL_PITCH, MAX_LABEL_PITCH, TILED_RENDER_MIN_NOTES, TILE_CACHE_MEMORY_BUDGET_MB
 )
 from config.theme import (
     PIANO_ROLL_BG_COLOR, GRID_LINE_COLOR, GRID_BEAT_LINE_COLOR, GRID_MEASURE_LINE_COLOR, # Updated specific grid colors
@@ -22,24 +22,50 @@ from config.theme import (
     ACCENT_PRIMARY_COLOR, DRAG_OVERLAY_COLOR # Updated general theme colors
 )
 from ui.drawing_utils import (
-    draw_time_grid, draw_piano_keys, draw_notes, draw_playhead
+    draw_time_grid, draw_notes, detailed_notes_wanted, draw_playhead, playhead_rect, draw_note_density
 )
+from ui.layer_cache import StaticLayerCache
+from ui.piano_keyboard import PianoKeyboardWidget
+from ui.midi_importer import MidiFileImporter
+from ui.note_density import NoteDensityPyramid, density_view_wanted
+from ui.tile_renderer import NoteTileCache
+from ui.paint_cache import get_paint_resources
 from config import theme
-
-class PianoRollDisplay(QWidget):
-    """Widget that displays MIDI notes in a piano roll format"""
+from note_buffer import NoteBuffer
+from note_model import NoteModel, NoteDelta
+
+class PianoRollDisplay(QAbstractScrollArea):
+    """
+    Widget that displays MIDI notes in a piano roll format.
+
+    The roll is a virtual canvas: only a viewport-sized widget exists, and the
+    scrollbars hold the offset of that viewport into the content (width
+    total_time * time_scale + keyboard, height 88 rows). Drawing and hit
+    testing use content coordinates, so memory and paint cost depend on the
+    window size, not on the composition length or zoom. The keyboard column
+    is a separate PianoKeyboardWidget in the left viewport margin; it follows
+    only the vertical scrollbar.
+
+    Notes live in a NoteModel (shared with the rest of the window when one is
+    passed in); edits arrive as deltas and only patch the derived state.
+    """
     
-    notesChanged = Signal(list) 
-    midiFileProcessed = Signal(list) 
+    midiFileProcessed = Signal(object) # NoteBuffer
+    midiImportStarted = Signal(str) # File path
 
     MIN_HORIZONTAL_ZOOM = 0.1
     MAX_HORIZONTAL_ZOOM = 10.0
     MIN_VERTICAL_ZOOM = 0.25
     MAX_VERTICAL_ZOOM = 4.0
 
-    def __init__(self, notes=None, parent=None):
+    def __init__(self, notes=None, parent=None, note_model=None):
         super().__init__(parent)
-        self.notes: list[pretty_midi.Note] = notes or []
+        self.note_model = note_model if note_model is not None else NoteModel(notes, self)
+        self.note_model.notesReset.connect(self._on_notes_reset)
+        self.note_model.notesChanged.connect(self._on_notes_changed)
+        self.note_density = NoteDensityPyramid(self.notes) # Drawn instead of notes when zoomed far out
+        self.note_tiles = NoteTileCache(TILE_CACHE_MEMORY_BUDGET_MB * 1024 * 1024, self)
+        self.note_tiles.tileReady.connect(self.update_content_rect)
         self.playhead_position = 0.0
         self.bpm = DEFAULT_BPM
         self.horizontal_zoom_factor = 1.0
@@ -48,19 +74,26 @@ class PianoRollDisplay(QWidget):
         self.time_scale = BASE_TIME_SCALE * self.horizontal_zoom_factor
         self.time_signature_numerator = 4
         self.time_signature_denominator = 4
+        self.layer_cache = StaticLayerCache() # Pre-rendered keyboard and note rows
         
-        num_white_keys = 0
-        for i in range(MIN_PITCH, MAX_PITCH + 1):
-            if i % 12 not in [1, 3, 6, 8, 10]: 
-                num_white_keys +=1
-        self.setMinimumHeight(int((MAX_PITCH - MIN_PITCH + 1) * WHITE_KEY_HEIGHT * self.vertical_zoom_factor))
+        self.content_width = 0 # Virtual canvas size in pixels; see calculate_total_width
+        self.content_height = self._calculate_content_height()
 
-        
+        self.setFrameShape(QFrame.NoFrame)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOn)
+        self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOn)
         self.calculate_total_width()
-        self.setMouseTracking(True)
+        self.piano_keyboard = PianoKeyboardWidget(self.layer_cache, self)
+        self.setViewportMargins(WHITE_KEY_WIDTH, 0, 0, 0) # The viewport starts right of the keyboard
+        self.viewport().setMouseTracking(True)
         self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         self.setAcceptDrops(True) 
+        self.viewport().setAcceptDrops(True)
         self._is_dragging_midi = False 
+        # Dropped MIDI files are parsed in the background
+        self.midi_importer = MidiFileImporter(self)
+        self.midi_importer.importFinished.connect(self._on_import_finished)
+        self.midi_importer.importFailed.connect(self._on_import_failed)
         self._grid_quantize_value_seconds = (60.0 / self.bpm) / 4
         self.setFocusPolicy(Qt.StrongFocus) # Ensure widget can receive key events
 
@@ -70,38 +103,105 @@ class PianoRollDisplay(QWidget):
         seconds_per_beat = 1.0 / beats_per_second
         self._grid_quantize_value_seconds = seconds_per_beat / 4.0
 
-    def set_notes(self, notes: list[pretty_midi.Note]):
-        self.notes = notes if notes is not None else []
-        self.calculate_total_width()
-        self.notesChanged.emit(self.notes) 
-        self.update()
+    @property
+    def notes(self) -> NoteBuffer:
+        """The model's sorted notes (read-only here; edits go through note_model)."""
+        return self.note_model.notes
 
-    def add_note(self, note: pretty_midi.Note, emit_change=True): # Kept for programmatic addition
+    def set_notes(self, notes):
+        self.note_model.reset(notes) # Comes back through _on_notes_reset
+
+    def add_note(self, note: pretty_midi.Note): # Kept for programmatic addition
         if not isinstance(note, pretty_midi.Note):
             print(f"PianoRollDisplay: Received invalid note object type: {type(note)}")
             return
-        self.notes.append(note)
-        self.notes.sort(key=lambda n: (n.start, n.pitch))
-        original_min_width = self.minimumWidth()
-        self.calculate_total_width()
-        if emit_change:
-            self.notesChanged.emit(self.notes)
-        self.update()
-        parent_scroll_area = self.parentWidget()
-        while parent_scroll_area and not hasattr(parent_scroll_area, 'horizontalScrollBar'):
-            parent_scroll_area = parent_scroll_area.parentWidget()
-        if parent_scroll_area and hasattr(parent_scroll_area, 'horizontalScrollBar'):
-            note_x_end_pixels = note.end * self.time_scale + WHITE_KEY_WIDTH
-            scrollbar = parent_scroll_area.horizontalScrollBar()
-            if note_x_end_pixels > scrollbar.value() + parent_scroll_area.viewport().width() or self.minimumWidth() > original_min_width:
-                scrollbar.setValue(int(note.start * self.time_scale))
+        original_content_width = self.content_width
+        self.note_model.add_notes([note]) # Comes back through _on_notes_changed
+        note_x_end_pixels = note.end * self.time_scale + WHITE_KEY_WIDTH
+        scrollbar = self.horizontalScrollBar()
+        if note_x_end_pixels > self.scroll_offset().x() + self.viewport().width() or self.content_width > original_content_width:
+            scrollbar.setValue(int(note.start * self.time_scale))
     
     # Removed delete_note_at as per feedback
 
+    def _on_notes_reset(self, notes: NoteBuffer):
+        self.note_density.rebuild(notes)
+        self.calculate_total_width()
+        self.viewport().update()
+
+    def _on_notes_changed(self, delta: NoteDelta):
+        # Only the touched buckets of the density map are recomputed
+        self.note_density.remove_notes(delta.removed)
+        self.note_density.add_notes(delta.added)
+        self.calculate_total_width()
+        self.viewport().update()
+
+    # --- Virtual canvas ---
+
+    def scroll_offset(self) -> QPoint:
+        """Content coordinates of the viewport's top-left corner (the keyboard column is never in the viewport)."""
+        return QPoint(self.horizontalScrollBar().value() + WHITE_KEY_WIDTH, self.verticalScrollBar().value())
+
+    def visible_content_rect(self) -> QRect:
+        """Part of the content currently shown in the viewport, in content coordinates."""
+        return QRect(self.scroll_offset(), self.viewport().size())
+
+    def update_content_rect(self, rect: QRect):
+        """Schedules a repaint of a rect given in content coordinates."""
+        self.viewport().update(rect.translated(-self.scroll_offset()))
+
+    def _calculate_content_height(self) -> int:
+        return int((MAX_PITCH - MIN_PITCH + 1) * WHITE_KEY_HEIGHT * self.vertical_zoom_factor)
+
+    def _update_scroll_ranges(self):
+        viewport_size = self.viewport().size()
+        horizontal = self.horizontalScrollBar()
+        horizontal.setRange(0, max(0, self.content_width - WHITE_KEY_WIDTH - viewport_size.width()))
+        horizontal.setPageStep(viewport_size.width())
+        horizontal.setSingleStep(max(1, int(self.time_scale / 4)))
+        vertical = self.verticalScrollBar()
+        vertical.setRange(0, max(0, self.content_height - viewport_size.height()))
+        vertical.setPageStep(viewport_size.height())
+        vertical.setSingleStep(max(1, int(WHITE_KEY_HEIGHT * self.vertical_zoom_factor)))
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        viewport_geometry = self.viewport().geometry()
+        self.piano_keyboard.setGeometry(viewport_geometry.x() - WHITE_KEY_WIDTH, viewport_geometry.y(),
+                                        WHITE_KEY_WIDTH, viewport_geometry.height())
+        self._update_scroll_ranges()
+
+    def scrollContentsBy(self, dx: int, dy: int):
+        if dy:
+            self.piano_keyboard.set_scroll_y(self.verticalScrollBar().value())
+            self.viewport().update() # The time signature and bar numbers stay pinned to the top
+        else:
+            self.viewport().scroll(dx, 0) # Reuse the pixels already on screen; only the new strip is painted
+
+    def invalidate_static_layers(self):
+        """Forces the cached keyboard and row layers to be re-rendered (zoom, screen and theme changes are detected automatically)."""
+        self.layer_cache.invalidate()
+        self.viewport().update()
+        self.piano_keyboard.update()
+
+    def changeEvent(self, event: QEvent):
+        if event.type() in (QEvent.PaletteChange, QEvent.StyleChange, QEvent.FontChange):
+            self.invalidate_static_layers()
+        super().changeEvent(event)
+
+    def set_active_pitches(self, pitches):
+        """Highlights the keys of the pitches currently sounding (e.g. the scheduler's held notes)."""
+        self.piano_keyboard.set_active_pitches(pitches)
+
     def set_playhead_position(self, position):
         if self.playhead_position != position:
+            old_rect = playhead_rect(self.playhead_position, self.time_scale, self.content_height)
             self.playhead_position = position
-            self.update() 
+            new_rect = playhead_rect(position, self.time_scale, self.content_height)
+            if new_rect != old_rect: # Sub-pixel moves leave the drawn playhead unchanged
+                # Only the strips under the old and new playhead need repainting, not the whole roll
+                self.update_content_rect(old_rect)
+                self.update_content_rect(new_rect)
     
     def set_bpm(self, bpm):
         if bpm <= 0 or self.bpm == bpm: return
@@ -109,7 +209,7 @@ class PianoRollDisplay(QWidget):
         # self.time_scale is no longer updated here as it's independent of BPM
         self._update_quantization_value()
         self.calculate_total_width() # This will use the new BPM for min_time_from_bars
-        self.update()
+        self.viewport().update()
 
     def set_time_signature(self, numerator: int, denominator: int):
         if numerator <= 0 or denominator <= 0: return
@@ -118,56 +218,66 @@ class PianoRollDisplay(QWidget):
         self.time_signature_denominator = denominator
         self._update_quantization_value()
         self.calculate_total_width()
-        self.update()
+        self.viewport().update()
     
     def calculate_total_width(self):
-        max_time = 0.0
-        if self.notes:
-            for note in self.notes:
-                if hasattr(note, 'end') and note.end > max_time:
-                    max_time = note.end
+        max_time = self.notes.max_end()
         min_visible_bars = 4
         min_time_from_bars = min_visible_bars * self.time_signature_numerator * (60.0 / self.bpm)
         self.total_time = max(max_time + 2.0, min_time_from_bars)
-        new_min_width = int(self.total_time * self.time_scale) + WHITE_KEY_WIDTH
-        if self.minimumWidth() != new_min_width:
-            self.setMinimumWidth(new_min_width)
-            self.updateGeometry()
+        self.content_width = int(self.total_time * self.time_scale) + WHITE_KEY_WIDTH
+        self._update_scroll_ranges()
 
     def sizeHint(self):
-        num_white_keys = 0
-        for i in range(MIN_PITCH, MAX_PITCH + 1):
-            if i % 12 not in [1, 3, 6, 8, 10]:
-                num_white_keys +=1
-        effective_white_key_height = WHITE_KEY_HEIGHT * self.vertical_zoom_factor
-        return QSize(self.minimumWidth(), int(num_white_keys * effective_white_key_height))
+        # The content scrolls inside the viewport, so this is only a comfortable starting size
+        return QSize(WHITE_KEY_WIDTH + 800, int(24 * WHITE_KEY_HEIGHT * self.vertical_zoom_factor))
     
     def paintEvent(self, event: QPaintEvent):
-        painter = QPainter(self)
+        painter = QPainter(self.viewport())
         painter.setRenderHints(QPainter.Antialiasing | QPainter.TextAntialiasing | QPainter.SmoothPixmapTransform)
+        offset = self.scroll_offset()
+        painter.translate(-offset.x(), -offset.y()) # Everything below draws in content coordinates
+        exposed = event.rect().translated(offset)
+        visible_area = self.visible_content_rect()
         
         # Use solid PIANO_ROLL_BG_COLOR
-        painter.fillRect(event.rect(), theme.PIANO_ROLL_BG_COLOR)
+        painter.fillRect(exposed, theme.PIANO_ROLL_BG_COLOR)
 
         # Draw drag overlay BEFORE notes to prevent pink glitch
         if self._is_dragging_midi:
             painter.save()
             # Use the dedicated theme color for drag overlay
-            painter.fillRect(self.rect().adjusted(WHITE_KEY_WIDTH + 1, 1, -1, -1), theme.DRAG_OVERLAY_COLOR)
+            painter.fillRect(visible_area.adjusted(1, 1, -1, -1), theme.DRAG_OVERLAY_COLOR)
             
             # Keep the border distinct
             border_pen = QPen(theme.ACCENT_PRIMARY_COLOR.lighter(130), 2, Qt.DashLine) # Use ACCENT_PRIMARY_COLOR
             painter.setPen(border_pen)
-            painter.drawRect(self.rect().adjusted(WHITE_KEY_WIDTH + 1, 1, -1, -1))
+            painter.drawRect(visible_area.adjusted(1, 1, -1, -1))
             painter.restore()
 
         # Draw regular UI elements after the overlay
-        draw_time_grid(painter, self.width(), self.height(), self.time_scale, self.bpm,
+        # Like the old stretched widget, the grid fills the viewport even past the end of short content
+        grid_width = max(self.content_width, visible_area.right() + 1)
+        grid_height = max(self.content_height, visible_area.bottom() + 1)
+        draw_time_grid(painter, grid_width, grid_height, self.time_scale, self.bpm,
                        self.time_signature_numerator, self.time_signature_denominator, 
-                       self.parentWidget(), self.vertical_zoom_factor)
-        draw_piano_keys(painter, self.vertical_zoom_factor) 
-        draw_notes(painter, self.notes, self.time_scale, self.vertical_zoom_factor) 
-        draw_playhead(painter, self.playhead_position, self.time_scale, self.height())
+                       self, self.vertical_zoom_factor, self.layer_cache, exposed)
+        # Decide on the whole visible area so partial repaints (e.g. the playhead strip) use the same style
+        visible_t0 = (visible_area.left() - WHITE_KEY_WIDTH) / self.time_scale
+        visible_t1 = (visible_area.right() + 1 - WHITE_KEY_WIDTH) / self.time_scale
+        if density_view_wanted(self.notes, visible_t0, visible_t1, visible_area.width()):
+            draw_note_density(painter, self.note_density, self.time_scale, self.vertical_zoom_factor, exposed)
+        else:
+            detailed = detailed_notes_wanted(self.notes, self.time_scale, self.vertical_zoom_factor, visible_area)
+            resources = get_paint_resources() # Once per frame, here on the GUI thread
+            if len(self.notes) >= TILED_RENDER_MIN_NOTES:
+                # Large sessions: composite tiles rendered on worker threads so painting never blocks input
+                self.note_tiles.paint(painter, self.notes, self.note_model.version, self.time_scale,
+                                      self.vertical_zoom_factor, detailed, resources, exposed)
+            else:
+                draw_notes(painter, self.notes, self.time_scale, self.vertical_zoom_factor, detailed, resources,
+                           exposed)
+        draw_playhead(painter, self.playhead_position, self.time_scale, self.content_height)
 
     def _pixel_to_time(self, x_pos: int) -> float:
         if x_pos <= WHITE_KEY_WIDTH: return 0.0
@@ -195,13 +305,13 @@ class PianoRollDisplay(QWidget):
         return round(time_sec / self._grid_quantize_value_seconds) * self._grid_quantize_value_seconds
 
     def mousePressEvent(self, event: QMouseEvent):
-        if event.button() == Qt.LeftButton and event.x() > WHITE_KEY_WIDTH:
-            pos_x = int(event.position().x())
+        pos_x = int(event.position().x()) + self.scroll_offset().x() # Content coordinates
+        if event.button() == Qt.LeftButton and pos_x > WHITE_KEY_WIDTH:
             clicked_time_raw = self._pixel_to_time(pos_x)
             self.playhead_position = clicked_time_raw
             # If MainWindow needs to know about manual playhead changes to sync TransportControls:
-            # self.notesChanged.emit(self.notes) # Or a dedicated signal
-            self.update() 
+            # a dedicated signal would go here
+            self.viewport().update()
         super().mousePressEvent(event)
 
     def mouseDoubleClickEvent(self, event: QMouseEvent):
@@ -216,7 +326,7 @@ class PianoRollDisplay(QWidget):
                 if file_path.lower().endswith(('.mid', '.midi')):
                     event.acceptProposedAction()
                     self._is_dragging_midi = True
-                    self.update()
+                    self.viewport().update()
                     return
         event.ignore()
 
@@ -226,61 +336,44 @@ class PianoRollDisplay(QWidget):
 
     def dragLeaveEvent(self, event: QDragLeaveEvent):
         self._is_dragging_midi = False
-        self.update()
+        self.viewport().update()
         event.accept()
 
     def dropEvent(self, event: QDropEvent):
         self._is_dragging_midi = False
-        self.update() # Clear drag feedback immediately
+        self.viewport().update() # Clear drag feedback immediately
         if event.mimeData().hasUrls():
             url = event.mimeData().urls()[0]
             if url.isLocalFile():
                 file_path = url.toLocalFile()
                 if file_path.lower().endswith(('.mid', '.midi')):
-                    try:
-                        midi_data = pretty_midi.PrettyMIDI(file_path)
-                        if midi_data.instruments:
-                            all_notes = []
-                            for instrument in midi_data.instruments:
-                                all_notes.extend(instrument.notes)
-                            all_notes.sort(key=lambda x: x.start)
-                            
-                            # Update internal notes and repaint PianoRollDisplay first
-                            self.set_notes(all_notes) # This calls self.update() and emits notesChanged
-                            
-                            # midiFileProcessed can still be used if MainWindow needs a distinct signal for "file loaded"
-                            # vs. "notes changed by any means". If notesChanged is sufficient, this can be removed.
-                            # For now, let's assume MainWindow might want to differentiate.
-                            self.midiFileProcessed.emit(all_notes) # Emitting with the same notes set
-                            
-                            event.acceptProposedAction()
-                        else:
-                            QMessageBox.warning(self, "MIDI Parse Error", "No instruments found in MIDI file.")
-                            event.ignore()
-                    except Exception as e:
-                        print(f"Error parsing MIDI file {file_path}: {e}")
-                        QMessageBox.critical(self, "MIDI Parse Error", f"Could not parse MIDI file:\n{e}")
-                        event.ignore()
-                    return # Processed or ignored
+                    # Parsed on a worker thread; the notes arrive through _on_import_finished
+                    self.midi_importer.load(file_path)
+                    self.midiImportStarted.emit(file_path)
+                    event.acceptProposedAction()
+                    return
         event.ignore()
 
+    def _on_import_finished(self, file_path: str, notes: NoteBuffer):
+        self.note_model.reset(notes) # The dropped file replaces the current notes
+        print(f"PianoRollDisplay: Imported {len(self.notes)} notes from {os.path.basename(file_path)}.")
+        # Every track keeps its program; tracks sharing a program share a channel
+        self.midiFileProcessed.emit(self.notes)
+
+    def _on_import_failed(self, file_path: str, message: str):
+        # Non-modal, so playback and editing carry on while the message is shown
+        message_box = QMessageBox(QMessageBox.Critical, "MIDI Parse Error",
+                                  f"Could not parse MIDI file {os.path.basename(file_path)}:\n{message}",
+                                  QMessageBox.Ok, self)
+        message_box.setAttribute(Qt.WA_DeleteOnClose)
+        message_box.setModal(False)
+        message_box.show()
+
     def wheelEvent(self, event: QWheelEvent):
         if event.modifiers() == Qt.ControlModifier:
+            # Over the piano keys the keyboard widget swallows this, so it always comes from the viewport
             mouse_x = event.position().x()
-
-            if mouse_x <= WHITE_KEY_WIDTH:
-                # Ignore zoom if cursor is over piano keys for horizontal zoom
-                # but allow vertical zoom or other handling by parent
-                super().wheelEvent(event)
-                return
-
-            old_scroll_x = 0
-            parent_scroll_area = self.parentWidget()
-            while parent_scroll_area and not hasattr(parent_scroll_area, 'horizontalScrollBar'):
-                parent_scroll_area = parent_scroll_area.parentWidget()
-            
-            if parent_scroll_area and hasattr(parent_scroll_area, 'horizontalScrollBar'):
-                old_scroll_x = parent_scroll_area.horizontalScrollBar().value()
+            old_scroll_x = self.scroll_offset().x()
 
             # Time at cursor before zoom (absolute time)
             time_at_cursor = self._pixel_to_time(int(mouse_x + old_scroll_x))
@@ -301,30 +394,23 @@ class PianoRollDisplay(QWidget):
             # time_scale is now independent of BPM
             self.time_scale = BASE_TIME_SCALE * self.horizontal_zoom_factor
             
-            # This recalculates minimum width based on new time_scale and total_time
+            # This recalculates the content width based on new time_scale and total_time
             self.calculate_total_width() 
 
             # New pixel X for the time_at_cursor with the new time_scale (relative to grid start)
             new_pixel_x_for_time_at_cursor = time_at_cursor * self.time_scale
             
             # Calculate new scrollbar value to keep time_at_cursor under the mouse
-            # mouse_x is relative to widget, WHITE_KEY_WIDTH is offset of grid from widget start
-            new_scroll_x = new_pixel_x_for_time_at_cursor - (mouse_x - WHITE_KEY_WIDTH)
+            # mouse_x is relative to the viewport, whose left edge is the scrollbar value past the grid start
+            new_scroll_x = new_pixel_x_for_time_at_cursor - mouse_x
             
-            if parent_scroll_area and hasattr(parent_scroll_area, 'horizontalScrollBar'):
-                parent_scroll_area.horizontalScrollBar().setValue(int(new_scroll_x))
+            self.horizontalScrollBar().setValue(int(new_scroll_x))
             
-            self.update() # Redraw with new zoom and scroll
+            self.viewport().update() # Redraw with new zoom and scroll
             event.accept()
         elif event.modifiers() == Qt.ShiftModifier: # Vertical zoom
             mouse_y = event.position().y()
-            old_scroll_y = 0
-            parent_scroll_area = self.parentWidget()
-            while parent_scroll_area and not hasattr(parent_scroll_area, 'verticalScrollBar'):
-                parent_scroll_area = parent_scroll_area.parentWidget()
-            
-            if parent_scroll_area and hasattr(parent_scroll_area, 'verticalScrollBar'):
-                old_scroll_y = parent_scroll_area.verticalScrollBar().value()
+            old_scroll_y = self.verticalScrollBar().value()
 
             pitch_at_cursor = self._pixel_to_pitch(int(mouse_y + old_scroll_y))
 
@@ -341,34 +427,24 @@ class PianoRollDisplay(QWidget):
             
             self.vertical_zoom_factor = max(self.MIN_VERTICAL_ZOOM, min(self.MAX_VERTICAL_ZOOM, new_zoom_factor))
             
-            new_min_height = int((MAX_PITCH - MIN_PITCH + 1) * WHITE_KEY_HEIGHT * self.vertical_zoom_factor)
-            self.setMinimumHeight(new_min_height)
+            self.content_height = self._calculate_content_height()
+            self._update_scroll_ranges()
+            self.piano_keyboard.set_vertical_zoom(self.vertical_zoom_factor)
 
             new_pixel_y_for_pitch_at_cursor = self._pitch_to_pixel_y(pitch_at_cursor)
             new_scroll_y = new_pixel_y_for_pitch_at_cursor - mouse_y
             
-            if parent_scroll_area and hasattr(parent_scroll_area, 'verticalScrollBar'):
-                parent_scroll_area.verticalScrollBar().setValue(int(new_scroll_y))
+            self.verticalScrollBar().setValue(int(new_scroll_y))
             
-            self.update()
+            self.viewport().update()
             event.accept()
         else:
             super().wheelEvent(event) # Default handling for other cases (e.g. vertical scroll)
 
     def _zoom_horizontal_to_center(self, zoom_factor_change_multiplier: float):
-        parent_scroll_area = self.parentWidget()
-        while parent_scroll_area and not hasattr(parent_scroll_area, 'horizontalScrollBar'):
-            parent_scroll_area = parent_scroll_area.parentWidget()
-
-        current_scroll_x = 0
-        current_viewport_center_x_widget_relative = self.width() / 2 # Fallback if no scrollbar
-
-        if parent_scroll_area and hasattr(parent_scroll_area, 'horizontalScrollBar'):
-            scrollbar = parent_scroll_area.horizontalScrollBar()
-            viewport_width = parent_scroll_area.viewport().width()
-            current_scroll_x = scrollbar.value()
-            # Center of the viewport in viewport coordinates (relative to viewport start)
-            current_viewport_center_x_widget_relative = viewport_width / 2
+        current_scroll_x = self.scroll_offset().x()
+        # Center of the viewport in viewport coordinates (relative to viewport start)
+        current_viewport_center_x_widget_relative = self.viewport().width() / 2
         
         # Time at the center of the viewport (absolute time)
         time_at_center = self._pixel_to_time(int(current_viewport_center_x_widget_relative + current_scroll_x))
@@ -381,7 +457,7 @@ class PianoRollDisplay(QWidget):
         # Update time_scale based on the new zoom factor, independent of BPM
         self.time_scale = BASE_TIME_SCALE * self.horizontal_zoom_factor
         
-        # Recalculate total width which also calls updateGeometry
+        # Recalculate total width, which also updates the scrollbar ranges
         self.calculate_total_width() 
 
         # New pixel X for the time_at_center with the new time_scale (relative to grid start)
@@ -391,10 +467,9 @@ class PianoRollDisplay(QWidget):
         # current_viewport_center_x_widget_relative is the offset from the start of the viewport to its center
         new_scroll_x = new_pixel_x_for_time_at_center - current_viewport_center_x_widget_relative
         
-        if parent_scroll_area and hasattr(parent_scroll_area, 'horizontalScrollBar'):
-            parent_scroll_area.horizontalScrollBar().setValue(int(new_scroll_x))
+        self.horizontalScrollBar().setValue(int(new_scroll_x))
             
-        self.update()
+        self.viewport().update()
 
 
     def keyPressEvent(self, event: QKeyEvent):
@@ -421,18 +496,8 @@ class PianoRollDisplay(QWidget):
             super().keyPressEvent(event)
 
     def _zoom_vertical_to_center(self, zoom_factor_change_multiplier: float):
-        parent_scroll_area = self.parentWidget()
-        while parent_scroll_area and not hasattr(parent_scroll_area, 'verticalScrollBar'):
-            parent_scroll_area = parent_scroll_area.parentWidget()
-
-        current_scroll_y = 0
-        current_viewport_center_y_widget_relative = self.height() / 2 # Fallback
-
-        if parent_scroll_area and hasattr(parent_scroll_area, 'verticalScrollBar'):
-            scrollbar = parent_scroll_area.verticalScrollBar()
-            viewport_height = parent_scroll_area.viewport().height()
-            current_scroll_y = scrollbar.value()
-            current_viewport_center_y_widget_relative = viewport_height / 2
+        current_scroll_y = self.verticalScrollBar().value()
+        current_viewport_center_y_widget_relative = self.viewport().height() / 2
         
         pitch_at_center = self._pixel_to_pitch(int(current_viewport_center_y_widget_relative + current_scroll_y))
         
@@ -441,13 +506,13 @@ class PianoRollDisplay(QWidget):
         
         self.vertical_zoom_factor = max(self.MIN_VERTICAL_ZOOM, min(self.MAX_VERTICAL_ZOOM, new_vertical_zoom_factor))
         
-        new_min_height = int((MAX_PITCH - MIN_PITCH + 1) * WHITE_KEY_HEIGHT * self.vertical_zoom_factor)
-        self.setMinimumHeight(new_min_height)
+        self.content_height = self._calculate_content_height()
+        self._update_scroll_ranges()
+        self.piano_keyboard.set_vertical_zoom(self.vertical_zoom_factor)
 
         new_pixel_y_for_pitch_at_center = self._pitch_to_pixel_y(pitch_at_center)
         new_scroll_y = new_pixel_y_for_pitch_at_center - current_viewport_center_y_widget_relative
         
-        if parent_scroll_area and hasattr(parent_scroll_area, 'verticalScrollBar'):
-            parent_scroll_area.verticalScrollBar().setValue(int(new_scroll_y))
+        self.verticalScrollBar().setValue(int(new_scroll_y))
             
-        self.update()
+        self.viewport().update()
@@ -0,0 +1,331 @@
+import numpy as np
+from PySide6.QtCore import QObject, Signal
+
+from config.constants import NOTE_HISTORY_CHUNK_NOTES, NOTE_HISTORY_MEMORY_BUDGET_MB
+from note_buffer import NoteBuffer, as_note_buffer
+
+_CHUNK_SLOT_BYTES = 16 # Per chunk and snapshot: a tuple slot and a first_starts entry
+
+
+def _freeze(notes: NoteBuffer, chunk_notes: int) -> list:
+    """Copies notes into read-only record arrays of at most chunk_notes each, sizes balanced."""
+    if not len(notes):
+        return []
+    pieces = np.array_split(notes.data, -(-len(notes) // chunk_notes))
+    chunks = []
+    for piece in pieces:
+        chunk = NoteBuffer(piece).copy().data # Own memory, so a chunk is freed on its own
+        chunk.flags.writeable = False
+        chunks.append(chunk)
+    return chunks
+
+
+class NoteSnapshot:
+    """
+    An immutable note set, sorted by start time, stored as a tuple of read-only chunks.
+
+    apply() returns the snapshot after an edit without touching this one: only
+    the chunks the edit falls into are rebuilt, every other chunk is the very
+    same array in both snapshots. A history of snapshots therefore costs the
+    chunks each edit rebuilt plus one slot per chunk, not a copy of the notes
+    per step. first_starts holds the start time of each chunk's first note and
+    routes records to chunks with a binary search.
+    """
+
+    __slots__ = ('chunks', 'first_starts', 'nbytes', '_count')
+
+    def __init__(self, chunks=()):
+        self.chunks = tuple(chunks)
+        self.first_starts = np.array([chunk['start'][0] for chunk in self.chunks], dtype=np.float64)
+        self.nbytes = sum(chunk.nbytes for chunk in self.chunks) # Chunk memory, shared chunks included
+        self._count = sum(len(chunk) for chunk in self.chunks)
+
+    @classmethod
+    def from_buffer(cls, notes, chunk_notes: int = NOTE_HISTORY_CHUNK_NOTES) -> 'NoteSnapshot':
+        """Snapshot of notes (sorted by start time), copied into fresh chunks."""
+        return cls(_freeze(as_note_buffer(notes), chunk_notes))
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def overhead(self) -> int:
+        """Bytes this snapshot costs beyond its chunks, which it may share."""
+        return len(self.chunks) * _CHUNK_SLOT_BYTES
+
+    def to_buffer(self) -> NoteBuffer:
+        """The notes as a new, writable NoteBuffer."""
+        return NoteBuffer.concatenate(self.chunks)
+
+    def apply(self, removed, added, chunk_notes: int = NOTE_HISTORY_CHUNK_NOTES):
+        """
+        The snapshot after removing some records and inserting others.
+
+        Args:
+            removed: Records of this snapshot, matched by start time and id
+            added: Records to insert at their sorted positions
+            chunk_notes: Size of the chunks rebuilt for the edit
+
+        Returns:
+            (snapshot, created, released): the new snapshot, the chunks made for
+            it, and the chunks of this snapshot it no longer uses
+        """
+        removed, added = as_note_buffer(removed), as_note_buffer(added)
+        chunks, starts = self.chunks, self.first_starts
+        count = len(chunks)
+        if not count:
+            created = _freeze(added.sorted(), chunk_notes)
+            return NoteSnapshot(created), created, []
+
+        # A record lies in the chunk covering its start time or, when chunks
+        # share a start time at their boundary, in any of those
+        marks = np.zeros(count + 1, dtype=np.intp)
+        removed_lo = np.maximum(np.searchsorted(starts, removed.start, side='left') - 1, 0)
+        removed_hi = np.maximum(np.searchsorted(starts, removed.start, side='right') - 1, 0)
+        np.add.at(marks, removed_lo, 1)
+        np.add.at(marks, removed_hi + 1, -1)
+        added_at = np.maximum(np.searchsorted(starts, added.start, side='right') - 1, 0)
+        np.add.at(marks, added_at, 1)
+        np.add.at(marks, added_at + 1, -1)
+        touched = np.cumsum(marks[:-1]) > 0
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], touched.view(np.int8), [0]))))
+        runs = edges.reshape(-1, 2).tolist() # [first, stop) of each run of touched chunks
+
+        run_of_chunk = np.empty(count, dtype=np.intp)
+        for run, (first, stop) in enumerate(runs):
+            run_of_chunk[first:stop] = run
+        removed_by_run = self._group(removed, run_of_chunk[removed_lo], len(runs))
+        added_by_run = self._group(added, run_of_chunk[added_at], len(runs))
+
+        new_chunks, new_starts, created, released = [], [], [], []
+        nbytes = self.nbytes
+        position = 0
+        for run, (first, stop) in enumerate(runs):
+            new_chunks.extend(chunks[position:first])
+            new_starts.append(starts[position:first])
+            notes = NoteBuffer.concatenate(chunks[first:stop])
+            notes.remove_at(notes.indices_of(removed_by_run[run]))
+            notes.merge_sorted(added_by_run[run])
+            if len(notes) < chunk_notes // 2 and stop < count:
+                # Take in the next (untouched) chunk, so deletions don't leave slivers behind
+                notes = NoteBuffer.concatenate([notes, chunks[stop]])
+                stop += 1
+            pieces = _freeze(notes, chunk_notes)
+            released.extend(chunks[first:stop])
+            created.extend(pieces)
+            new_chunks.extend(pieces)
+            new_starts.append([piece['start'][0] for piece in pieces])
+            nbytes += sum(piece.nbytes for piece in pieces) - sum(chunk.nbytes for chunk in chunks[first:stop])
+            position = stop
+        new_chunks.extend(chunks[position:])
+        new_starts.append(starts[position:])
+
+        snapshot = NoteSnapshot.__new__(NoteSnapshot)
+        snapshot.chunks = tuple(new_chunks)
+        snapshot.first_starts = np.concatenate(new_starts).astype(np.float64, copy=False)
+        snapshot.nbytes = nbytes
+        snapshot._count = self._count + sum(len(piece) for piece in created) - sum(len(chunk) for chunk in released)
+        return snapshot, created, released
+
+    @staticmethod
+    def _group(notes: NoteBuffer, runs: np.ndarray, run_count: int) -> list:
+        """Splits notes into one buffer per run, given each note's run."""
+        order = np.argsort(runs, kind='stable')
+        bounds = np.searchsorted(runs[order], np.arange(run_count + 1))
+        return [notes[order[bounds[run]:bounds[run + 1]]] for run in range(run_count)]
+
+
+class _HistoryStep:
+    """A snapshot and the chunks that differ from the snapshot of the step before it."""
+
+    __slots__ = ('snapshot', 'created', 'released')
+
+    def __init__(self, snapshot, created=(), released=()):
+        self.snapshot = snapshot
+        self.created = list(created) # Chunks this step's snapshot introduced
+        self.released = list(released) # Chunks of the previous snapshot it dropped
+
+    @property
+    def created_bytes(self) -> int:
+        return sum(chunk.nbytes for chunk in self.created)
+
+
+class NoteHistory(QObject):
+    """
+    Undo/redo for a NoteModel, kept as a chain of NoteSnapshots.
+
+    Every reset and delta of the model becomes a step. A delta step costs the
+    chunks it rebuilt (so it grows with the edit, not with the session) plus
+    one slot per chunk; a reset step copies the new notes once. Undo and redo
+    diff only the chunks that differ between two neighbouring steps and hand
+    the result to the model as a single delta, so the display and the player
+    update incrementally as for any other edit. A step that replaced most of
+    the notes is replayed as a reset instead.
+
+    Memory is counted per chunk, shared chunks once. Beyond the budget, old
+    steps are compacted first (an intermediate state whose chunks the next
+    step rebuilt anyway is merged into that step) and then dropped, oldest
+    first. Steps made between begin_group() and end_group() collapse into one,
+    so an action made of several deltas undoes in one step.
+    """
+
+    historyChanged = Signal(bool, bool) # can undo, can redo
+
+    def __init__(self, note_model, memory_budget_mb: float = NOTE_HISTORY_MEMORY_BUDGET_MB,
+                 chunk_notes: int = NOTE_HISTORY_CHUNK_NOTES, parent=None):
+        super().__init__(parent)
+        self.note_model = note_model
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self.chunk_notes = max(1, chunk_notes)
+        self._replaying = False # Set while undo/redo drives the model, whose signals must not become steps
+        self._group_step = None # Index of the step an open group collapses into; -1 until its first step
+        self._start(note_model.notes)
+        note_model.notesReset.connect(self._on_notes_reset)
+        note_model.notesChanged.connect(self._on_notes_changed)
+
+    @property
+    def can_undo(self) -> bool:
+        return self._index > 0
+
+    @property
+    def can_redo(self) -> bool:
+        return self._index < len(self._steps) - 1
+
+    @property
+    def undo_steps(self) -> int:
+        return self._index
+
+    @property
+    def redo_steps(self) -> int:
+        return len(self._steps) - 1 - self._index
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the history: every chunk once, plus the snapshots' slots."""
+        return self._memory
+
+    def clear(self):
+        """Forgets every step; the model's current notes become the starting point."""
+        self._group_step = None
+        self._start(self.note_model.notes)
+        self.historyChanged.emit(False, False)
+
+    def begin_group(self):
+        """Collapses the steps that follow, until end_group(), into one."""
+        self._group_step = -1
+
+    def end_group(self):
+        self._group_step = None
+
+    def undo(self) -> bool:
+        """Returns the model to the previous step. False if there is none."""
+        if not self.can_undo:
+            return False
+        self.end_group()
+        step = self._steps[self._index]
+        self._replay(self._steps[self._index - 1].snapshot, removed=step.created, added=step.released)
+        self._index -= 1
+        self.historyChanged.emit(self.can_undo, self.can_redo)
+        return True
+
+    def redo(self) -> bool:
+        """Re-applies the step undone last. False if there is none."""
+        if not self.can_redo:
+            return False
+        self.end_group()
+        step = self._steps[self._index + 1]
+        self._replay(step.snapshot, removed=step.released, added=step.created)
+        self._index += 1
+        self.historyChanged.emit(self.can_undo, self.can_redo)
+        return True
+
+    def _start(self, notes):
+        snapshot = NoteSnapshot.from_buffer(notes, self.chunk_notes)
+        self._steps = [_HistoryStep(snapshot)]
+        self._index = 0 # Step the model is at
+        self._memory = snapshot.nbytes + snapshot.overhead
+
+    def _replay(self, target: NoteSnapshot, removed: list, added: list):
+        """Brings the model to target, given the chunks only the current snapshot has and those only target has."""
+        self._replaying = True
+        try:
+            changed = sum(len(chunk) for chunk in removed) + sum(len(chunk) for chunk in added)
+            if changed >= max(len(target), 4 * self.chunk_notes):
+                self.note_model.reset(target.to_buffer()) # Most notes change anyway (e.g. a reset undone)
+            else:
+                # Notes that merely moved to a rebuilt chunk appear on both sides and cancel out
+                leaving, entering = NoteBuffer.concatenate(removed), NoteBuffer.concatenate(added)
+                self.note_model.replace_notes(leaving.difference(entering), entering.difference(leaving))
+        finally:
+            self._replaying = False
+
+    def _on_notes_reset(self, notes):
+        if self._replaying:
+            return
+        current = self._steps[self._index].snapshot
+        snapshot = NoteSnapshot.from_buffer(notes, self.chunk_notes)
+        self._push(_HistoryStep(snapshot, snapshot.chunks, current.chunks))
+
+    def _on_notes_changed(self, delta):
+        if self._replaying:
+            return
+        snapshot, created, released = self._steps[self._index].snapshot.apply(delta.removed, delta.added,
+                                                                               self.chunk_notes)
+        self._push(_HistoryStep(snapshot, created, released))
+
+    def _push(self, step: _HistoryStep):
+        while self.can_redo: # A new step forks the history; the undone steps are gone
+            dropped = self._steps.pop()
+            self._memory -= dropped.created_bytes + dropped.snapshot.overhead
+        self._steps.append(step)
+        self._index += 1
+        self._memory += step.created_bytes + step.snapshot.overhead
+        if self._group_step is not None and self._group_step == self._index - 1: # Still the group's step
+            if self._group_step:
+                self._merge_into_next(self._group_step)
+            else:
+                self._drop_oldest() # The budget already made it the starting point
+        self._enforce_budget()
+        if self._group_step is not None:
+            self._group_step = self._index
+        self.historyChanged.emit(self.can_undo, self.can_redo)
+
+    def _enforce_budget(self):
+        if self._memory <= self.memory_budget:
+            return
+        target = self.memory_budget * 3 // 4 # Some headroom, so the next few steps don't trim again
+        # Compaction: an old step whose chunks the following step rebuilt again is an
+        # intermediate state of the same region; merging frees those chunks. Only the
+        # older half of the undo steps is coarsened.
+        index = 1
+        while self._memory > target and index < self._index // 2:
+            if self._frees_on_merge(index):
+                self._merge_into_next(index)
+            else:
+                index += 1
+        while self._memory > target and self._index > 0:
+            self._drop_oldest()
+
+    def _frees_on_merge(self, index: int) -> bool:
+        released = {id(chunk) for chunk in self._steps[index + 1].released}
+        return any(id(chunk) in released for chunk in self._steps[index].created)
+
+    def _merge_into_next(self, index: int):
+        """Removes the state of step index; the step after it now leads from the step before."""
+        step, after = self._steps[index], self._steps[index + 1]
+        released = {id(chunk) for chunk in after.released}
+        freed = {id(chunk) for chunk in step.created if id(chunk) in released} # Only ever in this state
+        after.created = [chunk for chunk in step.created if id(chunk) not in freed] + after.created
+        after.released = step.released + [chunk for chunk in after.released if id(chunk) not in freed]
+        self._memory -= sum(chunk.nbytes for chunk in step.created if id(chunk) in freed) + step.snapshot.overhead
+        del self._steps[index]
+        if self._index > index:
+            self._index -= 1
+
+    def _drop_oldest(self):
+        """The second step becomes the starting point; chunks only the first one had are freed."""
+        oldest, after = self._steps[0], self._steps[1]
+        self._memory -= sum(chunk.nbytes for chunk in after.released) + oldest.snapshot.overhead
+        after.created, after.released = [], []
+        del self._steps[0]
+        self._index -= 1
@@ -0,0 +1,127 @@
+import numpy as np
+from PySide6.QtCore import QObject, Signal
+
+from note_buffer import NoteBuffer, as_note_buffer
+
+
+class NoteDelta:
+    """
+    One change to a NoteModel: the notes that left it and the notes that entered it.
+
+    A modified note appears in both, with its old values under removed and its
+    new values under added, under the same id. Consumers that keep structures
+    of their own (density map, scheduler timeline) remove the removed records
+    and insert the added ones instead of rebuilding from the whole note set.
+    """
+
+    __slots__ = ('version', 'removed', 'added')
+
+    def __init__(self, version: int, removed: NoteBuffer, added: NoteBuffer):
+        self.version = version # Model version this delta leads to
+        self.removed = removed
+        self.added = added
+
+    @property
+    def modified_ids(self) -> np.ndarray:
+        """Ids of notes that were changed rather than added or removed."""
+        return np.intersect1d(self.removed.id, self.added.id)
+
+    def __repr__(self) -> str:
+        return f"NoteDelta(v{self.version}: -{len(self.removed)} +{len(self.added)})"
+
+
+class NoteModel(QObject):
+    """
+    The one note set of a session, kept sorted by (start, pitch).
+
+    Every note gets an id when it enters the model. Edits emit notesChanged
+    with a NoteDelta; replacing the whole set (a loaded file, plugin output)
+    emits notesReset with the new buffer. The buffer behind notes is shared
+    with the consumers, which read it but never modify it.
+    """
+
+    notesReset = Signal(object) # NoteBuffer
+    notesChanged = Signal(object) # NoteDelta
+
+    def __init__(self, notes=None, parent=None):
+        super().__init__(parent)
+        self.version = 0 # Bumped on every reset and delta
+        self._notes = self._adopt(notes)
+
+    @property
+    def notes(self) -> NoteBuffer:
+        return self._notes
+
+    def __len__(self) -> int:
+        return len(self._notes)
+
+    def reset(self, notes):
+        """Replaces every note. The buffer is adopted (sorted in place), not copied."""
+        self._notes = self._adopt(notes)
+        self.version += 1
+        self.notesReset.emit(self._notes)
+
+    def add_notes(self, notes) -> NoteDelta:
+        """
+        Inserts notes at their sorted positions, as new notes.
+
+        Args:
+            notes: NoteBuffer or pretty_midi.Note-like objects; every note gets a
+                   fresh id, also records taken from this model (e.g. a pasted
+                   selection), so ids stay unique. replace_notes() keeps ids.
+
+        Returns:
+            The emitted delta; its added buffer carries the ids given to the notes
+        """
+        added = NoteBuffer.from_notes(notes) # A copy, so the ids given here don't leak into the caller's buffer
+        added.id[:] = 0
+        added.assign_ids()
+        return self._commit(np.empty(0, dtype=np.intp), added)
+
+    def remove_notes(self, notes) -> NoteDelta:
+        """Removes the given notes (records of this model, matched by start time and id)."""
+        return self._commit(self._notes.indices_of(notes), NoteBuffer())
+
+    def modify_notes(self, notes, **fields) -> NoteDelta:
+        """
+        Changes columns of the given notes, e.g. modify_notes(selection, velocity=100).
+
+        Args:
+            notes: Records of this model, matched by start time and id
+            **fields: Column name and new value (scalar or one per note)
+        """
+        indices = self._notes.indices_of(notes)
+        changed = self._notes.take(indices) # A copy
+        for name, value in fields.items():
+            changed.data[name] = value
+        return self._commit(indices, changed)
+
+    def replace_notes(self, removed, added) -> NoteDelta:
+        """
+        Removes some notes and inserts others as one delta; undo and redo replay steps through here.
+
+        Args:
+            removed: Records of this model, matched by start time and id
+            added: Notes to insert; records that carry an id keep it, so a restored note is the same note again
+        """
+        added = NoteBuffer.from_notes(added)
+        added.assign_ids()
+        return self._commit(self._notes.indices_of(removed), added)
+
+    def _commit(self, remove_indices: np.ndarray, added: NoteBuffer) -> NoteDelta:
+        removed = self._notes.take(remove_indices)
+        if not len(removed) and not len(added):
+            return NoteDelta(self.version, removed, added) # Nothing to tell anyone
+        self._notes.remove_at(remove_indices)
+        self._notes.merge_sorted(added)
+        self.version += 1
+        delta = NoteDelta(self.version, removed, added)
+        self.notesChanged.emit(delta)
+        return delta
+
+    @staticmethod
+    def _adopt(notes) -> NoteBuffer:
+        notes = as_note_buffer(notes)
+        notes.sort() # Culling, range queries and delta lookups rely on start order
+        notes.assign_ids()
+        return notes
@@ -1,7 +1,12 @@
 # plugin_api.py
 import pretty_midi
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable
+import threading
+
+class GenerationCancelled(Exception):
+    """Raised inside a plugin's generate() when the user cancels the generation"""
+
 
 class PluginBase(ABC):
     """Base class for all piano roll plugins"""
@@ -12,6 +17,8 @@ class PluginBase(ABC):
         self.author = "Unknown"
         self.version = "1.0"
         self.parameters = {}
+        self._progress_callback = None # Set by PluginManager for the duration of a generate() call
+        self._cancel_event = None
         
     @abstractmethod
     def generate(self, existing_notes: List[pretty_midi.Note] = None, **kwargs) -> List[pretty_midi.Note]:
@@ -69,6 +76,37 @@ class PluginBase(ABC):
         
         return validated
     
+    def report_progress(self, fraction: Optional[float] = None, message: str = "") -> None:
+        """
+        Report progress from inside generate(); also where a cancellation takes effect
+        
+        Long-running plugins should call this now and then (e.g. while waiting
+        for a network reply) so the UI can show progress and stop the run.
+        
+        Args:
+            fraction: Share of the work done, 0.0 to 1.0, or None if unknown
+            message: Optional short status text
+            
+        Raises:
+            GenerationCancelled: If the user cancelled this generation
+        """
+        if self.is_cancelled():
+            raise GenerationCancelled(f"{self.get_name()}: generation cancelled")
+        callback = getattr(self, '_progress_callback', None)
+        if callback is not None:
+            callback(None if fraction is None else max(0.0, min(1.0, fraction)), message)
+    
+    def is_cancelled(self) -> bool:
+        """Whether the user cancelled the current generation"""
+        cancel_event = getattr(self, '_cancel_event', None)
+        return cancel_event is not None and cancel_event.is_set()
+    
+    def bind_run(self, progress_callback: Optional[Callable[[Optional[float], str], None]] = None,
+                 cancel_event: Optional[threading.Event] = None) -> None:
+        """Attach (or, called without arguments, detach) the progress and cancel channel of one generate() call"""
+        self._progress_callback = progress_callback
+        self._cancel_event = cancel_event
+    
     def get_name(self) -> str:
         """Get the plugin name"""
         return self.name
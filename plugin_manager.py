@@ -3,10 +3,12 @@ import os
 import sys
 import importlib
 import importlib.util
-from typing import List, Dict, Optional, Any
+import threading
+from typing import List, Dict, Optional, Any, Callable
 import pretty_midi
 
-from plugin_api import PluginBase
+from plugin_api import PluginBase, GenerationCancelled
+from note_buffer import NoteBuffer
 from utils import get_resource_path # Import the new helper
 
 DEFAULT_PLUGINS_DIR_NAME = "plugins"
@@ -105,19 +107,31 @@ class PluginManager:
     
     def generate_notes(self, 
                        plugin_id: str, 
-                       existing_notes: Optional[List[pretty_midi.Note]] = None, 
-                       parameters: Optional[Dict[str, Any]] = None
-                       ) -> List[pretty_midi.Note]:
+                       existing_notes: Optional[NoteBuffer] = None, 
+                       parameters: Optional[Dict[str, Any]] = None,
+                       progress_callback: Optional[Callable[[Optional[float], str], None]] = None,
+                       cancel_event: Optional[threading.Event] = None
+                       ) -> NoteBuffer:
         """
         Generate notes using a specific plugin
         
+        Plugins keep working with lists of pretty_midi.Note; conversion to and
+        from NoteBuffer happens here, at the plugin boundary.
+        
         Args:
             plugin_id: ID of the plugin to use
-            existing_notes: Optional list of existing notes
+            existing_notes: Optional NoteBuffer (or list) of existing notes
             parameters: Optional dictionary of parameters
+            progress_callback: Optional callable(fraction or None, message), called
+                from whichever thread runs the plugin
+            cancel_event: Optional threading.Event; once set, the plugin's next
+                report_progress() raises GenerationCancelled
             
         Returns:
-            List of generated pretty_midi.Note objects
+            NoteBuffer of generated notes
+            
+        Raises:
+            GenerationCancelled: If cancel_event was set during generation
         """
         plugin = self.get_plugin(plugin_id)
         if not plugin:
@@ -129,6 +143,16 @@ class PluginManager:
         
         # Ensure an empty list is passed if existing_notes is None,
         # if the plugin's generate method expects a list.
-        notes_to_pass = existing_notes if existing_notes is not None else []
+        if isinstance(existing_notes, NoteBuffer):
+            notes_to_pass = existing_notes.to_notes()
+        else:
+            notes_to_pass = existing_notes if existing_notes is not None else []
         
-        return plugin.generate(notes_to_pass, **validated_params)
+        plugin.bind_run(progress_callback, cancel_event)
+        try:
+            generated = plugin.generate(notes_to_pass, **validated_params)
+        finally:
+            plugin.bind_run()
+        if cancel_event is not None and cancel_event.is_set():
+            raise GenerationCancelled(f"{plugin.get_name()}: generation cancelled")
+        return NoteBuffer.from_notes(generated)
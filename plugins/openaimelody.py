@@ -485,6 +485,9 @@ Time range: 0.0 to {end_time:.1f} beats
                 elapsed = time.time() - start_time
                 # This would be replaced with your UI's progress indicator
                 print(f"\rGenerating with OpenAI {progress_chars[i]} {elapsed:.1f}s", end="")
+                # Shows the wait in the plugin panel; raises GenerationCancelled if the user cancelled.
+                # The request thread is a daemon and is simply abandoned.
+                self.report_progress(None, f"Waiting for OpenAI... {elapsed:.0f}s")
                 time.sleep(0.1)
             
             print("\rGeneration complete!                    ")
@@ -1,6 +1,7 @@
 from PySide6.QtCore import Qt, QRect, QPoint, QRectF
-from PySide6.QtGui import QColor, QPen, QBrush, QLinearGradient, QFont, QRadialGradient, QFontMetrics
-import pretty_midi
+from PySide6.QtGui import QColor, QPen, QBrush, QLinearGradient, QFont, QRadialGradient, QFontMetrics, QPainter, QImage
+import math
+import numpy as np
 
 from config.constants import (
     MIN_PITCH, MAX_PITCH, WHITE_KEY_WIDTH, BLACK_KEY_WIDTH,
@@ -8,6 +9,17 @@ from config.constants import (
     MIN_LABEL_PITCH, MAX_LABEL_PITCH
 )
 from config import theme # Updated to import the whole module
+from ui.paint_cache import get_paint_resources, NOTE_LABELS, MEDIUM_VELOCITY_THRESHOLD, HIGH_VELOCITY_THRESHOLD
+from ui.note_density import LOD_SATURATION_COUNT
+
+MIN_NOTE_WIDTH_PX = 4 # Very short notes are still drawn this wide
+DETAIL_MIN_ROW_HEIGHT_PX = 12 # Rounded, gradient notes below this row height are indistinguishable from flat ones
+DETAIL_MIN_NOTE_WIDTH_PX = 8 # Median visible note width needed for the detailed style
+IS_WHITE_PITCH_CLASS = np.array([pc in (0, 2, 4, 5, 7, 9, 11) for pc in range(12)])
+MEASURE_NUMBER_MAX_WIDTH_PX = 40 # Measures starting this far left of the visible area may still show their number
+MEASURE_TILE_PAD_PX = 1 # Room left of the measure line in the cached measure tile
+MEASURE_TILE_HEIGHT = 96 # Logical height of the measure tile; a multiple of the dotted sixteenth pen's period
+VELOCITY_BUCKET_EDGES = np.array([MEDIUM_VELOCITY_THRESHOLD, HIGH_VELOCITY_THRESHOLD]) # Same buckets as velocity_bucket()
 
 # Assuming these are defined in theme.py (if not, they will be added later)
 # For now, using fallbacks if specific names are not yet in the imported theme object.
@@ -21,11 +33,78 @@ from config import theme # Updated to import the whole module
 # PIANO_KEY_SEPARATOR_COLOR = getattr(theme, 'PIANO_KEY_SEPARATOR_COLOR', theme.BORDER_COLOR_NORMAL) # Example fallback
 
 
-def draw_time_grid(painter, width, height, time_scale, bpm, time_signature_numerator, time_signature_denominator, parent_widget, vertical_zoom_factor=1.0):
-    """Draw the time grid with beats and measures and horizontal note lines"""
+def draw_note_rows(painter, x_start, x_end, vertical_zoom_factor=1.0):
+    """Draw the horizontal note row lines, highlighting the C rows"""
+    effective_white_key_height = WHITE_KEY_HEIGHT * vertical_zoom_factor
+    painter.setPen(get_paint_resources().row_line_pen)
+    for pitch in range(MIN_PITCH, MAX_PITCH + 1):
+        y_pos = (MAX_PITCH - pitch) * effective_white_key_height
+        painter.drawLine(x_start, int(y_pos), x_end, int(y_pos))
+        if pitch % 12 == 0: # C rows
+            highlight_rect = QRect(x_start, int(y_pos), x_end - x_start, int(effective_white_key_height))
+            painter.fillRect(highlight_rect, theme.GRID_ROW_HIGHLIGHT_COLOR)
+
+def grid_line_offsets(time_scale, bpm, time_signature_numerator, time_signature_denominator):
+    """
+    Positions of the sixteenth and beat lines inside one measure, relative to its start.
+
+    Sixteenths on a quarter note and beats on the measure line are left out, as
+    they are covered by the stronger line drawn there.
+
+    Returns:
+        (pixels_per_measure, sixteenth_offsets, beat_offsets): pixels_per_measure is 0
+        if the tempo or time signature leaves no grid to draw
+    """
+    if bpm <= 0 or time_signature_numerator <= 0:
+        return 0.0, (), ()
+    pixels_per_quarter_note = time_scale * 60.0 / bpm
+    pixels_per_beat = pixels_per_quarter_note * (4.0 / time_signature_denominator) if time_signature_denominator > 0 else pixels_per_quarter_note
+    pixels_per_measure = pixels_per_beat * time_signature_numerator
+    if pixels_per_measure <= 0:
+        return 0.0, (), ()
+
+    sixteenth_step = pixels_per_quarter_note / 4.0
+    sixteenth_offsets = ()
+    if sixteenth_step > 5: # Only draw if lines are reasonably spaced
+        count = int(math.ceil(pixels_per_measure / sixteenth_step - 1e-9))
+        sixteenth_offsets = tuple(i * sixteenth_step for i in range(1, count) if i % 4 != 0)
+    beat_offsets = tuple(i * pixels_per_beat for i in range(1, time_signature_numerator))
+    return pixels_per_measure, sixteenth_offsets, beat_offsets
+
+
+def draw_measure_grid(painter, x_start, line_offsets, y_top, y_bottom, measure_line=True):
+    """Draw one measure's vertical grid lines, the measure starting at x_start"""
+    pixels_per_measure, sixteenth_offsets, beat_offsets = line_offsets
+    resources = get_paint_resources()
+    painter.setPen(resources.sixteenth_line_pen)
+    for offset in sixteenth_offsets:
+        painter.drawLine(int(x_start + offset), y_top, int(x_start + offset), y_bottom)
+    painter.setPen(resources.beat_line_pen)
+    for offset in beat_offsets:
+        painter.drawLine(int(x_start + offset), y_top, int(x_start + offset), y_bottom)
+    if measure_line:
+        painter.setPen(resources.measure_line_pen)
+        painter.drawLine(int(x_start), y_top, int(x_start), y_bottom)
+
+
+def draw_time_grid(painter, width, height, time_scale, bpm, time_signature_numerator, time_signature_denominator, parent_widget, vertical_zoom_factor=1.0, layer_cache=None, visible_rect=None):
+    """
+    Draw the time grid with beats and measures and horizontal note lines.
+
+    Only the measures intersecting visible_rect (the whole width if None) are
+    drawn. With a layer_cache, the note rows and one measure of vertical lines
+    are blitted from cached tiles, so the cost per frame depends on the
+    visible measures rather than the session length.
+    """
     keyboard_width = WHITE_KEY_WIDTH # This constant is from config.constants, not theme
-    
-    effective_white_key_height = WHITE_KEY_HEIGHT * vertical_zoom_factor # WHITE_KEY_HEIGHT from config.constants
+    resources = get_paint_resources()
+    if visible_rect is None:
+        visible_rect = QRect(0, 0, width, height)
+    device_pixel_ratio = painter.device().devicePixelRatioF()
+    grid_left = max(keyboard_width, visible_rect.left())
+    grid_right = min(width, visible_rect.right() + 1)
+    grid_top = max(0, visible_rect.top())
+    grid_bottom = min(height, visible_rect.bottom() + 1)
     
     current_viewport_y_offset = 0
     if parent_widget and hasattr(parent_widget, 'verticalScrollBar'):
@@ -36,70 +115,71 @@ def draw_time_grid(painter, width, height, time_scale, bpm, time_signature_numer
             current_viewport_y_offset = grandparent_obj.verticalScrollBar().value()
     
     # Draw horizontal lines for note rows
-    painter.setPen(QPen(theme.KEY_GRID_LINE_COLOR, 0.8, Qt.SolidLine)) # Use new name, subtle width
-    for pitch in range(MIN_PITCH, MAX_PITCH + 1):
-        y_pos = (MAX_PITCH - pitch) * effective_white_key_height
-        painter.drawLine(keyboard_width, int(y_pos), width, int(y_pos))
-        note_name = pretty_midi.note_number_to_name(pitch)
-        if note_name.endswith('C') and '#' not in note_name:
-            highlight_rect = QRect(keyboard_width, int(y_pos), width - keyboard_width, int(effective_white_key_height))
-            painter.fillRect(highlight_rect, theme.GRID_ROW_HIGHLIGHT_COLOR)
+    row_tile = layer_cache.grid_rows(vertical_zoom_factor, device_pixel_ratio) if layer_cache else None
+    if row_tile is not None:
+        # The rows look the same at every x, so one narrow tile is repeated across the visible width
+        row_tile_height = int(round(row_tile.height() / row_tile.devicePixelRatio()))
+        rows_bottom = min(grid_bottom, row_tile_height)
+        if grid_right > grid_left and rows_bottom > grid_top:
+            painter.drawTiledPixmap(QRect(grid_left, grid_top, grid_right - grid_left, rows_bottom - grid_top),
+                                    row_tile, QPoint(0, grid_top))
+    else:
+        draw_note_rows(painter, keyboard_width, width, vertical_zoom_factor)
 
     # Time signature display
     ts_text = f"{time_signature_numerator}/{time_signature_denominator}"
-    painter.setPen(QPen(theme.SECONDARY_TEXT_COLOR, 1.0))
-    painter.setFont(QFont(theme.FONT_FAMILY_PRIMARY, theme.FONT_SIZE_S, weight=theme.FONT_WEIGHT_BOLD))
+    painter.setPen(resources.grid_text_pen)
+    painter.setFont(resources.time_signature_font)
     ts_x_pos = keyboard_width + theme.PADDING_S
     ts_y_pos = current_viewport_y_offset + theme.PADDING_M + theme.FONT_SIZE_S # Adjusted for font size
     painter.drawText(ts_x_pos, ts_y_pos, ts_text)
 
-    actual_pixels_per_quarter_note = 0
-    if bpm > 0:
-        seconds_per_quarter_note = 60.0 / bpm
-        actual_pixels_per_quarter_note = time_scale * seconds_per_quarter_note
-    
-    # Draw sixteenth note lines (very faint)
-    painter.setPen(QPen(theme.GRID_LINE_COLOR, 0.5, Qt.DotLine)) # Subtle width
-    sixteenth_note_step_pixels = actual_pixels_per_quarter_note / 4.0 if actual_pixels_per_quarter_note > 0 else 0
-    if sixteenth_note_step_pixels > 5: # Only draw if lines are reasonably spaced
-        for i in range(int(width / sixteenth_note_step_pixels) + 1):
-            if i % 4 != 0:
-                x = i * sixteenth_note_step_pixels + keyboard_width
-                painter.drawLine(int(x), 0, int(x), height)
-
-    pixels_per_beat = actual_pixels_per_quarter_note * (4.0 / time_signature_denominator) if time_signature_denominator > 0 else actual_pixels_per_quarter_note
-    
-    # Draw beat lines (more visible than grid, less than measure)
-    if pixels_per_beat > 0:
-        painter.setPen(QPen(theme.GRID_BEAT_LINE_COLOR, 0.7, Qt.SolidLine)) # Subtle width
-        for i in range(int(width / pixels_per_beat) + 1):
-            if i % time_signature_numerator != 0:
-                x = i * pixels_per_beat + keyboard_width
-                painter.drawLine(int(x), 0, int(x), height)
-
-    # Draw measure lines (most prominent grid line)
-    if pixels_per_beat > 0 and time_signature_numerator > 0:
-        pixels_per_measure = pixels_per_beat * time_signature_numerator
-        if pixels_per_measure > 0:
-            painter.setPen(QPen(theme.GRID_MEASURE_LINE_COLOR, 1.0, Qt.SolidLine)) # Slightly more prominent
-            measure_number_y_pos = current_viewport_y_offset + theme.PADDING_M + theme.FONT_SIZE_S
-            for i in range(int(width / pixels_per_measure) + 1):
-                x = i * pixels_per_measure + keyboard_width
-                painter.drawLine(int(x), 0, int(x), height)
-                painter.setPen(QPen(theme.SECONDARY_TEXT_COLOR, 1.0))
-                painter.setFont(QFont(theme.FONT_FAMILY_PRIMARY, theme.FONT_SIZE_XS))
-                painter.drawText(int(x + theme.PADDING_XS), measure_number_y_pos, str(i + 1))
-            
-    # Draw keyboard separator line
-    # Using BORDER_COLOR_NORMAL for a standard separator
-    piano_key_separator_color = getattr(theme, 'PIANO_KEY_SEPARATOR_COLOR', theme.BORDER_COLOR_NORMAL)
-    painter.setPen(QPen(piano_key_separator_color, 1.0)) 
-    painter.drawLine(keyboard_width, 0, keyboard_width, height)
-
-def draw_piano_keys(painter, vertical_zoom_factor=1.0):
-    """Draw the piano keyboard on the left side"""
+    if layer_cache:
+        line_offsets = layer_cache.grid_lines(time_scale, bpm, time_signature_numerator, time_signature_denominator)
+    else:
+        line_offsets = grid_line_offsets(time_scale, bpm, time_signature_numerator, time_signature_denominator)
+    pixels_per_measure = line_offsets[0]
+    if pixels_per_measure <= 0 or grid_right <= grid_left or grid_bottom <= grid_top:
+        return
+
+    # Measures whose lines or number can reach the visible area; numbers extend right of their line
+    first_measure = max(0, int((grid_left - keyboard_width - MEASURE_NUMBER_MAX_WIDTH_PX) // pixels_per_measure))
+    last_measure = int((grid_right - keyboard_width) // pixels_per_measure)
+
+    # Draw sixteenth, beat and measure lines (faint to most prominent)
+    measure_tile = None
+    if layer_cache:
+        measure_tile = layer_cache.measure_grid(time_scale, bpm, time_signature_numerator, time_signature_denominator, device_pixel_ratio)
+    for i in range(first_measure, last_measure + 1):
+        x = i * pixels_per_measure + keyboard_width
+        if measure_tile is not None:
+            # The tile starts MEASURE_TILE_PAD_PX left of the line so its antialiased edge fits
+            tile_width = int(round(measure_tile.width() / measure_tile.devicePixelRatio()))
+            painter.drawTiledPixmap(QRect(int(x) - MEASURE_TILE_PAD_PX, grid_top, tile_width, grid_bottom - grid_top),
+                                    measure_tile, QPoint(0, grid_top % MEASURE_TILE_HEIGHT))
+        else:
+            draw_measure_grid(painter, x, line_offsets, grid_top, grid_bottom)
+
+    # Measure numbers
+    measure_number_y_pos = current_viewport_y_offset + theme.PADDING_M + theme.FONT_SIZE_S
+    painter.setPen(resources.grid_text_pen)
+    painter.setFont(resources.measure_number_font)
+    for i in range(first_measure, last_measure + 1):
+        x = i * pixels_per_measure + keyboard_width
+        painter.drawText(int(x + theme.PADDING_XS), measure_number_y_pos, str(i + 1))
+
+    # The keyboard separator line is drawn by the frozen keyboard widget (ui/piano_keyboard.py)
+
+def draw_piano_keys(painter, vertical_zoom_factor=1.0, layer_cache=None):
+    """Draw the piano keyboard on the left side (blitted from layer_cache if given)"""
+    keys_pixmap = layer_cache.piano_keys(vertical_zoom_factor, painter.device().devicePixelRatioF()) if layer_cache else None
+    if keys_pixmap is not None:
+        painter.drawPixmap(0, 0, keys_pixmap)
+        return
+
     effective_white_key_height = WHITE_KEY_HEIGHT * vertical_zoom_factor
     effective_black_key_height = BLACK_KEY_HEIGHT * vertical_zoom_factor
+    resources = get_paint_resources()
     drawn_black_keys = set()
 
     # Define label colors (assuming these will be added to theme.py)
@@ -119,7 +199,7 @@ def draw_piano_keys(painter, vertical_zoom_factor=1.0):
             gradient.setColorAt(0.0, base_color.lighter(105))
             gradient.setColorAt(1.0, base_color.darker(102))
             painter.fillRect(key_rect, gradient)
-            painter.setPen(QPen(theme.KEY_BORDER_COLOR, 0.5)) # Use new theme constant, thin border
+            painter.setPen(resources.key_border_pen) # Thin border
             painter.drawRect(key_rect)
     
     # Draw black keys on top
@@ -137,27 +217,17 @@ def draw_piano_keys(painter, vertical_zoom_factor=1.0):
             gradient.setColorAt(0.0, base_color.lighter(115)) # Black keys get less intense gradient
             gradient.setColorAt(1.0, base_color)
             painter.fillRect(key_rect, gradient)
-            painter.setPen(QPen(theme.KEY_BORDER_COLOR, 0.5)) # Use new theme constant
+            painter.setPen(resources.key_border_pen)
             painter.drawRect(key_rect)
 
     # Draw labels on keys
-    label_font = QFont(theme.FONT_FAMILY_PRIMARY, theme.FONT_SIZE_S) # Use theme font
-    painter.setFont(label_font)
-    metrics = QFontMetrics(label_font)
+    painter.setFont(resources.key_label_font)
 
     for pitch_label in range(MIN_LABEL_PITCH, MAX_LABEL_PITCH + 1):
         if pitch_label < MIN_PITCH or pitch_label > MAX_PITCH: continue
         pitch_class = pitch_label % 12
         is_white_key_for_label = pitch_class in [0, 2, 4, 5, 7, 9, 11]
-        
-        original_note_name = pretty_midi.note_number_to_name(pitch_label)
-        # ... (name correction logic remains same)
-        note_part = original_note_name[:-1]
-        octave_str = original_note_name[-1:]
-        corrected_label_name = original_note_name
-        if octave_str.isdigit():
-            octave_part = int(octave_str)
-            corrected_label_name = f"{note_part}{octave_part + 1}"
+        corrected_label_name = NOTE_LABELS[pitch_label]
 
         key_slot_y_top = (MAX_PITCH - pitch_label) * effective_white_key_height
         
@@ -171,70 +241,171 @@ def draw_piano_keys(painter, vertical_zoom_factor=1.0):
                 painter.setPen(piano_key_black_label_color)
                 painter.drawText(black_key_rect, Qt.AlignCenter | Qt.AlignVCenter, corrected_label_name)
 
-def draw_notes(painter, notes, time_scale, vertical_zoom_factor=1.0):
-    """Draw the MIDI notes as colored rectangles"""
+def visible_pitch_range(vertical_zoom_factor, visible_rect):
+    """(lowest, highest) pitch with a row inside visible_rect"""
+    effective_white_key_height = WHITE_KEY_HEIGHT * vertical_zoom_factor
+    highest_pitch = min(MAX_PITCH, MAX_PITCH - math.floor(visible_rect.top() / effective_white_key_height))
+    lowest_pitch = max(MIN_PITCH, MAX_PITCH - math.floor((visible_rect.bottom() + 1) / effective_white_key_height))
+    return lowest_pitch, highest_pitch
+
+def visible_note_indices(notes, time_scale, vertical_zoom_factor, visible_rect):
+    """
+    Indices of the notes (a start-sorted NoteBuffer) that intersect visible_rect.
+
+    The time window is bisected on the start column with the buffer's
+    max-duration bound, then the few candidates are filtered to the visible
+    pitch rows, so the cost follows what is on screen rather than the session size.
+    """
+    effective_white_key_height = WHITE_KEY_HEIGHT * vertical_zoom_factor
+    # Short notes are widened to MIN_NOTE_WIDTH_PX, so look that much further left
+    t0 = (visible_rect.left() - WHITE_KEY_WIDTH - MIN_NOTE_WIDTH_PX) / time_scale
+    t1 = (visible_rect.right() + 1 - WHITE_KEY_WIDTH) / time_scale
+    indices = notes.overlapping_indices(t0, t1)
+    if not len(indices):
+        return indices
+    lowest_pitch, highest_pitch = visible_pitch_range(vertical_zoom_factor, visible_rect)
+    pitches = notes.pitch[indices]
+    return indices[(pitches >= lowest_pitch) & (pitches <= highest_pitch)]
+
+def note_rects(notes, time_scale, vertical_zoom_factor=1.0):
+    """
+    Pixel rectangles of all notes, computed on the columns at once.
+
+    Returns:
+        (x, y, width, height, keep) int arrays for the notes inside the pitch
+        range, plus the boolean mask keep selecting those notes from the buffer
+    """
     effective_white_key_height = WHITE_KEY_HEIGHT * vertical_zoom_factor
     effective_black_key_height = BLACK_KEY_HEIGHT * vertical_zoom_factor
-    note_label_color = getattr(theme, 'NOTE_LABEL_COLOR', QColor(0,0,0,180)) # Fallback
+    padding = 4
+    keep = (notes.pitch >= MIN_PITCH) & (notes.pitch <= MAX_PITCH)
+    pitch = notes.pitch[keep].astype(np.int64)
+    start = notes.start[keep]
+    y_pos = (MAX_PITCH - pitch) * effective_white_key_height
+    x_pos = start * time_scale + WHITE_KEY_WIDTH
+    width = np.maximum((notes.end[keep] - start) * time_scale, MIN_NOTE_WIDTH_PX)
+    is_white = IS_WHITE_PITCH_CLASS[pitch % 12]
+    height = np.where(is_white, effective_white_key_height - padding, effective_black_key_height - padding)
+    y_offset = np.where(is_white, padding / 2, (effective_white_key_height - effective_black_key_height) / 2 + (padding / 2))
+    return (x_pos.astype(np.int64), (y_pos + y_offset).astype(np.int64),
+            width.astype(np.int64), height.astype(np.int64), keep)
 
-    for note in notes:
-        if not hasattr(note, 'pitch') or not hasattr(note, 'start') or not hasattr(note, 'end'): continue
-        pitch = note.pitch
-        if pitch < MIN_PITCH or pitch > MAX_PITCH: continue
-        
-        y_pos = (MAX_PITCH - pitch) * effective_white_key_height 
-        x_pos = note.start * time_scale + WHITE_KEY_WIDTH
-        width = max((note.end - note.start) * time_scale, 4)
-        pitch_class = pitch % 12
-        is_white = pitch_class in [0, 2, 4, 5, 7, 9, 11]
-        padding = 4 
+def detailed_notes_wanted(notes, time_scale, vertical_zoom_factor, visible_rect) -> bool:
+    """
+    Whether notes should be drawn rounded, with gradients and labels rather than flat.
 
-        if is_white:
-            height = effective_white_key_height - padding 
-            y_offset = padding / 2
-        else:
-            height = effective_black_key_height - padding 
-            y_offset = (effective_white_key_height - effective_black_key_height) / 2 + (padding / 2)
-            
-        velocity = getattr(note, 'velocity', 64)
-        # Use new theme note colors
-        if velocity < 50: color = theme.NOTE_LOW_COLOR
-        elif velocity < 90: color = theme.NOTE_MED_COLOR
-        else: color = theme.NOTE_HIGH_COLOR
-            
-        gradient = QLinearGradient(x_pos, y_pos + y_offset, x_pos, y_pos + y_offset + height)
-        gradient.setColorAt(0, color.lighter(130))
-        gradient.setColorAt(0.5, color)
-        gradient.setColorAt(1, color.darker(110))
-        
-        painter.setPen(QPen(theme.NOTE_BORDER_COLOR, 0.5)) # Use new theme constant, subtle
-        painter.setBrush(QBrush(gradient))
-        painter.drawRoundedRect(int(x_pos), int(y_pos + y_offset), int(width), int(height), 
-                                theme.BORDER_RADIUS_S, theme.BORDER_RADIUS_S) # Use theme radius
-        
-        # Note labels (optional)
-        original_note_name = pretty_midi.note_number_to_name(pitch)
-        # ... (name correction logic remains same)
-        note_part_label = original_note_name[:-1]
-        octave_str_label = original_note_name[-1:]
-        corrected_label_name_note = original_note_name
-        if octave_str_label.isdigit():
-            octave_part_label = int(octave_str_label)
-            corrected_label_name_note = f"{note_part_label}{octave_part_label + 1}"
-
-        note_block_font = QFont(theme.FONT_FAMILY_PRIMARY, theme.FONT_SIZE_XS) # Use theme font
-        note_block_font.setBold(True) # Keep bold for readability on notes
-        painter.setFont(note_block_font)
-        painter.setPen(note_label_color) # Use defined note label color
-        
-        font_metrics = QFontMetrics(painter.font())
-        text_width_needed = font_metrics.horizontalAdvance(corrected_label_name_note)
-        text_height_needed = font_metrics.height()
-        note_content_rect = QRectF(x_pos, y_pos + y_offset, width, height)
-        
-        if text_width_needed <= note_content_rect.width() - (theme.PADDING_XS * 2) and \
-           text_height_needed <= note_content_rect.height() - (theme.PADDING_XS * 2):
-            painter.drawText(note_content_rect, Qt.AlignCenter | Qt.AlignVCenter, corrected_label_name_note)
+    Only once rows and the median note within visible_rect are large enough
+    for the detail to show. Pass the whole visible area and decide once per
+    frame: a partial repaint (e.g. the playhead strip) or a tile must not pick
+    a style of its own from the few notes it happens to cover.
+    """
+    if WHITE_KEY_HEIGHT * vertical_zoom_factor < DETAIL_MIN_ROW_HEIGHT_PX:
+        return False
+    indices = visible_note_indices(notes, time_scale, vertical_zoom_factor, visible_rect)
+    if not len(indices):
+        return False
+    width = np.maximum((notes.end[indices] - notes.start[indices]) * time_scale, MIN_NOTE_WIDTH_PX)
+    return bool(np.median(width) >= DETAIL_MIN_NOTE_WIDTH_PX)
+
+def draw_notes(painter, notes, time_scale, vertical_zoom_factor, detailed, resources, visible_rect=None):
+    """
+    Draw the MIDI notes (a NoteBuffer), only those inside visible_rect if given.
+
+    With detailed False, notes are flat rectangles submitted with one
+    drawRects call per velocity color; otherwise they get rounded corners,
+    gradients and labels. The caller decides with detailed_notes_wanted().
+    resources are the frame's PaintResources (prebuilt pens, brushes and
+    label metrics, so nothing is allocated per note); they are passed in
+    because tiles call this from worker threads.
+    """
+
+    if visible_rect is not None:
+        notes = notes[visible_note_indices(notes, time_scale, vertical_zoom_factor, visible_rect)]
+    if not len(notes):
+        return
+
+    x_pos, y_pos, width, height, keep = note_rects(notes, time_scale, vertical_zoom_factor)
+    buckets = np.searchsorted(VELOCITY_BUCKET_EDGES, notes.velocity[keep], side='right')
+
+    if not detailed:
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing, False) # Pixel-aligned rects fill fastest without it
+        painter.setPen(Qt.NoPen) # Stroking borders costs more than the fills; a 1px gap separates notes instead
+        gap_width = np.maximum(width - 1, 1)
+        for bucket, brush in enumerate(resources.note_flat_brushes):
+            selected = buckets == bucket
+            if not selected.any():
+                continue
+            painter.setBrush(brush)
+            painter.drawRects([QRectF(*rect) for rect in zip(x_pos[selected].tolist(), y_pos[selected].tolist(),
+                                                             gap_width[selected].tolist(), height[selected].tolist())])
+        painter.restore()
+        return
+
+    label_widths = resources.note_label_widths
+    max_label_height = resources.note_label_height + theme.PADDING_XS * 2
+    painter.setPen(resources.note_border_pen)
+    current_bucket = None
+    labels = [] # Drawn after all note bodies so the pen is switched once
+
+    columns = zip(notes.pitch[keep].tolist(), x_pos.tolist(), y_pos.tolist(), width.tolist(), height.tolist(), buckets.tolist())
+    for pitch, x, y, w, h, bucket in columns:
+        if bucket != current_bucket:
+            painter.setBrush(resources.note_brushes[bucket]) # Gradient in bounding-box coordinates fits any note
+            current_bucket = bucket
+        painter.drawRoundedRect(x, y, w, h, theme.BORDER_RADIUS_S, theme.BORDER_RADIUS_S) # Use theme radius
+
+        # Note labels, when they fit inside the note
+        if label_widths[pitch] <= w - (theme.PADDING_XS * 2) and max_label_height <= h:
+            labels.append((x, y, w, h, pitch))
+
+    if labels:
+        painter.setFont(resources.note_label_font)
+        painter.setPen(resources.note_label_pen)
+        for x, y, w, h, pitch in labels:
+            painter.drawText(x, y, w, h, Qt.AlignCenter | Qt.AlignVCenter, NOTE_LABELS[pitch])
+
+def draw_note_density(painter, density, time_scale, vertical_zoom_factor, visible_rect):
+    """
+    Draw a NoteDensityPyramid over visible_rect instead of individual notes.
+
+    The pyramid level with about one bucket per pixel is turned into an image
+    (one pixel per bucket and pitch row, more opaque where more notes overlap)
+    and stretched over the rows in a single drawImage call.
+    """
+    effective_white_key_height = WHITE_KEY_HEIGHT * vertical_zoom_factor
+    t0 = max(0.0, (visible_rect.left() - WHITE_KEY_WIDTH) / time_scale)
+    t1 = (visible_rect.right() + 1 - WHITE_KEY_WIDTH) / time_scale
+    lowest_pitch, highest_pitch = visible_pitch_range(vertical_zoom_factor, visible_rect)
+    level = density.level_for(1.0 / time_scale)
+    counts, first_time, bucket_sec = density.region(level, t0, t1, lowest_pitch, highest_pitch)
+    if not counts.size:
+        return
+
+    cells = counts.T[::-1] # Rows top to bottom = highest to lowest pitch, columns = time buckets
+    intensity = np.minimum(cells, LOD_SATURATION_COUNT) / LOD_SATURATION_COUNT
+    alpha = np.where(cells > 0, 90 + 165 * intensity, 0)
+    color = theme.NOTE_MED_COLOR
+    pixels = np.empty(cells.shape + (4,), dtype=np.uint8) # Premultiplied BGRA, QImage's ARGB32 byte order
+    pixels[..., 0] = alpha * color.blue() / 255
+    pixels[..., 1] = alpha * color.green() / 255
+    pixels[..., 2] = alpha * color.red() / 255
+    pixels[..., 3] = alpha
+    rows, columns = cells.shape
+    image = QImage(pixels.data, columns, rows, columns * 4, QImage.Format_ARGB32_Premultiplied)
+
+    target = QRectF(first_time * time_scale + WHITE_KEY_WIDTH, (MAX_PITCH - highest_pitch) * effective_white_key_height,
+                    columns * bucket_sec * time_scale, rows * effective_white_key_height)
+    painter.save()
+    painter.setRenderHint(QPainter.SmoothPixmapTransform, False) # Keep cell edges crisp when stretched
+    painter.drawImage(target, image)
+    painter.restore()
+
+def playhead_rect(playhead_position, time_scale, height):
+    """Widget rect covering everything draw_playhead paints (line and triangle marker)"""
+    playhead_x = int(playhead_position * time_scale + WHITE_KEY_WIDTH)
+    half_width = theme.ICON_SIZE_S // 2 + 2 # Triangle half-width plus the line and antialiasing
+    return QRect(playhead_x - half_width, 0, 2 * half_width + 1, height)
 
 def draw_playhead(painter, playhead_position, time_scale, height):
     """Draw the playhead indicator"""
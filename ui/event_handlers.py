@@ -35,6 +35,9 @@ class MainWindowEventHandlersMixin:
         if hasattr(self, 'playback_timer') and self.playback_timer:
             self.playback_timer.stop()
         
+        if hasattr(self, 'plugin_manager_panel') and self.plugin_manager_panel:
+            self.plugin_manager_panel.shutdown_generation()
+
         if hasattr(self, 'plugin_manager_panel') and self.plugin_manager_panel and \
            hasattr(self.plugin_manager_panel, 'cleanup_temporary_files') and \
            callable(self.plugin_manager_panel.cleanup_temporary_files):
@@ -0,0 +1,96 @@
+import math
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QPainter, QPixmap
+
+from config.constants import MIN_PITCH, MAX_PITCH, WHITE_KEY_WIDTH, WHITE_KEY_HEIGHT
+from config import theme
+from ui.drawing_utils import (
+    draw_piano_keys, draw_note_rows, draw_measure_grid, grid_line_offsets, MEASURE_TILE_PAD_PX, MEASURE_TILE_HEIGHT
+)
+
+ROW_TILE_WIDTH = 256 # Logical width of the grid row tile; it is repeated across the roll
+MAX_LAYER_PIXMAP_SIDE = 16384 # Device pixels; taller layers are drawn directly instead
+
+
+class StaticLayerCache:
+    """
+    Pre-rendered piano roll layers that only change with zoom, tempo, screen or theme.
+
+    The piano keyboard, the horizontal note rows and one measure of vertical
+    grid lines are painted once into QPixmaps and blitted on every paint
+    afterwards, so repaints during playback only pay for notes and the
+    playhead. Each layer is keyed by what it depends on (zoom, tempo and time
+    signature, device pixel ratio, theme signature) and rebuilt when the key
+    changes; invalidate() drops everything explicitly.
+    """
+
+    def __init__(self):
+        self._layers = {} # name -> (key, QPixmap)
+        self._grid_lines = None # (key, line offsets) for the current tempo, zoom and time signature
+
+    def invalidate(self):
+        self._layers.clear()
+        self._grid_lines = None
+
+    @staticmethod
+    def layer_height(vertical_zoom_factor: float) -> int:
+        """Logical height covering every pitch row at this zoom."""
+        return int(math.ceil((MAX_PITCH - MIN_PITCH + 1) * WHITE_KEY_HEIGHT * vertical_zoom_factor)) + 1
+
+    def piano_keys(self, vertical_zoom_factor: float, device_pixel_ratio: float) -> QPixmap | None:
+        """Keyboard layer, drawn at (0, 0); None if too large to cache."""
+        return self._layer('piano_keys', WHITE_KEY_WIDTH, self.layer_height(vertical_zoom_factor),
+                           (vertical_zoom_factor,), device_pixel_ratio,
+                           lambda painter: draw_piano_keys(painter, vertical_zoom_factor))
+
+    def grid_rows(self, vertical_zoom_factor: float, device_pixel_ratio: float) -> QPixmap | None:
+        """ROW_TILE_WIDTH wide tile of the note rows, to be tiled horizontally; None if too large to cache."""
+        return self._layer('grid_rows', ROW_TILE_WIDTH, self.layer_height(vertical_zoom_factor),
+                           (vertical_zoom_factor,), device_pixel_ratio,
+                           lambda painter: draw_note_rows(painter, 0, ROW_TILE_WIDTH, vertical_zoom_factor))
+
+    def grid_lines(self, time_scale: float, bpm: float, time_signature_numerator: int, time_signature_denominator: int):
+        """grid_line_offsets() for these settings, computed once per change."""
+        key = (time_scale, bpm, time_signature_numerator, time_signature_denominator)
+        if self._grid_lines is None or self._grid_lines[0] != key:
+            self._grid_lines = (key, grid_line_offsets(*key))
+        return self._grid_lines[1]
+
+    def measure_grid(self, time_scale: float, bpm: float, time_signature_numerator: int, time_signature_denominator: int,
+                     device_pixel_ratio: float) -> QPixmap | None:
+        """
+        One measure of vertical grid lines, MEASURE_TILE_HEIGHT tall, to be tiled vertically.
+
+        The measure line sits MEASURE_TILE_PAD_PX from the left edge. None if there
+        is no grid or the measure is too wide to cache.
+        """
+        line_offsets = self.grid_lines(time_scale, bpm, time_signature_numerator, time_signature_denominator)
+        pixels_per_measure = line_offsets[0]
+        if pixels_per_measure <= 0:
+            return None
+        width = int(math.ceil(pixels_per_measure)) + 2 * MEASURE_TILE_PAD_PX
+        return self._layer('measure_grid', width, MEASURE_TILE_HEIGHT,
+                           (time_scale, bpm, time_signature_numerator, time_signature_denominator), device_pixel_ratio,
+                           lambda painter: draw_measure_grid(painter, MEASURE_TILE_PAD_PX, line_offsets, 0, MEASURE_TILE_HEIGHT))
+
+    def _layer(self, name, width, height, settings_key, device_pixel_ratio, paint_func):
+        key = (settings_key, device_pixel_ratio, theme.theme_signature())
+        cached = self._layers.get(name)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        device_width = int(math.ceil(width * device_pixel_ratio))
+        device_height = int(math.ceil(height * device_pixel_ratio))
+        if device_height > MAX_LAYER_PIXMAP_SIDE or device_width > MAX_LAYER_PIXMAP_SIDE:
+            self._layers.pop(name, None)
+            return None
+
+        pixmap = QPixmap(device_width, device_height)
+        pixmap.setDevicePixelRatio(device_pixel_ratio)
+        pixmap.fill(Qt.transparent)
+        painter = QPainter(pixmap)
+        painter.setRenderHints(QPainter.Antialiasing | QPainter.TextAntialiasing | QPainter.SmoothPixmapTransform)
+        paint_func(painter)
+        painter.end()
+        self._layers[name] = (key, pixmap)
+        return pixmap
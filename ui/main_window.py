@@ -1,13 +1,13 @@
 import sys
 from PySide6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
-    QLabel, QScrollArea, QSizePolicy, QSlider, QStyle, QToolButton,
+    QLabel, QSizePolicy, QSlider, QStyle, QToolButton,
     QFrame, QSpacerItem, QDockWidget, QListWidget, QListWidgetItem,
     QFormLayout, QSpinBox, QDoubleSpinBox, QComboBox, QCheckBox,
     QDialog, QDialogButtonBox, QFileDialog, QApplication, QMessageBox
 )
 from PySide6.QtCore import Qt, QTimer, Signal, Slot, QSize, QEvent
-from PySide6.QtGui import QKeyEvent, QColor, QPalette, QFont, QLinearGradient, QBrush
+from PySide6.QtGui import QKeyEvent, QColor, QPalette, QFont, QLinearGradient, QBrush, QKeySequence, QShortcut
 import pretty_midi
 import time
 import os
@@ -17,6 +17,9 @@ from midi_player import MidiPlayer
 # Assuming plugin_manager, export_utils are in the root or accessible via PYTHONPATH
 from plugin_manager import PluginManager
 from export_utils import export_to_midi
+from note_buffer import NoteBuffer
+from note_model import NoteModel, NoteDelta
+from note_history import NoteHistory
 # UI components are now relative to the 'ui' package or root
 from .custom_widgets import ModernSlider, ModernButton
 from .plugin_dialogs import PluginParameterDialog
@@ -24,6 +27,7 @@ from .plugin_panel import PluginManagerPanel
 from .transport_controls import TransportControls
 from .event_handlers import MainWindowEventHandlersMixin, GlobalPlaybackHotkeyFilter # Added GlobalPlaybackHotkeyFilter
 from config import theme # Import the theme configuration
+from config.constants import SHOW_SCHEDULER_TELEMETRY, TELEMETRY_REFRESH_MS
 
 
 class PianoRollMainWindow(QMainWindow, MainWindowEventHandlersMixin):
@@ -34,16 +38,17 @@ class PianoRollMainWindow(QMainWindow, MainWindowEventHandlersMixin):
         self.setWindowTitle("Piano Roll with Plugin Manager")
         self.setMinimumSize(1000, 600)
         
-        self.midi_notes = midi_notes or []
+        # Single owner of the notes; display, player and plugin panel follow its resets and deltas
+        self.note_model = NoteModel(midi_notes, self)
+        self.note_history = NoteHistory(self.note_model, parent=self) # Undo/redo over every reset and edit
         self.midi_player = MidiPlayer()
+        self.transport_clock = self.midi_player.clock # Shared by the playback timer and the transport slider
         self.bpm = 120
         self.total_duration = 10.0
         
         self._apply_stylesheet()
         
-        if self.midi_notes:
-            print(f"Setting initial {len(self.midi_notes)} notes in MIDI player")
-            self.midi_player.set_notes(self.midi_notes)
+        self.midi_player.set_notes(self.midi_notes) # Even when empty, so later deltas patch the model's buffer
             
         self._setup_central_widget()
         self._setup_main_layout()
@@ -74,6 +79,20 @@ class PianoRollMainWindow(QMainWindow, MainWindowEventHandlersMixin):
         self.update_timer_interval()
         self.playback_timer.timeout.connect(self.update_playback_position)
 
+        # Optional scheduler timing overlay in the transport bar
+        self.telemetry_timer = QTimer(self)
+        self.telemetry_timer.setInterval(TELEMETRY_REFRESH_MS)
+        self.telemetry_timer.timeout.connect(self.update_scheduler_telemetry)
+        self.telemetry_shortcut = QShortcut(QKeySequence("Ctrl+Shift+T"), self)
+        self.telemetry_shortcut.activated.connect(self.toggle_scheduler_telemetry)
+        self.set_scheduler_telemetry_visible(SHOW_SCHEDULER_TELEMETRY)
+
+        # Undo/redo of note changes (Ctrl+Z; Ctrl+Shift+Z or Ctrl+Y depending on the platform)
+        self.undo_shortcut = QShortcut(QKeySequence.Undo, self)
+        self.undo_shortcut.activated.connect(self.undo_note_edit)
+        self.redo_shortcut = QShortcut(QKeySequence.Redo, self)
+        self.redo_shortcut.activated.connect(self.redo_note_edit)
+
         # Initialize transport controls after all components are ready
         self.transport_controls.set_bpm_value(self.bpm)
         self.update_slider_range()
@@ -165,7 +184,7 @@ class PianoRollMainWindow(QMainWindow, MainWindowEventHandlersMixin):
                 background: none;
             }}
 
-            /* Style for QScrollArea containing PianoRollDisplay - already partially styled inline */
+            /* Style for scroll areas; PianoRollDisplay is a scroll area itself and is styled inline */
             /* This global style can act as a fallback or default */
             QScrollArea {{
                 background-color: {theme.PIANO_ROLL_BG_COLOR.name()}; 
@@ -222,148 +241,75 @@ class PianoRollMainWindow(QMainWindow, MainWindowEventHandlersMixin):
         self.transport_controls.volumeChangedSignal.connect(self.volume_changed_slot) # Connection for volume
 
     def create_piano_roll_display(self):
-        scroll_area = QScrollArea()
-        scroll_area.setWidgetResizable(True)
-        scroll_area.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOn)
-        scroll_area.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOn)
-        scroll_area.setStyleSheet("""
-            QScrollArea {
+        # PianoRollDisplay is its own scroll area (a viewport over a virtual canvas), so it goes straight into the layout
+        self.piano_roll = PianoRollDisplay(note_model=self.note_model)
+        self.piano_roll.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.piano_roll.setStyleSheet("""
+            PianoRollDisplay {
                 border: none;
                 background-color: #1c1c20;
             }
         """)
-        self.piano_roll = PianoRollDisplay(self.midi_notes)
-        self.piano_roll.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
-        scroll_area.setWidget(self.piano_roll)
-        self.main_layout.addWidget(scroll_area, 1)
+        self.main_layout.addWidget(self.piano_roll, 1)
         
         # Connect signals from PianoRollDisplay
+        self.piano_roll.midiImportStarted.connect(self.handle_midi_import_started)
         self.piano_roll.midiFileProcessed.connect(self.handle_midi_file_processed)
-        self.piano_roll.notesChanged.connect(self.handle_notes_changed_from_display)
+        # The display subscribed to the model first, so it is up to date when these run
+        self.note_model.notesReset.connect(self.handle_notes_reset)
+        self.note_model.notesChanged.connect(self.handle_notes_changed)
 
-    @Slot(list)
-    def handle_midi_file_processed(self, loaded_notes: list):
-        """Handles notes loaded from a dropped MIDI file."""
-        print(f"MainWindow: MIDI file processed, {len(loaded_notes)} notes received.")
-        # set_midi_notes will update all components
-        self.set_midi_notes(loaded_notes)
-        # Optionally, reset playhead to start after loading a new file
+    @Slot(str)
+    def handle_midi_import_started(self, file_path: str):
+        # Edits and plugin output play on live, but a new file starts from the top
         self.stop_playback() # Stop and reset playhead
 
-    @Slot(list)
-    def handle_notes_changed_from_display(self, current_notes_in_display: list):
-        """Handles notes changed by direct interaction in PianoRollDisplay (paint, delete)."""
-        print(f"MainWindow: Notes changed in display, {len(current_notes_in_display)} notes.")
-        # Update the main list and propagate to other components
-        # Avoid direct call to set_midi_notes if it causes redundant updates or signal loops
-        # For now, assuming set_midi_notes is robust enough.
-        # If PianoRollDisplay.notes IS the master list, then only need to update other components.
-        # Let's assume MainWindow.midi_notes is the master.
-        
-        self.midi_notes = current_notes_in_display # Update master list
-        
-        # Propagate to MidiPlayer and PluginManagerPanel directly if piano_roll.set_notes was already called
-        # by PianoRollDisplay itself before emitting notesChanged.
-        # The PianoRollDisplay.set_notes calls notesChanged.emit(self.notes)
-        # PianoRollDisplay.add_note calls notesChanged.emit(self.notes)
-        # PianoRollDisplay.delete_note_at calls notesChanged.emit(self.notes)
-        # So, current_notes_in_display is already the new state of piano_roll.notes.
-        
-        self.midi_player.set_notes(self.midi_notes)
-        if hasattr(self, 'plugin_manager_panel'):
-            self.plugin_manager_panel.set_current_notes(self.midi_notes)
-        
-        # Recalculate duration and update UI elements that depend on it
-        max_end_time = 0
-        if self.midi_notes:
-            for note in self.midi_notes:
-                if hasattr(note, 'end') and note.end > max_end_time:
-                    max_end_time = note.end
-        self.total_duration = max_end_time + 1.0 # Add padding
-        self.update_slider_range()
-        # self.piano_roll.update() # PianoRollDisplay should update itself after modification
+    @Slot(object)
+    def handle_midi_file_processed(self, loaded_notes: NoteBuffer):
+        """Handles notes loaded from a dropped MIDI file (already in the note model)."""
+        print(f"MainWindow: MIDI file processed, {len(loaded_notes)} notes received.")
+
+    def undo_note_edit(self):
+        self.piano_roll.midi_importer.cancel() # A file still being parsed would replace the restored notes
+        if not self.note_history.undo():
+            print("MainWindow: Nothing to undo.")
+
+    def redo_note_edit(self):
+        self.piano_roll.midi_importer.cancel()
+        if not self.note_history.redo():
+            print("MainWindow: Nothing to redo.")
 
-    def set_midi_notes(self, notes: list): # Added type hint
-        # This method is called by PluginManagerPanel.notesGenerated and handle_midi_file_processed
-        # It should be the primary way to update notes across the application.
+    @property
+    def midi_notes(self) -> NoteBuffer:
+        """The note model's sorted notes."""
+        return self.note_model.notes
+
+    @Slot(object)
+    def handle_notes_reset(self, notes: NoteBuffer):
+        """The whole note set was replaced (file drop, plugin output, clear)."""
         print(f"PianoRollMainWindow: Setting {len(notes)} notes globally.")
-        self.midi_notes = notes if notes is not None else []
-        
-        # Update PianoRollDisplay (if notes didn't originate from it)
-        # To avoid signal loops, check source or block signals if necessary.
-        # For now, assume direct call is okay.
-        if hasattr(self, 'piano_roll'):
-             self.piano_roll.set_notes(self.midi_notes) # This will emit piano_roll.notesChanged again.
-                                                        # This could be problematic.
-                                                        # Let's refine: set_notes in PianoRollDisplay should not emit if called from here.
-                                                        # Or, handle_notes_changed_from_display should be the sole updater from PianoRoll.
-
-        # The set_notes in PianoRollDisplay already emits notesChanged.
-        # If this set_midi_notes is the main handler, then PianoRollDisplay.notesChanged should
-        # primarily update MainWindow.midi_notes and then MainWindow updates others.
-
-        # Let's simplify: MainWindow.set_midi_notes is the authority.
-        # PianoRollDisplay.notesChanged will call a simpler handler in MainWindow
-        # that just updates MainWindow.midi_notes, then calls this authoritative set_midi_notes.
-        # This is getting circular.
-
-        # Revised flow:
-        # 1. User action in PianoRollDisplay (paint, delete) -> PianoRollDisplay updates its internal self.notes
-        #    -> PianoRollDisplay emits notesChanged(self.notes)
-        # 2. MIDI Drop in PianoRollDisplay -> PianoRollDisplay emits midiFileProcessed(loaded_notes)
-        # 3. Plugin generates notes -> PluginManagerPanel emits notesGenerated(generated_notes)
-
-        # MainWindow slots:
-        # - handle_midi_file_processed(loaded_notes) -> calls self.set_midi_notes(loaded_notes)
-        # - handle_notes_changed_from_display(new_notes_list) -> calls self.set_midi_notes(new_notes_list)
-        # - set_midi_notes (called by plugin) -> this is the current method.
-
-        # The current set_midi_notes method:
-        # self.midi_notes = notes # Master list updated
-        # self.piano_roll.set_notes(notes) # Updates display, emits notesChanged -> handle_notes_changed_from_display -> calls set_midi_notes again! (LOOP)
-
-        # To break loop:
-        # Option A: PianoRollDisplay.set_notes has an emit_signal=False flag.
-        # Option B: MainWindow.set_midi_notes blocks signals from piano_roll temporarily.
-        # Option C: Refactor signal connections.
-
-        # Let's go with a flag in PianoRollDisplay.set_notes and add_note/delete_note_at
-        # For now, I'll assume the current structure and proceed, then refine if loops occur.
-        # The current PianoRollDisplay.set_notes *does* emit notesChanged.
-
-        if hasattr(self, 'piano_roll') and self.piano_roll.notes != self.midi_notes: # Avoid redundant update if already set
-            self.piano_roll.set_notes(self.midi_notes) 
-        
-        if notes:
-            sample = notes[0]
-            # print(f"Sample note: pitch={getattr(sample, 'pitch', 'N/A')}, " +
-            #       f"start={getattr(sample, 'start', 'N/A')}, " +
-            #       f"end={getattr(sample, 'end', 'N/A')}, " +
-            #       f"velocity={getattr(sample, 'velocity', 'N/A')}")
-        
         self.midi_player.set_notes(notes)
-        
-        max_end_time = 0
-        for note in notes:
-            if hasattr(note, 'end') and note.end > max_end_time:
-                max_end_time = note.end
-        
-        self.total_duration = max_end_time + 1.0
+        self.total_duration = notes.max_end() + 1.0
         self.update_slider_range()
-        
         if hasattr(self, 'plugin_manager_panel'):
             self.plugin_manager_panel.set_current_notes(notes)
-        
+
+    @Slot(object)
+    def handle_notes_changed(self, delta: NoteDelta):
+        """An edit to the note model; only the delta is passed on."""
+        self.midi_player.apply_note_delta(delta)
+        # The plugin panel shares the model's buffer, so it has nothing to update
+        self.total_duration = self.midi_notes.max_end() + 1.0 # Cached by the buffer, not a scan
+        self.update_slider_range()
+
+    def set_midi_notes(self, notes: NoteBuffer):
+        # Called by PluginManagerPanel.notesGenerated; every component follows through handle_notes_reset
+        self.note_model.reset(notes)
         self.transport_controls.set_bpm_value(self.bpm) # Ensure BPM display is correct
-        # self.update_slider_range() # Called above
 
     def clear_notes(self):
         print("PianoRollMainWindow: Clearing all notes.")
-        self.midi_notes = []
-        if hasattr(self, 'piano_roll'):
-            self.piano_roll.set_notes([])
-        if hasattr(self, 'midi_player'):
-            self.midi_player.set_notes([])
+        self.note_model.reset(NoteBuffer())
         
         self.total_duration = 10.0
         self.update_slider_range()
@@ -374,24 +320,15 @@ class PianoRollMainWindow(QMainWindow, MainWindowEventHandlersMixin):
             self.transport_controls.update_position_label(0)
             self.transport_controls.update_time_slider_value(0)
 
-        if hasattr(self, 'plugin_manager_panel'):
-            self.plugin_manager_panel.set_current_notes([])
-
     def receive_generated_note(self, note: pretty_midi.Note):
         if not hasattr(note, 'start') or not hasattr(note, 'end') or not hasattr(note, 'pitch'):
             print(f"PianoRollMainWindow: Received invalid note object: {note}")
             return
 
-        self.midi_notes.append(note)
         if hasattr(self, 'piano_roll'):
-            self.piano_roll.add_note(note)
-
-        if note.end > self.total_duration:
-            self.total_duration = note.end + 1.0
-            self.update_slider_range()
-        
-        if hasattr(self, 'plugin_manager_panel'):
-            self.plugin_manager_panel.set_current_notes(self.midi_notes)
+            self.piano_roll.add_note(note) # Also scrolls the note into view
+        else:
+            self.note_model.add_notes([note])
     
     def toggle_playback(self):
         if self.midi_player.is_playing:
@@ -423,6 +360,7 @@ class PianoRollMainWindow(QMainWindow, MainWindowEventHandlersMixin):
         self.midi_player.pause()
         self.transport_controls.set_playing_state(False)
         self.playback_timer.stop()
+        self.piano_roll.set_active_pitches(())
     
     def stop_playback(self):
         self.midi_player.stop()
@@ -431,19 +369,40 @@ class PianoRollMainWindow(QMainWindow, MainWindowEventHandlersMixin):
         self.transport_controls.update_time_slider_value(0)
         self.transport_controls.update_position_label(0)
         self.piano_roll.set_playhead_position(0)
+        self.piano_roll.set_active_pitches(())
     
     def update_playback_position(self):
-        position = self.midi_player.get_current_position()
+        self.transport_clock.tick() # Feeds the clock's frame jitter statistics
+        self.midi_player.tick()
+        position = self.transport_clock.position()
         slider_value_ms = int(position * 1000)
         self.transport_controls.update_time_slider_value(slider_value_ms)
         self.transport_controls.update_position_label(position)
         self.piano_roll.set_playhead_position(position)
+        self.piano_roll.set_active_pitches(self.midi_player.get_active_pitches())
         if hasattr(self, 'total_duration') and position >= self.total_duration and self.midi_player.is_playing:
             self.stop_playback()
 
+    def set_scheduler_telemetry_visible(self, visible: bool):
+        self.transport_controls.set_telemetry_visible(visible)
+        if visible:
+            self.update_scheduler_telemetry()
+            self.telemetry_timer.start()
+        else:
+            self.telemetry_timer.stop()
+
+    @Slot()
+    def toggle_scheduler_telemetry(self):
+        self.set_scheduler_telemetry_visible(not self.telemetry_timer.isActive())
+
+    def update_scheduler_telemetry(self):
+        self.transport_controls.update_telemetry(self.midi_player.get_scheduler_stats())
+
     @Slot(float)
     def slider_position_changed_slot(self, position_seconds):
         self.midi_player.seek(position_seconds)
+        # Display the clock's (possibly clamped) position rather than the raw slider value
+        position_seconds = self.transport_clock.position()
         self.transport_controls.update_position_label(position_seconds)
         self.piano_roll.set_playhead_position(position_seconds)
 
@@ -0,0 +1,94 @@
+import os
+import threading
+import pretty_midi
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+from note_buffer import NoteBuffer
+
+
+class _ImportSignals(QObject):
+    finished = Signal(int, str, object) # job id, file path, NoteBuffer
+    failed = Signal(int, str, str) # job id, file path, error message
+
+
+class _ImportJob(QRunnable):
+    """Parses one MIDI file on a pool thread into a sorted NoteBuffer."""
+
+    def __init__(self, signals, job_id, file_path, cancel_event):
+        super().__init__()
+        self.signals = signals
+        self.job_id = job_id
+        self.file_path = file_path
+        self.cancel_event = cancel_event
+
+    def run(self):
+        try:
+            midi_data = pretty_midi.PrettyMIDI(self.file_path)
+            if not midi_data.instruments:
+                raise ValueError("No instruments found in MIDI file.")
+            notes = NoteBuffer.from_pretty_midi(midi_data) # Flattened and sorted here, off the GUI thread
+        except Exception as e:
+            print(f"MidiFileImporter: Error parsing MIDI file {self.file_path}: {e}")
+            self.signals.failed.emit(self.job_id, self.file_path, str(e))
+            return
+        if not self.cancel_event.is_set():
+            self.signals.finished.emit(self.job_id, self.file_path, notes)
+
+
+class MidiFileImporter(QObject):
+    """
+    Imports MIDI files off the GUI thread.
+
+    load() parses and sorts the file on a private QThreadPool thread and
+    emits importFinished with the whole NoteBuffer, which the receiver hands
+    to the note model as one reset. pretty_midi parses a file in a single
+    call, so delivering it in pieces would show nothing earlier and only add
+    GUI-thread work per piece. Failures arrive as importFailed instead of
+    raising. Loading another file abandons the import in progress.
+    """
+
+    importFinished = Signal(str, object) # file path, NoteBuffer
+    importFailed = Signal(str, str) # file path, error message
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+        self._signals = _ImportSignals(self)
+        self._signals.finished.connect(self._on_finished)
+        self._signals.failed.connect(self._on_failed)
+        self._next_job_id = 0
+        self._current = None # (job id, cancel event) of the import in progress
+
+    @property
+    def is_busy(self) -> bool:
+        return self._current is not None
+
+    def load(self, file_path: str):
+        """Starts importing file_path, abandoning any import in progress."""
+        self.cancel()
+        self._next_job_id += 1
+        cancel_event = threading.Event()
+        self._current = (self._next_job_id, cancel_event)
+        print(f"MidiFileImporter: Importing {os.path.basename(file_path)} in the background.")
+        self._pool.start(_ImportJob(self._signals, self._next_job_id, file_path, cancel_event))
+
+    def cancel(self):
+        if self._current is not None:
+            self._current[1].set()
+            self._current = None
+
+    def _is_current(self, job_id) -> bool:
+        return self._current is not None and self._current[0] == job_id
+
+    def _on_finished(self, job_id, file_path, notes):
+        if not self._is_current(job_id):
+            return # Result of an abandoned import still in the queue
+        self._current = None
+        self.importFinished.emit(file_path, notes)
+
+    def _on_failed(self, job_id, file_path, message):
+        if not self._is_current(job_id):
+            return
+        self._current = None
+        self.importFailed.emit(file_path, message)
@@ -0,0 +1,147 @@
+import math
+import numpy as np
+
+from config.constants import MIN_PITCH, MAX_PITCH
+from note_buffer import as_note_buffer
+
+DENSITY_BUCKET_SEC = 0.05 # Time resolution of the finest level (one pixel at 20 px/s)
+PITCH_ROWS = MAX_PITCH - MIN_PITCH + 1
+LOD_NOTES_PER_PIXEL = 0.5 # Above this many visible notes per horizontal pixel the density view is drawn
+LOD_SATURATION_COUNT = 4 # Simultaneous notes in one cell that render at full intensity
+
+
+class NoteDensityPyramid:
+    """
+    Multi-resolution (time bucket x pitch) map of how many notes are sounding.
+
+    Level 0 counts, per DENSITY_BUCKET_SEC bucket and pitch row, the notes that
+    sound during that bucket; each further level halves the time resolution by
+    taking the maximum of two cells, down to a single bucket. A zoomed-out view
+    reads the level whose buckets are closest to one pixel, so its cost
+    follows the viewport size rather than the number of notes.
+
+    Edits are applied incrementally: add_notes()/remove_notes() update the
+    counts of the touched buckets with a difference array and recompute only
+    the matching spans of the coarser levels.
+    """
+
+    def __init__(self, notes=None, bucket_sec: float = DENSITY_BUCKET_SEC):
+        self.bucket_sec = bucket_sec
+        self.levels = []
+        self.version = 0 # Bumped on every change, for caches of rendered density
+        self.rebuild(notes)
+
+    def rebuild(self, notes):
+        """Recomputes every level from scratch for a new note set."""
+        notes = as_note_buffer(notes)
+        bucket_count = max(1, int(math.ceil(notes.max_end() / self.bucket_sec)) + 1)
+        self.levels = [np.zeros((bucket_count, PITCH_ROWS), dtype=np.int32)]
+        self._apply(notes, 1)
+        self._rebuild_levels()
+        self.version += 1
+
+    def add_notes(self, notes):
+        notes = as_note_buffer(notes)
+        if not len(notes):
+            return
+        if self._ensure_buckets(notes.max_end()):
+            self._apply(notes, 1)
+            self._rebuild_levels()
+        else:
+            self._rebuild_levels(*self._apply(notes, 1))
+        self.version += 1
+
+    def remove_notes(self, notes):
+        notes = as_note_buffer(notes)
+        if not len(notes):
+            return
+        self._rebuild_levels(*self._apply(notes, -1))
+        self.version += 1
+
+    # --- Queries ---
+
+    @property
+    def duration(self) -> float:
+        return len(self.levels[0]) * self.bucket_sec
+
+    def level_for(self, seconds_per_pixel: float) -> int:
+        """Coarsest level whose buckets are still no wider than a pixel."""
+        if seconds_per_pixel <= self.bucket_sec:
+            return 0
+        return min(int(math.log2(seconds_per_pixel / self.bucket_sec)), len(self.levels) - 1)
+
+    def region(self, level: int, t0: float, t1: float, low_pitch: int, high_pitch: int):
+        """
+        Counts covering [t0, t1] and pitches low_pitch..high_pitch at one level.
+
+        Returns:
+            (counts, first_bucket_time, bucket_sec): counts has shape
+            (buckets, pitches) with pitches ascending
+        """
+        counts = self.levels[level]
+        bucket_sec = self.bucket_sec * (1 << level)
+        first = max(0, int(t0 // bucket_sec))
+        last = min(len(counts), int(t1 // bucket_sec) + 1)
+        low_row = max(0, low_pitch - MIN_PITCH)
+        high_row = min(PITCH_ROWS, high_pitch - MIN_PITCH + 1)
+        if first >= last or low_row >= high_row:
+            return np.zeros((0, 0), dtype=np.int32), first * bucket_sec, bucket_sec
+        return counts[first:last, low_row:high_row], first * bucket_sec, bucket_sec
+
+    # --- Internals ---
+
+    def _ensure_buckets(self, end_time: float) -> bool:
+        """Grows level 0 (doubling) to cover end_time; returns True if it had to."""
+        needed = int(math.ceil(end_time / self.bucket_sec)) + 1
+        base = self.levels[0]
+        if needed <= len(base):
+            return False
+        grown = np.zeros((max(needed, 2 * len(base)), PITCH_ROWS), dtype=np.int32)
+        grown[:len(base)] = base
+        self.levels[0] = grown
+        return True
+
+    def _apply(self, notes, sign: int):
+        """Adds (sign=1) or removes (sign=-1) notes in level 0; returns the touched bucket span [lo, hi)."""
+        in_range = (notes.pitch >= MIN_PITCH) & (notes.pitch <= MAX_PITCH)
+        if not in_range.any():
+            return 0, 0
+        base = self.levels[0]
+        rows = notes.pitch[in_range].astype(np.intp) - MIN_PITCH
+        first = np.clip((notes.start[in_range] // self.bucket_sec).astype(np.intp), 0, len(base) - 1)
+        last = np.clip(np.ceil(notes.end[in_range] / self.bucket_sec).astype(np.intp) - 1, first, len(base) - 1)
+        lo, hi = int(first.min()), int(last.max()) + 1
+        # Difference array over the touched span: +sign where a note starts, -sign after it ends
+        diff = np.zeros((hi - lo + 1, PITCH_ROWS), dtype=np.int32)
+        np.add.at(diff, (first - lo, rows), sign)
+        np.add.at(diff, (last + 1 - lo, rows), -sign)
+        base[lo:hi] += np.cumsum(diff, axis=0, dtype=np.int32)[:-1]
+        return lo, hi
+
+    def _rebuild_levels(self, lo: int = 0, hi: int | None = None):
+        """Recomputes the coarser levels over the level-0 span [lo, hi), or all of them."""
+        if hi is None:
+            del self.levels[1:]
+        elif lo >= hi:
+            return
+        level = 0
+        hi = len(self.levels[0]) if hi is None else hi
+        while len(self.levels[level]) > 1:
+            finer = self.levels[level]
+            lo, hi = lo // 2, (hi + 1) // 2
+            if level + 1 == len(self.levels):
+                self.levels.append(np.zeros(((len(finer) + 1) // 2, PITCH_ROWS), dtype=np.int32))
+            coarser = self.levels[level + 1]
+            pairs = finer[2 * lo:2 * hi]
+            if len(pairs) % 2:
+                pairs = np.vstack([pairs, np.zeros((1, PITCH_ROWS), dtype=np.int32)]) # Odd tail pairs with empty
+            coarser[lo:hi] = pairs.reshape(-1, 2, PITCH_ROWS).max(axis=1)
+            level += 1
+
+
+def density_view_wanted(notes, t0: float, t1: float, visible_width: int) -> bool:
+    """True if more than LOD_NOTES_PER_PIXEL notes per pixel start in the visible window [t0, t1] (notes start-sorted)."""
+    if visible_width <= 0:
+        return False
+    lo, hi = notes.index_range(t0, t1) # Two bisections, however many notes there are
+    return (hi - lo) / visible_width > LOD_NOTES_PER_PIXEL
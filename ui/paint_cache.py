@@ -0,0 +1,98 @@
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QBrush, QColor, QFont, QFontMetrics, QGradient, QLinearGradient, QPen
+import pretty_midi
+
+from config import theme
+
+MEDIUM_VELOCITY_THRESHOLD = 50 # Notes below this use NOTE_LOW_COLOR
+HIGH_VELOCITY_THRESHOLD = 90 # Notes from this velocity up use NOTE_HIGH_COLOR
+
+
+def velocity_bucket(velocity: int) -> int:
+    """Index into PaintResources.note_brushes for a note velocity (0 low, 1 medium, 2 high)."""
+    if velocity < MEDIUM_VELOCITY_THRESHOLD:
+        return 0
+    if velocity < HIGH_VELOCITY_THRESHOLD:
+        return 1
+    return 2
+
+
+def _display_label(pitch: int) -> str:
+    # The roll labels middle C (60) as C5, one octave above pretty_midi's C4
+    note_part = pretty_midi.note_number_to_name(pitch).rstrip('-0123456789')
+    return f"{note_part}{pitch // 12}"
+
+
+NOTE_LABELS = tuple(_display_label(pitch) for pitch in range(128)) # Display name of every MIDI pitch
+
+
+class PaintResources:
+    """
+    Pens, brushes, fonts and text metrics shared by the piano roll drawing code.
+
+    Everything is built once from the current theme, so painting a note sets
+    prebuilt objects on the painter instead of allocating gradients, pens and
+    fonts. Note gradients use ObjectBoundingMode (coordinates relative to the
+    shape being filled), so one brush per velocity bucket fits every note.
+    Use get_paint_resources(), which rebuilds the set when the theme changes.
+
+    A set is never modified after it is built. get_paint_resources() may only
+    be called on the GUI thread; code running on worker threads (tile
+    rendering) gets the set the paint event resolved passed in explicitly.
+    """
+
+    def __init__(self):
+        self.theme_signature = theme.theme_signature()
+        self.theme_key = hash(self.theme_signature) # Cheap stand-in for the signature in cache keys
+
+        # --- Notes ---
+        self.note_border_pen = QPen(theme.NOTE_BORDER_COLOR, 0.5)
+        self.note_label_pen = QPen(getattr(theme, 'NOTE_LABEL_COLOR', QColor(0, 0, 0, 180)))
+        note_colors = (theme.NOTE_LOW_COLOR, theme.NOTE_MED_COLOR, theme.NOTE_HIGH_COLOR)
+        self.note_brushes = tuple(self._note_brush(color) for color in note_colors)
+        self.note_flat_brushes = tuple(QBrush(color) for color in note_colors) # Batched, zoomed-out drawing
+        self.note_label_font = QFont(theme.FONT_FAMILY_PRIMARY, theme.FONT_SIZE_XS)
+        self.note_label_font.setBold(True) # Keep bold for readability on notes
+        note_metrics = QFontMetrics(self.note_label_font)
+        self.note_label_widths = tuple(note_metrics.horizontalAdvance(label) for label in NOTE_LABELS)
+        self.note_label_height = note_metrics.height()
+
+        # --- Piano keys ---
+        self.key_label_font = QFont(theme.FONT_FAMILY_PRIMARY, theme.FONT_SIZE_S)
+        self.key_border_pen = QPen(theme.KEY_BORDER_COLOR, 0.5)
+
+        # --- Grid ---
+        self.row_line_pen = QPen(theme.KEY_GRID_LINE_COLOR, 0.8, Qt.SolidLine)
+        self.sixteenth_line_pen = QPen(theme.GRID_LINE_COLOR, 0.5, Qt.DotLine)
+        self.beat_line_pen = QPen(theme.GRID_BEAT_LINE_COLOR, 0.7, Qt.SolidLine)
+        self.measure_line_pen = QPen(theme.GRID_MEASURE_LINE_COLOR, 1.0, Qt.SolidLine)
+        self.grid_text_pen = QPen(theme.SECONDARY_TEXT_COLOR, 1.0)
+        self.separator_pen = QPen(getattr(theme, 'PIANO_KEY_SEPARATOR_COLOR', theme.BORDER_COLOR_NORMAL), 1.0)
+        self.time_signature_font = QFont(theme.FONT_FAMILY_PRIMARY, theme.FONT_SIZE_S, weight=theme.FONT_WEIGHT_BOLD)
+        self.measure_number_font = QFont(theme.FONT_FAMILY_PRIMARY, theme.FONT_SIZE_XS)
+
+    @staticmethod
+    def _note_brush(color) -> QBrush:
+        gradient = QLinearGradient(0, 0, 0, 1) # Top to bottom of whatever shape is filled
+        gradient.setCoordinateMode(QGradient.ObjectBoundingMode)
+        gradient.setColorAt(0, color.lighter(130))
+        gradient.setColorAt(0.5, color)
+        gradient.setColorAt(1, color.darker(110))
+        return QBrush(gradient)
+
+
+_resources = None
+
+
+def get_paint_resources() -> PaintResources:
+    """Shared PaintResources, rebuilt if the theme changed since they were made (GUI thread only)."""
+    global _resources
+    if _resources is None or _resources.theme_signature != theme.theme_signature():
+        _resources = PaintResources()
+    return _resources
+
+
+def invalidate_paint_resources():
+    """Drops the shared resources; the next get_paint_resources() rebuilds them."""
+    global _resources
+    _resources = None
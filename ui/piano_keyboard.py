@@ -0,0 +1,78 @@
+import math
+from PySide6.QtCore import Qt, QRect
+from PySide6.QtWidgets import QWidget
+from PySide6.QtGui import QPainter, QPaintEvent
+
+from config.constants import MIN_PITCH, MAX_PITCH, WHITE_KEY_WIDTH, WHITE_KEY_HEIGHT, BLACK_KEY_WIDTH
+from config import theme
+from ui.drawing_utils import draw_piano_keys, IS_WHITE_PITCH_CLASS
+from ui.paint_cache import get_paint_resources
+
+
+class PianoKeyboardWidget(QWidget):
+    """
+    Frozen keyboard column on the left of the piano roll.
+
+    It only follows the roll vertically: set_scroll_y() blits the existing
+    pixels and paints the newly exposed strip from the StaticLayerCache
+    pixmap, so horizontal scrolling and playhead updates never repaint it.
+    Sounding pitches are highlighted on top of the cached keys; changing them
+    repaints just the keys that went on or off.
+    """
+
+    def __init__(self, layer_cache, parent=None):
+        super().__init__(parent)
+        self.layer_cache = layer_cache # Shared with the roll, which owns its invalidation
+        self.vertical_zoom_factor = 1.0
+        self.scroll_y = 0
+        self.active_pitches = frozenset()
+        self.setFixedWidth(WHITE_KEY_WIDTH)
+
+    def set_scroll_y(self, scroll_y: int):
+        dy = self.scroll_y - scroll_y
+        if dy:
+            self.scroll_y = scroll_y
+            self.scroll(0, dy)
+
+    def set_vertical_zoom(self, vertical_zoom_factor: float):
+        if vertical_zoom_factor != self.vertical_zoom_factor:
+            self.vertical_zoom_factor = vertical_zoom_factor
+            self.update()
+
+    def set_active_pitches(self, pitches):
+        """Highlights the given pitches; only keys whose state changed are repainted."""
+        pitches = frozenset(pitches)
+        changed = pitches ^ self.active_pitches
+        if not changed:
+            return
+        self.active_pitches = pitches
+        for pitch in changed:
+            self.update(self.key_rect(pitch).translated(0, -self.scroll_y))
+
+    def key_rect(self, pitch: int) -> QRect:
+        """Row of a key in keyboard (unscrolled) coordinates; black keys are narrower."""
+        row_height = WHITE_KEY_HEIGHT * self.vertical_zoom_factor
+        width = WHITE_KEY_WIDTH if IS_WHITE_PITCH_CLASS[pitch % 12] else BLACK_KEY_WIDTH
+        return QRect(0, int((MAX_PITCH - pitch) * row_height), width, int(math.ceil(row_height)))
+
+    def wheelEvent(self, event):
+        if event.modifiers() == Qt.ControlModifier:
+            event.accept() # Horizontal zoom is ignored over the keys
+        else:
+            event.ignore() # Scrolling and vertical zoom are handled by the roll
+
+    def paintEvent(self, event: QPaintEvent):
+        painter = QPainter(self)
+        painter.setRenderHints(QPainter.Antialiasing | QPainter.TextAntialiasing | QPainter.SmoothPixmapTransform)
+        painter.fillRect(event.rect(), theme.PIANO_ROLL_BG_COLOR)
+        painter.save()
+        painter.translate(0, -self.scroll_y)
+        draw_piano_keys(painter, self.vertical_zoom_factor, self.layer_cache)
+        for pitch in self.active_pitches:
+            if MIN_PITCH <= pitch <= MAX_PITCH:
+                painter.fillRect(self.key_rect(pitch), theme.ACTIVE_KEY_HIGHLIGHT_COLOR)
+        painter.restore()
+
+        # Keyboard separator line along the edge shared with the grid
+        painter.setPen(get_paint_resources().separator_pen)
+        painter.drawLine(self.width() - 1, event.rect().top(), self.width() - 1, event.rect().bottom())
@@ -3,21 +3,23 @@ import tempfile # Added
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
     QDockWidget, QListWidget, QListWidgetItem, QFileDialog, QMessageBox, QDialog, QLabel,
-    QSizePolicy, QStyle
+    QSizePolicy, QStyle, QProgressBar
 )
 from PySide6.QtCore import Qt, Signal, QSize, QUrl, QMimeData # Added QUrl, QMimeData
 from PySide6.QtGui import QFont, QIcon, QPixmap, QFontMetrics, QDrag # Added QDrag
 
 from plugin_manager import PluginManager
 from export_utils import export_to_midi
+from note_buffer import NoteBuffer, as_note_buffer
 from ui.plugin_dialogs import PluginParameterDialog
+from ui.plugin_runner import PluginGenerationRunner
 from .custom_widgets import DragExportButton, ModernButton # Added ModernButton
 from config import theme
 
 class PluginManagerPanel(QDockWidget):
     """Dockable panel for managing plugins"""
     
-    notesGenerated = Signal(list) # Class attribute for the signal
+    notesGenerated = Signal(object) # Class attribute for the signal (NoteBuffer)
     
     def __init__(self, parent=None):
         super().__init__("Plugin Manager", parent)
@@ -79,8 +81,34 @@ class PluginManagerPanel(QDockWidget):
         
         main_panel_layout.addLayout(button_layout)
         
+        # Generation status, shown while a plugin runs on the worker thread
+        self.generation_progress = QProgressBar()
+        self.generation_progress.setTextVisible(False)
+        self.generation_progress.setFixedHeight(theme.PADDING_S)
+        self.generation_progress.setStyleSheet(f"""
+            QProgressBar {{ background-color: {theme.INPUT_BG_COLOR.name()}; border: none; border-radius: 2px; }}
+            QProgressBar::chunk {{ background-color: {theme.ACCENT_PRIMARY_COLOR.name()}; border-radius: 2px; }}
+        """)
+        main_panel_layout.addWidget(self.generation_progress)
+        
+        status_layout = QHBoxLayout()
+        self.generation_status_label = QLabel()
+        self.generation_status_label.setStyleSheet(f"color: {theme.SECONDARY_TEXT_COLOR.name()}; font-size: {theme.FONT_SIZE_S}pt;")
+        status_layout.addWidget(self.generation_status_label, 1)
+        self.cancel_button = ModernButton("Cancel")
+        self.cancel_button.clicked.connect(self._cancel_generation)
+        status_layout.addWidget(self.cancel_button)
+        main_panel_layout.addLayout(status_layout)
+        
+        self.generation_runner = PluginGenerationRunner(self.plugin_manager, self)
+        self.generation_runner.busyChanged.connect(self._on_generation_busy_changed)
+        self.generation_runner.progressChanged.connect(self._on_generation_progress)
+        self.generation_runner.notesGenerated.connect(self._on_notes_generated)
+        self.generation_runner.generationFailed.connect(self._on_generation_failed)
+        self._on_generation_busy_changed(False)
+        
         self.plugin_params = {}
-        self.current_notes = []
+        self.current_notes = NoteBuffer()
         self.temp_files_to_clean = [] 
         self.temp_midi_dir = os.path.join(tempfile.gettempdir(), "pianoroll_midi_exports")
         os.makedirs(self.temp_midi_dir, exist_ok=True)
@@ -221,7 +249,8 @@ class PluginManagerPanel(QDockWidget):
                 item.setSizeHint(QSize(self.plugin_list.viewport().width() - (theme.PADDING_S * 2), theme.PLUGIN_ROW_HEIGHT))
 
     def set_current_notes(self, notes):
-        self.current_notes = notes
+        # Normally the note model's own buffer: later edits show up here without another call
+        self.current_notes = as_note_buffer(notes)
     
     def _configure_plugin(self):
         selected_items = self.plugin_list.selectedItems()
@@ -243,15 +272,45 @@ class PluginManagerPanel(QDockWidget):
             return
         plugin_id = selected_items[0].data(Qt.UserRole)
         parameters = self.plugin_params.get(plugin_id, {})
-        try:
-            generated_notes = self.plugin_manager.generate_notes(plugin_id, existing_notes=self.current_notes, parameters=parameters)
-            self.notesGenerated.emit(generated_notes)
-            self.current_notes = generated_notes
-        except Exception as e:
-            QMessageBox.critical(self, "Generation Error", f"Error: {str(e)}")
-        finally:
-            if hasattr(self.generate_button, 'clearFocus'):
-                self.generate_button.clearFocus() 
+        # Runs on the worker thread; clicks while a generation runs are coalesced into one follow-up run
+        was_busy = self.generation_runner.is_busy
+        self.generation_runner.request(plugin_id, parameters, lambda: self.current_notes)
+        if was_busy:
+            self.generation_status_label.setText("Generating... (one more run queued)")
+        if hasattr(self.generate_button, 'clearFocus'):
+            self.generate_button.clearFocus() 
+
+    def _cancel_generation(self):
+        self.generation_runner.cancel()
+        if hasattr(self.cancel_button, 'clearFocus'):
+            self.cancel_button.clearFocus()
+
+    def _on_generation_busy_changed(self, busy: bool):
+        self.generation_progress.setRange(0, 0) # Indeterminate until the plugin reports a fraction
+        self.generation_progress.setVisible(busy)
+        self.generation_status_label.setText("Generating..." if busy else "")
+        self.generation_status_label.setVisible(busy)
+        self.cancel_button.setVisible(busy)
+
+    def _on_generation_progress(self, fraction, message: str):
+        if fraction is None:
+            self.generation_progress.setRange(0, 0)
+        else:
+            self.generation_progress.setRange(0, 1000)
+            self.generation_progress.setValue(int(fraction * 1000))
+        if message:
+            self.generation_status_label.setText(message)
+
+    def _on_notes_generated(self, generated_notes: NoteBuffer):
+        self.notesGenerated.emit(generated_notes)
+        self.current_notes = generated_notes
+
+    def _on_generation_failed(self, message: str):
+        QMessageBox.critical(self, "Generation Error", f"Error: {message}")
+
+    def shutdown_generation(self):
+        """Cancels any running generation; called when the window closes."""
+        self.generation_runner.shutdown()
 
     def _handle_export_click(self): 
         if not self.current_notes:
@@ -0,0 +1,152 @@
+import threading
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+from plugin_api import GenerationCancelled
+from note_buffer import as_note_buffer
+
+
+class _GenerationSignals(QObject):
+    progress = Signal(int, object, str) # job id, fraction (None if unknown), message
+    finished = Signal(int, object) # job id, NoteBuffer
+    failed = Signal(int, str) # job id, error message
+    cancelled = Signal(int) # job id
+
+
+class _GenerationJob(QRunnable):
+    """Runs one PluginManager.generate_notes() call on a pool thread."""
+
+    def __init__(self, signals, job_id, plugin_manager, plugin_id, existing_notes, parameters, cancel_event):
+        super().__init__()
+        self.signals = signals
+        self.job_id = job_id
+        self.plugin_manager = plugin_manager
+        self.plugin_id = plugin_id
+        self.existing_notes = existing_notes
+        self.parameters = parameters
+        self.cancel_event = cancel_event
+
+    def run(self):
+        if self.cancel_event.is_set():
+            self.signals.cancelled.emit(self.job_id)
+            return
+        try:
+            notes = self.plugin_manager.generate_notes(
+                self.plugin_id, existing_notes=self.existing_notes, parameters=self.parameters,
+                progress_callback=lambda fraction, message: self.signals.progress.emit(self.job_id, fraction, message),
+                cancel_event=self.cancel_event)
+        except GenerationCancelled:
+            self.signals.cancelled.emit(self.job_id)
+        except Exception as e:
+            self.signals.failed.emit(self.job_id, str(e))
+        else:
+            self.signals.finished.emit(self.job_id, notes)
+
+
+class PluginGenerationRunner(QObject):
+    """
+    Runs plugin generation off the GUI thread and reports back through signals.
+
+    Jobs run one at a time on a private single-thread QThreadPool, so a plugin
+    instance is never used by two generations at once. Generate requests made
+    while a job is running are coalesced: only the latest one is kept and
+    started when the current job ends, on the notes current at that point
+    (so it builds on the result of the job before it). cancel() abandons the
+    running job immediately from the UI's point of view; the plugin stops at
+    its next report_progress() call, and whatever it still returns is dropped.
+    """
+
+    busyChanged = Signal(bool)
+    progressChanged = Signal(object, str) # fraction (None if unknown), message
+    notesGenerated = Signal(object) # NoteBuffer
+    generationFailed = Signal(str)
+    generationCancelled = Signal()
+
+    def __init__(self, plugin_manager, parent=None):
+        super().__init__(parent)
+        self.plugin_manager = plugin_manager
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+        self._signals = _GenerationSignals(self)
+        self._signals.progress.connect(self._on_progress)
+        self._signals.finished.connect(self._on_finished)
+        self._signals.failed.connect(self._on_failed)
+        self._signals.cancelled.connect(self._on_cancelled)
+        self._next_job_id = 0
+        self._current = None # (job id, cancel event) of the job the UI is waiting for
+        self._queued = None # (plugin id, parameters, notes provider) of a coalesced request
+
+    @property
+    def is_busy(self) -> bool:
+        return self._current is not None
+
+    def request(self, plugin_id, parameters, notes_provider):
+        """
+        Starts a generation, or replaces the one queued behind the running job.
+
+        Args:
+            plugin_id: ID of the plugin to run
+            parameters: Plugin parameter values
+            notes_provider: Callable returning the existing notes, called when the job starts
+        """
+        if self._current is not None:
+            self._queued = (plugin_id, dict(parameters), notes_provider)
+            return
+        self._start(plugin_id, parameters, notes_provider)
+
+    def cancel(self):
+        """Abandons the running job and drops any queued request."""
+        self._queued = None
+        if self._current is None:
+            return
+        self._current[1].set()
+        self._current = None
+        self.generationCancelled.emit()
+        self.busyChanged.emit(False)
+
+    def shutdown(self):
+        """Cancels everything; waits briefly for a running plugin to notice."""
+        self.cancel()
+        self._pool.clear()
+        self._pool.waitForDone(500)
+
+    def _start(self, plugin_id, parameters, notes_provider):
+        self._next_job_id += 1
+        cancel_event = threading.Event()
+        self._current = (self._next_job_id, cancel_event)
+        existing_notes = as_note_buffer(notes_provider()).copy() # The GUI may keep editing its own buffer
+        self._pool.start(_GenerationJob(self._signals, self._next_job_id, self.plugin_manager, plugin_id,
+                                        existing_notes, dict(parameters), cancel_event))
+        self.busyChanged.emit(True)
+
+    def _is_current(self, job_id) -> bool:
+        return self._current is not None and self._current[0] == job_id
+
+    def _finish_job(self):
+        self._current = None
+        if self._queued is not None:
+            plugin_id, parameters, notes_provider = self._queued
+            self._queued = None
+            self._start(plugin_id, parameters, notes_provider)
+        else:
+            self.busyChanged.emit(False)
+
+    def _on_progress(self, job_id, fraction, message):
+        if self._is_current(job_id):
+            self.progressChanged.emit(fraction, message)
+
+    def _on_finished(self, job_id, notes):
+        if not self._is_current(job_id):
+            return # Cancelled while it was running
+        self.notesGenerated.emit(notes)
+        self._finish_job()
+
+    def _on_failed(self, job_id, message):
+        if not self._is_current(job_id):
+            return
+        self.generationFailed.emit(message)
+        self._finish_job()
+
+    def _on_cancelled(self, job_id):
+        if self._is_current(job_id): # Cancelled from elsewhere than cancel(), e.g. by the plugin itself
+            self.generationCancelled.emit()
+            self._finish_job()
@@ -0,0 +1,149 @@
+import math
+from collections import OrderedDict
+from PySide6.QtCore import QObject, QRect, QRunnable, QThreadPool, Qt, Signal
+from PySide6.QtGui import QImage, QPainter
+
+from config import theme
+from ui.drawing_utils import draw_notes, visible_note_indices
+
+TILE_SIZE = 256 # Logical pixels per tile side
+MAX_RENDER_THREADS = 2 # Leaves cores for the GUI and the playback thread
+
+
+class _TileSignals(QObject):
+    rendered = Signal(object, object, object) # slot key, version, QImage
+
+
+class _TileJob(QRunnable):
+    """Paints one tile's notes into a QImage on a pool thread."""
+
+    def __init__(self, signals, slot_key, version, notes, tile_rect, time_scale, vertical_zoom_factor, detailed,
+                 resources, device_pixel_ratio):
+        super().__init__()
+        self.signals = signals
+        self.slot_key = slot_key
+        self.version = version
+        self.notes = notes # Private copy of just this tile's notes, so the GUI can keep editing
+        self.tile_rect = tile_rect
+        self.time_scale = time_scale
+        self.vertical_zoom_factor = vertical_zoom_factor
+        self.detailed = detailed # Decided for the whole frame, so neighbouring tiles match
+        self.resources = resources # Resolved on the GUI thread; workers never touch the shared cache
+        self.device_pixel_ratio = device_pixel_ratio
+
+    def run(self):
+        side = int(math.ceil(TILE_SIZE * self.device_pixel_ratio))
+        image = QImage(side, side, QImage.Format_ARGB32_Premultiplied)
+        image.setDevicePixelRatio(self.device_pixel_ratio)
+        image.fill(Qt.transparent)
+        painter = QPainter(image)
+        painter.setRenderHints(QPainter.Antialiasing | QPainter.TextAntialiasing)
+        painter.translate(-self.tile_rect.x(), -self.tile_rect.y())
+        painter.setClipRect(self.tile_rect)
+        draw_notes(painter, self.notes, self.time_scale, self.vertical_zoom_factor, self.detailed, self.resources,
+                   self.tile_rect)
+        painter.end()
+        self.signals.rendered.emit(self.slot_key, self.version, image)
+
+
+class NoteTileCache(QObject):
+    """
+    Note layer of the piano roll, rendered into fixed-size tiles off the GUI thread.
+
+    paint() composites whatever tiles are ready for the exposed rect and queues
+    the missing ones on a QThreadPool; each finished tile emits tileReady with
+    its widget rect so the owner can repaint just that area. Tiles are kept
+    per position and geometry (zoom, note style, device pixel ratio). A tile from an older
+    note-set version or theme is still shown while its replacement renders;
+    positions with nothing yet get a faint placeholder. Images are evicted
+    least recently used first once memory_budget_bytes is exceeded.
+    """
+
+    tileReady = Signal(QRect)
+
+    def __init__(self, memory_budget_bytes: int, parent=None):
+        super().__init__(parent)
+        self.memory_budget_bytes = memory_budget_bytes
+        self._tiles = OrderedDict() # (tile_x, tile_y, geometry) -> (version, QImage), least recently used first
+        self._bytes = 0
+        self._pending = {} # slot key -> version queued or rendering
+        self._geometry = None
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(MAX_RENDER_THREADS)
+        self._signals = _TileSignals(self)
+        self._signals.rendered.connect(self._on_rendered)
+
+    def paint(self, painter, notes, notes_version, time_scale, vertical_zoom_factor, detailed, resources, visible_rect):
+        """
+        Draws the ready tiles intersecting visible_rect and queues renders for the rest.
+
+        detailed is the frame's note style (see detailed_notes_wanted()); like
+        the zoom, it is part of every tile's key. resources are the frame's
+        PaintResources, handed to the tile jobs as they are.
+        """
+        device_pixel_ratio = painter.device().devicePixelRatioF()
+        geometry = (time_scale, vertical_zoom_factor, detailed, device_pixel_ratio)
+        if geometry != self._geometry:
+            # Queued tiles for the old zoom or style are no longer worth rendering
+            self._pool.clear()
+            self._pending.clear()
+            self._geometry = geometry
+        version = (notes_version, resources.theme_key)
+
+        first_x, last_x = visible_rect.left() // TILE_SIZE, visible_rect.right() // TILE_SIZE
+        first_y, last_y = visible_rect.top() // TILE_SIZE, visible_rect.bottom() // TILE_SIZE
+        for tile_y in range(first_y, last_y + 1):
+            for tile_x in range(first_x, last_x + 1):
+                tile_rect = QRect(tile_x * TILE_SIZE, tile_y * TILE_SIZE, TILE_SIZE, TILE_SIZE)
+                slot_key = (tile_x, tile_y, geometry)
+                cached = self._tiles.get(slot_key)
+                if cached is not None:
+                    self._tiles.move_to_end(slot_key)
+                    painter.drawImage(tile_rect.topLeft(), cached[1])
+                else:
+                    painter.fillRect(tile_rect.intersected(visible_rect), theme.NOTE_TILE_PLACEHOLDER_COLOR)
+                if cached is None or cached[0] != version:
+                    self._request(slot_key, version, notes, tile_rect, time_scale, vertical_zoom_factor, detailed,
+                                  resources, device_pixel_ratio)
+
+    def invalidate(self):
+        """Drops every tile and queued render."""
+        self._pool.clear()
+        self._pending.clear()
+        self._tiles.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict:
+        return {
+            "tiles": len(self._tiles),
+            "bytes": self._bytes,
+            "pending": len(self._pending),
+        }
+
+    def _request(self, slot_key, version, notes, tile_rect, time_scale, vertical_zoom_factor, detailed, resources,
+                 device_pixel_ratio):
+        if self._pending.get(slot_key) == version:
+            return
+        self._pending[slot_key] = version
+        tile_notes = notes[visible_note_indices(notes, time_scale, vertical_zoom_factor, tile_rect)]
+        self._pool.start(_TileJob(self._signals, slot_key, version, tile_notes, tile_rect,
+                                  time_scale, vertical_zoom_factor, detailed, resources, device_pixel_ratio))
+
+    def _on_rendered(self, slot_key, version, image):
+        wanted = self._pending.get(slot_key)
+        if wanted is None:
+            return # Invalidated or superseded by a zoom change while rendering
+        if version == wanted:
+            del self._pending[slot_key]
+        elif slot_key in self._tiles:
+            return # An older render finishing late; keep what is shown until the wanted one lands
+        previous = self._tiles.pop(slot_key, None)
+        if previous is not None:
+            self._bytes -= previous[1].sizeInBytes()
+        self._tiles[slot_key] = (version, image)
+        self._bytes += image.sizeInBytes()
+        while self._bytes > self.memory_budget_bytes and len(self._tiles) > 1:
+            _, (_, evicted) = self._tiles.popitem(last=False)
+            self._bytes -= evicted.sizeInBytes()
+        tile_x, tile_y, _ = slot_key
+        self.tileReady.emit(QRect(tile_x * TILE_SIZE, tile_y * TILE_SIZE, TILE_SIZE, TILE_SIZE))
@@ -211,6 +211,14 @@ class TransportControls(QWidget):
         self.volume_value_label.setStyleSheet(f"color: {theme.PRIMARY_TEXT_COLOR.name()}; min-width: 35px;") # Adjusted min-width
         self.volume_value_label.setAlignment(Qt.AlignRight | Qt.AlignVCenter)
         layout.addWidget(self.volume_value_label)
+
+        # Scheduler timing overlay (hidden unless enabled; see set_telemetry_visible)
+        self.telemetry_label = QLabel("")
+        self.telemetry_label.setFont(QFont(theme.FONT_FAMILY_MONOSPACE, theme.FONT_SIZE_S))
+        self.telemetry_label.setStyleSheet(f"color: {theme.SECONDARY_TEXT_COLOR.name()};")
+        self.telemetry_label.setToolTip("Scheduler event lateness (p50/p95/p99), missed deadlines and loop CPU")
+        self.telemetry_label.setVisible(False)
+        layout.addWidget(self.telemetry_label)
         
         layout.addStretch(1) # Add stretch at the end to push controls left
 
@@ -278,6 +286,17 @@ class TransportControls(QWidget):
     def update_time_slider_maximum(self, max_ms):
         self.time_slider.setMaximum(max_ms)
 
+    def set_telemetry_visible(self, visible: bool):
+        self.telemetry_label.setVisible(visible)
+
+    def update_telemetry(self, stats: dict):
+        """Shows a compact summary of NoteScheduler telemetry (see MidiPlayer.get_scheduler_stats)."""
+        # Sequencer lead in lookahead mode (higher is better), dispatch lateness otherwise
+        self.telemetry_label.setText(
+            f"{stats['measure']}  p50 {stats['p50_ms']:.2f}  p95 {stats['p95_ms']:.2f}  p99 {stats['p99_ms']:.2f} ms  "
+            f"missed {stats['missed_deadlines']}  cpu {stats['cpu_percent']:.1f}%"
+        )
+
     @Slot(int)
     def set_bpm_value(self, bpm):
         self.bpm_slider.blockSignals(True)